@@ -0,0 +1,210 @@
+# backend/api/http_cache.py
+import hashlib
+from collections import OrderedDict
+from datetime import datetime
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from backend.core import execution, metrics
+from backend.dropbox import service as dropbox_service
+from backend.dropbox import shared_frames
+
+
+# ─────────────────────────────────────────────────────────────
+# Serialized body cache (etag -> JSON bytes)
+# ─────────────────────────────────────────────────────────────
+_BODY_CACHE_SIZE = 32
+_body_cache: "OrderedDict[str, bytes]" = OrderedDict()
+
+
+def _remember_body(etag: str, body: bytes) -> None:
+    _body_cache[etag] = body
+    _body_cache.move_to_end(etag)
+    while len(_body_cache) > _BODY_CACHE_SIZE:
+        _body_cache.popitem(last=False)
+
+
+# ─────────────────────────────────────────────────────────────
+# ETag / Last-Modified helpers
+# ─────────────────────────────────────────────────────────────
+def make_etag(root_path: str, version: int, params: Dict[str, Any]) -> str:
+    """
+    Weak ETag = hash(device root + snapshot version + query params).
+    """
+    key = f"{root_path}|{version}|" + "&".join(
+        f"{k}={params[k]}" for k in sorted(params)
+    )
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == bare:
+            return True
+    return False
+
+
+def _not_modified_since(if_modified_since: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since is None or since.tzinfo is None:
+        return False
+    return last_modified <= since
+
+
+def is_not_modified(
+    request: Request,
+    etag: str,
+    last_modified: Optional[datetime],
+) -> bool:
+    # If-None-Match มีลำดับความสำคัญเหนือ If-Modified-Since (RFC 9110)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        return _not_modified_since(if_modified_since, last_modified)
+
+    return False
+
+
+def _cache_headers(etag: str, last_modified: Optional[datetime]) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    return headers
+
+
+# ─────────────────────────────────────────────────────────────
+# Body computation (runs in the execution pools)
+# ─────────────────────────────────────────────────────────────
+def encode_json(data: Any) -> bytes:
+    """Same bytes JSONResponse would send."""
+    with metrics.timed("json_encode"):
+        return JSONResponse(content=jsonable_encoder(data)).body
+
+
+def _compute_body(compute: Callable[[], Any]) -> bytes:
+    return encode_json(compute())
+
+
+def frame_body(ref: Dict, plot_cols, query: Dict[str, Any], envelope: Optional[Dict]) -> Tuple[bytes, List]:
+    """
+    CPU pool task: records of a shared frame (backend/dropbox/shared_frames.py)
+    → JSON bytes, so only the encoded body travels back to the API process.
+    Also returns the stage timings taken on the way (metrics.capture()),
+    which the API process records: a worker's own registry is never scraped.
+    """
+    with metrics.capture() as events:
+        rows = dropbox_service.frame_records(shared_frames.load(ref), plot_cols, **query)
+        body = encode_json(rows if envelope is None else {**envelope, "rows": rows})
+    return body, events
+
+
+# ─────────────────────────────────────────────────────────────
+# Conditional JSON response
+# ─────────────────────────────────────────────────────────────
+async def conditional_json(
+    request: Request,
+    root_path: str,
+    params: Dict[str, Any],
+    compute: Callable[[], Any],
+) -> Response:
+    """
+    Return 304 if the client already has the current snapshot,
+    otherwise run compute() on the I/O pool and return JSON with ETag.
+
+    The version is read *before* computing, so if the sync loop publishes
+    new data mid-request the response is tagged with the older version and
+    the next poll simply refetches.
+    """
+    return await _conditional(request, root_path, params, lambda: execution.run_io(_compute_body, compute))
+
+
+# ref ที่ได้ถูก prune ก่อน worker อ่าน: ลองใหม่กี่ครั้งก่อนคำนวณใน I/O pool
+_PRUNED_RETRIES = 2
+
+
+async def conditional_frame_json(
+    request: Request,
+    root_path: str,
+    params: Dict[str, Any],
+    plot_cols,
+    query: Dict[str, Any],
+    compute: Callable[[], Any],
+    since_envelope: bool = False,
+) -> Response:
+    """
+    conditional_json() for dropbox_service.frame_records(frame of root_path, **query):
+    computed in the CPU pool on the shared frame. Until the frame is cached
+    (first request before the first sync), or when its versions keep being
+    pruned before a worker maps them, compute() runs on the I/O pool.
+    """
+    async def body() -> bytes:
+        for _ in range(_PRUNED_RETRIES):
+            ref = await execution.run_io(dropbox_service.shared_frame, root_path)
+            if ref is None:
+                break
+            envelope = {"version": ref["version"], "since": query.get("since")} if since_envelope else None
+            try:
+                body, events = await execution.run_cpu(frame_body, ref, list(plot_cols), query, envelope)
+            except FileNotFoundError:
+                # version ถูก _prune ไปก่อน worker load (push ingest bump ถี่) → ขอ ref ใหม่
+                metrics.inc("cache_misses_total", cache="shared_frame_pruned")
+                continue
+            metrics.record(events)
+            return body
+        return await execution.run_io(_compute_body, compute)
+
+    return await _conditional(request, root_path, params, body)
+
+
+async def _conditional(
+    request: Request,
+    root_path: str,
+    params: Dict[str, Any],
+    make_body: Callable[[], Awaitable[bytes]],
+) -> Response:
+    version, last_modified = dropbox_service.get_snapshot_version(root_path)
+
+    if version:
+        etag = make_etag(root_path, version, params)
+        headers = _cache_headers(etag, last_modified)
+
+        if is_not_modified(request, etag, last_modified):
+            metrics.inc("cache_hits_total", cache="http_not_modified")
+            return Response(status_code=304, headers=headers)
+
+        body = _body_cache.get(etag)
+        if body is not None:
+            metrics.inc("cache_hits_total", cache="http_body")
+            return Response(content=body, media_type="application/json", headers=headers)
+        metrics.inc("cache_misses_total", cache="http_body")
+
+    body = await make_body()
+
+    if version:
+        _remember_body(etag, body)
+    else:
+        # เพิ่งโหลดครั้งแรก → tag ด้วย version หลังโหลด
+        version, last_modified = dropbox_service.get_snapshot_version(root_path)
+        if not version:
+            return Response(content=body, media_type="application/json")
+        etag = make_etag(root_path, version, params)
+        headers = _cache_headers(etag, last_modified)
+
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -1,9 +1,15 @@
-from fastapi import APIRouter, Query, HTTPException
+from fastapi import APIRouter, Query, HTTPException, Request
 from typing import Optional, Literal
-import asyncio
-from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 
 from backend.dropbox import service as dropbox_service
+from backend.dropbox import catalog as metric_catalog
+from backend.dropbox import devices
+from backend.dropbox import history
+from backend.dropbox import quality
+from backend.api.http_cache import conditional_frame_json
+from backend.core import carbon_accounting
+from backend.core.execution import run_io
 from backend.api.routes.predict import get_carbon_prediction 
 
 
@@ -13,44 +19,222 @@ router = APIRouter(prefix="/carbon", tags=["carbon"])
 # ============================================================
 #                       CO2 SECTION
 # ============================================================
-executor = ThreadPoolExecutor(max_workers=4)
+
+def _delta_envelope(root_path: str, since: datetime, rows: list) -> dict:
+    version, _ = dropbox_service.get_snapshot_version(root_path)
+    return {"version": version, "since": since, "rows": rows}
+
+
+def _query(limit, interval, max_points, downsample, since) -> dict:
+    """kwargs of dropbox_service.frame_records."""
+    return {"limit": limit, "interval": interval, "max_points": max_points,
+            "method": downsample, "since": since}
+
+
+def _page(root_path: str, skip: int, limit: int) -> list:
+    df = dropbox_service.read_all_csv_under(root_path)
+    return df.iloc[skip: skip + limit].to_dict(orient="records")
+
+
+def _debug(root_path: str) -> dict:
+    try:
+        df = dropbox_service.read_all_csv_under(root_path)
+        return {
+            "rows": int(len(df)),
+            "columns": list(df.columns),
+            "sample": df.head(5).to_dict(orient="records"),
+        }
+    except Exception as e:
+        return {"error": str(e)}
+
 
 @router.get("/co2/all", summary="CO2 raw data from WISE-4051 (all)")
 async def co2_all_raw(
+    request: Request,
     limit: Optional[int] = Query(100, ge=1, le=166740, description="Limit number of results"),
-    interval: Optional[Literal["raw", "1min", "5min", "15min", "30min", "1hour"]] = Query("5min", description="Data aggregation interval")
+    interval: Optional[Literal["raw", "1min", "5min", "15min", "30min", "1hour"]] = Query("5min", description="Data aggregation interval"),
+    max_points: Optional[int] = Query(None, ge=3, le=20000, description="Downsample to at most this many points (chart width)"),
+    downsample: Literal["lttb", "minmax"] = Query("lttb", description="Downsampling algorithm used with max_points"),
+    since: Optional[datetime] = Query(None, description="Only rows/buckets at or after this time (returns {version, rows}; limit is ignored)"),
 ):
-    # Run the blocking Dropbox/pandas operations in a thread pool
-    loop = asyncio.get_event_loop()
-    data = await loop.run_in_executor(
-        executor,
-        dropbox_service.get_co2_all_raw,
-        limit,
-        interval
+    # 304 ถ้า snapshot ไม่เปลี่ยน, ไม่งั้น aggregate/export ใน CPU pool
+    def compute():
+        rows = dropbox_service.get_co2_all_raw(limit, interval, max_points, downsample, since)
+        if since is None:
+            return rows
+        return _delta_envelope(dropbox_service.WISE4051_ROOT, since, rows)
+
+    return await conditional_frame_json(
+        request,
+        dropbox_service.WISE4051_ROOT,
+        {"path": "co2/all", "limit": limit, "interval": interval,
+         "max_points": max_points, "downsample": downsample, "since": since},
+        dropbox_service.CO2_PLOT_COLS,
+        _query(limit, interval, max_points, downsample, since),
+        compute,
+        since_envelope=since is not None,
     )
-    return data
 
 
-@router.get("/elec/all", summary="CO2 raw data from WISE-4051 (all)")
-async def co2_all_raw(
+@router.get("/elec/all", summary="Bioelectric raw data from WISE-4012 (all)")
+async def elec_all_raw(
+    request: Request,
+    limit: Optional[int] = Query(100, ge=1, le=166740, description="Limit number of results"),
+    interval: Optional[Literal["raw", "1min", "5min", "15min", "30min", "1hour"]] = Query("5min", description="Data aggregation interval"),
+    max_points: Optional[int] = Query(None, ge=3, le=20000, description="Downsample to at most this many points (chart width)"),
+    downsample: Literal["lttb", "minmax"] = Query("lttb", description="Downsampling algorithm used with max_points"),
+    since: Optional[datetime] = Query(None, description="Only rows/buckets at or after this time (returns {version, rows}; limit is ignored)"),
+):
+    def compute():
+        rows = dropbox_service.get_elec_all_raw(limit, interval, max_points, downsample, since)
+        if since is None:
+            return rows
+        return _delta_envelope(dropbox_service.WISE4012_ROOT, since, rows)
+
+    return await conditional_frame_json(
+        request,
+        dropbox_service.WISE4012_ROOT,
+        {"path": "elec/all", "limit": limit, "interval": interval,
+         "max_points": max_points, "downsample": downsample, "since": since},
+        dropbox_service.ELEC_PLOT_COLS,
+        _query(limit, interval, max_points, downsample, since),
+        compute,
+        since_envelope=since is not None,
+    )
+
+@router.get("/devices", summary="Registered sensor devices")
+def list_devices():
+    usage = dropbox_service.cache_usage()
+    return [
+        {
+            "id": d["id"],
+            "type": d["type"],
+            "plant_id": d["plant_id"],
+            "version": dropbox_service.get_snapshot_version(d["root"])[0],
+            "cache": usage.get(d["id"]),
+        }
+        for d in devices.list_devices()
+    ]
+
+
+@router.get("/devices/{device_id}/all", summary="Sensor data of one registered device")
+async def device_all_raw(
+    device_id: str,
+    request: Request,
     limit: Optional[int] = Query(100, ge=1, le=166740, description="Limit number of results"),
-    interval: Optional[Literal["raw", "1min", "5min", "15min", "30min", "1hour"]] = Query("5min", description="Data aggregation interval")
+    interval: Optional[Literal["raw", "1min", "5min", "15min", "30min", "1hour"]] = Query("5min", description="Data aggregation interval"),
+    max_points: Optional[int] = Query(None, ge=3, le=20000, description="Downsample to at most this many points (chart width)"),
+    downsample: Literal["lttb", "minmax"] = Query("lttb", description="Downsampling algorithm used with max_points"),
+    since: Optional[datetime] = Query(None, description="Only rows/buckets at or after this time (returns {version, rows}; limit is ignored)"),
+):
+    device = devices.get_device(device_id)
+    if device is None:
+        raise HTTPException(status_code=404, detail=f"Unknown device '{device_id}'")
+
+    def compute():
+        rows = dropbox_service.get_device_all_raw(device_id, limit, interval, max_points, downsample, since)
+        if since is None:
+            return rows
+        return _delta_envelope(device["root"], since, rows)
+
+    return await conditional_frame_json(
+        request,
+        device["root"],
+        {"path": "devices/all", "limit": limit, "interval": interval,
+         "max_points": max_points, "downsample": downsample, "since": since},
+        dropbox_service.PLOT_COLS_BY_TYPE.get(device["type"], ()),
+        _query(limit, interval, max_points, downsample, since),
+        compute,
+        since_envelope=since is not None,
+    )
+
+
+@router.get("/devices/{device_id}/history", summary="Historical range of one device (any age)")
+async def device_history(
+    device_id: str,
+    start: datetime = Query(..., description="Range start"),
+    end: Optional[datetime] = Query(None, description="Range end (default: now)"),
+    interval: Literal["raw", "1min", "5min", "15min", "30min", "1hour"] = Query("1hour", description="Data aggregation interval"),
+    max_points: Optional[int] = Query(None, ge=3, le=20000, description="Downsample to at most this many points (chart width)"),
+    downsample: Literal["lttb", "minmax"] = Query("lttb", description="Downsampling algorithm used with max_points"),
+):
+    if devices.get_device(device_id) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown device '{device_id}'")
+    # เวลาแบบมี timezone ถือเป็นเวลาท้องถิ่นเหมือนข้อมูลจากอุปกรณ์
+    start = start.replace(tzinfo=None)
+    end = (end or datetime.now()).replace(tzinfo=None)
+    if end < start:
+        raise HTTPException(status_code=422, detail="end must be after start")
+
+    # อ่าน partition จาก Dropbox → I/O pool
+    return await run_io(
+        dropbox_service.get_device_history_raw,
+        device_id, start, end, interval, max_points, downsample,
+    )
+
+
+@router.get("/history/stats", summary="Partition index / LRU counters")
+def history_stats():
+    return history.get_stats()
+
+
+@router.get("/aligned", summary="WISE-4051 × WISE-4012 time-aligned view")
+async def aligned_all(
+    request: Request,
+    limit: Optional[int] = Query(500, ge=1, le=166740, description="Limit number of results"),
+    max_points: Optional[int] = Query(None, ge=3, le=20000, description="Downsample to at most this many points (chart width)"),
+    downsample: Literal["lttb", "minmax"] = Query("lttb", description="Downsampling algorithm used with max_points"),
 ):
-    # Run the blocking Dropbox/pandas operations in a thread pool
-    loop = asyncio.get_event_loop()
-    data = await loop.run_in_executor(
-        executor,
-        dropbox_service.get_elec_all_raw,
-        limit,
-        interval
+    # คำนวณไว้แล้วตอน sync → แค่ตัด/ส่งออก
+    return await conditional_frame_json(
+        request,
+        dropbox_service.ALIGNED_KEY,
+        {"path": "aligned", "limit": limit, "max_points": max_points, "downsample": downsample},
+        dropbox_service.CO2_PLOT_COLS + dropbox_service.ELEC_PLOT_COLS,
+        _query(limit, "raw", max_points, downsample, None),
+        lambda: dropbox_service.get_aligned_all(limit, max_points, downsample),
     )
-    return data
+
+@router.get("/co2/absorption", summary="Running CO2 drawdown totals (per plant)")
+def co2_absorption(
+    plant_id: Optional[str] = Query(None, description="Plant id (default: all plants)"),
+    period: Optional[Literal["hour", "day"]] = Query(None, description="Also return the per-hour/per-day series"),
+    limit: int = Query(24, ge=1, le=2160, description="Number of periods in the series"),
+):
+    # totals สะสมไว้ตอน ingest แล้ว → แค่อ่านค่า
+    result = {"plants": carbon_accounting.get_totals(plant_id)}
+    if period and plant_id:
+        result["series"] = carbon_accounting.get_series(plant_id, period, limit)
+    return result
+
+@router.get("/alerts", summary="Sensor fault alerts (spike, flatline, rate, range, missing)")
+def sensor_alerts(
+    device_id: Optional[str] = Query(None, description="Device id (default: all devices)"),
+    active: bool = Query(False, description="Only faults that continue at the latest sample"),
+    limit: int = Query(100, ge=1, le=1000, description="Number of alerts (newest first)"),
+):
+    if device_id and devices.get_device(device_id) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown device '{device_id}'")
+    # ตรวจไว้แล้วตอน ingest → แค่อ่าน
+    return quality.get_alerts(device_id, active, limit)
+
+@router.get("/quality", summary="Fault flag bits and detector counters")
+def sensor_quality():
+    return quality.get_stats()
+
+@router.get("/catalog", summary="Metric catalog (register → name, unit, scale)")
+def catalog():
+    return {
+        device: metric_catalog.describe(device)
+        for device in metric_catalog.DEVICE_CATALOG
+    }
 
 @router.get("/co2/predict")
 async def co2_predict():
-    # 1. Use asyncio.to_thread() to run the synchronous function in a thread pool.
+    # 1. Run the synchronous function on the I/O pool (model inference releases
+    #    the GIL; models are loaded once per process, not per CPU worker).
     #    This ensures the main FastAPI event loop is NOT blocked.
-    result = await asyncio.to_thread(get_carbon_prediction)
+    result = await run_io(get_carbon_prediction)
     
     # 2. Check for errors returned by the service function
     if "error" in result:
@@ -71,29 +255,19 @@ def co2_daily():
 
 
 @router.get("/co2/count", summary="Count CO2 records quickly")
-def co2_count():
-    df = dropbox_service.read_all_csv_under(dropbox_service.WISE4051_ROOT)
+async def co2_count():
+    df = await run_io(dropbox_service.read_all_csv_under, dropbox_service.WISE4051_ROOT)
     return {"rows": int(len(df))}
 
 
 @router.get("/co2/page", summary="CO2 page-by-page for large datasets")
-def co2_page(skip: int = 0, limit: int = 500):
-    df = dropbox_service.read_all_csv_under(dropbox_service.WISE4051_ROOT)
-    part = df.iloc[skip: skip + limit]
-    return part.to_dict(orient="records")
+async def co2_page(skip: int = 0, limit: int = 500):
+    return await run_io(_page, dropbox_service.WISE4051_ROOT, skip, limit)
 
 
 @router.get("/co2/debug", summary="CO2 debug (sample, rows, columns)")
-def co2_debug():
-    try:
-        df = dropbox_service.read_all_csv_under(dropbox_service.WISE4051_ROOT)
-        return {
-            "rows": int(len(df)),
-            "columns": list(df.columns),
-            "sample": df.head(5).to_dict(orient="records"),
-        }
-    except Exception as e:
-        return {"error": str(e)}
+async def co2_debug():
+    return await run_io(_debug, dropbox_service.WISE4051_ROOT)
 
 
 # ============================================================
@@ -116,29 +290,19 @@ def temp_daily():
 
 
 @router.get("/temp/count", summary="Count temp records quickly")
-def temp_count():
-    df = dropbox_service.read_all_csv_under(dropbox_service.WISE4012_ROOT)
+async def temp_count():
+    df = await run_io(dropbox_service.read_all_csv_under, dropbox_service.WISE4012_ROOT)
     return {"rows": int(len(df))}
 
 
 @router.get("/temp/page", summary="Temperature data by page")
-def temp_page(skip: int = 0, limit: int = 500):
-    df = dropbox_service.read_all_csv_under(dropbox_service.WISE4012_ROOT)
-    part = df.iloc[skip: skip + limit]
-    return part.to_dict(orient="records")
+async def temp_page(skip: int = 0, limit: int = 500):
+    return await run_io(_page, dropbox_service.WISE4012_ROOT, skip, limit)
 
 
 @router.get("/temp/debug", summary="Temperature debug (sample, rows, columns)")
-def temp_debug():
-    try:
-        df = dropbox_service.read_all_csv_under(dropbox_service.WISE4012_ROOT)
-        return {
-            "rows": int(len(df)),
-            "columns": list(df.columns),
-            "sample": df.head(5).to_dict(orient="records"),
-        }
-    except Exception as e:
-        return {"error": str(e)}
+async def temp_debug():
+    return await run_io(_debug, dropbox_service.WISE4012_ROOT)
 
 
 # ============================================================
@@ -161,26 +325,16 @@ def humid_daily():
 
 
 @router.get("/humid/count", summary="Count humidity records quickly")
-def humid_count():
-    df = dropbox_service.read_all_csv_under(dropbox_service.WISE4012_ROOT)
+async def humid_count():
+    df = await run_io(dropbox_service.read_all_csv_under, dropbox_service.WISE4012_ROOT)
     return {"rows": int(len(df))}
 
 
 @router.get("/humid/page", summary="Humidity data page-by-page")
-def humid_page(skip: int = 0, limit: int = 500):
-    df = dropbox_service.read_all_csv_under(dropbox_service.WISE4012_ROOT)
-    part = df.iloc[skip: skip + limit]
-    return part.to_dict(orient="records")
+async def humid_page(skip: int = 0, limit: int = 500):
+    return await run_io(_page, dropbox_service.WISE4012_ROOT, skip, limit)
 
 
 @router.get("/humid/debug", summary="Humidity debug (sample, rows, columns)")
-def humid_debug():
-    try:
-        df = dropbox_service.read_all_csv_under(dropbox_service.WISE4012_ROOT)
-        return {
-            "rows": int(len(df)),
-            "columns": list(df.columns),
-            "sample": df.head(5).to_dict(orient="records"),
-        }
-    except Exception as e:
-        return {"error": str(e)}
\ No newline at end of file
+async def humid_debug():
+    return await run_io(_debug, dropbox_service.WISE4012_ROOT)
\ No newline at end of file
@@ -1,23 +1,60 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-from backend.core.ollama_service import ask_carbon_status_ollama
+from backend.core.ollama_service import (
+    ask_carbon_status_cached,
+    stream_carbon_status_cached,
+    get_reply_cache_stats,
+)
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
 class ChatRequest(BaseModel):
     message: str
+    stream: bool = False
 
 class ChatResponse(BaseModel):
     reply: str
 
 @router.post("/carbon-status", response_model=ChatResponse)
-def chat_carbon_status(req: ChatRequest):
+async def chat_carbon_status(req: ChatRequest):
+    if req.stream:
+        return await _stream_reply(req.message)
+
     try:
-        reply = ask_carbon_status_ollama(req.message)
+        reply = await ask_carbon_status_cached(req.message)
         return ChatResponse(reply=reply)
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"เกิดข้อผิดพลาดในการเรียก Ollama: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+@router.get("/cache/stats", summary="LLM reply cache hit/miss counters")
+def chat_cache_stats():
+    return get_reply_cache_stats()
+
+
+async def _stream_reply(message: str) -> StreamingResponse:
+    tokens = stream_carbon_status_cached(message)
+
+    # รอ token แรกก่อน เพื่อให้ error ตอนเชื่อมต่อ Ollama ยังตอบเป็น 500 ได้
+    try:
+        first = await tokens.__anext__()
+    except StopAsyncIteration:
+        first = ""
+    except Exception as e:
+        await tokens.aclose()
+        raise HTTPException(
+            status_code=500,
+            detail=f"เกิดข้อผิดพลาดในการเรียก Ollama: {str(e)}"
+        )
+
+    async def body():
+        yield first
+        async for token in tokens:
+            yield token
+
+    return StreamingResponse(body(), media_type="text/plain; charset=utf-8")
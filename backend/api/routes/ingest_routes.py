@@ -0,0 +1,47 @@
+# backend/api/routes/ingest_routes.py
+import queue
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+
+from backend.core.config import settings
+from backend.dropbox import ingest
+
+router = APIRouter(prefix="/ingest", tags=["ingest"])
+
+
+@router.post(
+    "/{device_id}",
+    status_code=202,
+    summary="Push a batch of sensor rows (JSON or CSV) for one device",
+)
+async def push_rows(
+    device_id: str,
+    request: Request,
+    x_ingest_token: Optional[str] = Header(None),
+):
+    if settings.INGEST_TOKEN and x_ingest_token != settings.INGEST_TOKEN:
+        raise HTTPException(status_code=401, detail="Invalid ingest token")
+
+    body = await request.body()
+    content_type = request.headers.get("content-type", "")
+
+    try:
+        accepted = await run_in_threadpool(ingest.submit, device_id, body, content_type)
+    except ingest.IngestError as e:
+        raise HTTPException(status_code=e.status, detail=str(e))
+    except queue.Full:
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "Ingest queue full, retry later"},
+            headers={"Retry-After": "1"},
+        )
+
+    return {"device_id": device_id, "accepted": accepted}
+
+
+@router.get("/stats", summary="Push ingest queue / throughput counters")
+def ingest_stats():
+    return ingest.get_stats()
@@ -0,0 +1,13 @@
+# backend/api/routes/metrics_routes.py
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from backend.core import metrics
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", summary="Prometheus metrics (stage timings, caches, Dropbox, ingest)")
+def prometheus_metrics():
+    # sync endpoint → FastAPI รันใน threadpool (collector วัด memory ของ DataFrame)
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
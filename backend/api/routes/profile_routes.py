@@ -0,0 +1,42 @@
+# backend/api/routes/profile_routes.py
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import FileResponse
+
+from backend.core import profiling
+from backend.core.config import settings
+
+router = APIRouter(prefix="/profiles", tags=["profiling"])
+
+
+def _check(x_profile: Optional[str]) -> None:
+    if not settings.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled (PROFILING_ENABLED)")
+    if not profiling.authorized(x_profile):
+        raise HTTPException(status_code=401, detail="Missing or invalid X-Profile header")
+
+
+@router.get("", summary="Stored profiles (folded stacks), newest first")
+def list_profiles(x_profile: Optional[str] = Header(None)):
+    _check(x_profile)
+    return {
+        "sync_pending": profiling.sync_profile_pending(),
+        "profiles": profiling.list_artifacts(),
+    }
+
+
+@router.post("/sync", status_code=202, summary="Profile the next background sync cycle")
+def profile_next_sync(x_profile: Optional[str] = Header(None)):
+    _check(x_profile)
+    profiling.request_sync_profile()
+    return {"sync_pending": True}
+
+
+@router.get("/{name}", summary="Download one profile (flamegraph.pl / speedscope input)")
+def get_profile(name: str, x_profile: Optional[str] = Header(None)):
+    _check(x_profile)
+    path = profiling.artifact_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Unknown profile '{name}'")
+    return FileResponse(path, media_type="text/plain", filename=name)
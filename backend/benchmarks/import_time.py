@@ -0,0 +1,87 @@
+# backend/benchmarks/import_time.py
+"""
+How long until the API app is importable (≈ time to first /health).
+
+Each case runs in a fresh interpreter so nothing is cached:
+
+    lazy    import backend.main                       (current)
+    eager   import backend.main + autogluon.tabular   (old module-level import)
+
+Usage (from the repo root, with the usual .env):
+
+    python -m backend.benchmarks.import_time [--runs 5] [--top 15]
+
+--top prints the slowest modules of one lazy run (python -X importtime).
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+CASES = {
+    "lazy": "import backend.main",
+    "eager": "import backend.main; import autogluon.tabular; import sklearn.preprocessing",
+}
+
+CHECK_LAZY = (
+    "import sys, backend.main; "
+    "heavy = [m for m in ('autogluon', 'sklearn', 'torch') if m in sys.modules]; "
+    "print(','.join(heavy))"
+)
+
+
+def time_import(code: str) -> float:
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    return elapsed
+
+
+def slowest_modules(code: str, top: int):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cum_us, name = line.split(":", 1)[1].split("|")
+        rows.append((int(cum_us), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=0)
+    args = parser.parse_args()
+
+    results = {}
+    for name, code in CASES.items():
+        try:
+            samples = [time_import(code) for _ in range(args.runs)]
+        except RuntimeError as e:
+            print(f"{name:6s}  skipped ({e})")
+            continue
+        results[name] = statistics.median(samples)
+        print(f"{name:6s}  median {results[name]:.2f}s  (min {min(samples):.2f}s, {args.runs} runs)")
+
+    if "lazy" in results and "eager" in results:
+        print(f"\nstartup import is {results['lazy'] / results['eager']:.0%} of the eager import")
+
+    heavy = subprocess.run([sys.executable, "-c", CHECK_LAZY], capture_output=True, text=True).stdout.strip()
+    print(f"heavy ML modules loaded by backend.main: {heavy or 'none'}")
+
+    if args.top:
+        print(f"\nslowest imports (lazy, cumulative):")
+        for cum_us, name in slowest_modules(CASES["lazy"], args.top):
+            print(f"  {cum_us / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# backend/benchmarks/inference_profiles.py
+"""
+Latency vs accuracy of each PREDICT_PROFILE on the predictor's held-out
+validation split (utils/data/X_val, y_val cached by AutoGluon at fit time).
+
+    latency  single-row predict() — what /co2/predict does every 5 min per plant
+    batch    whole validation set, per row
+    MAE/RMSE against y_val
+
+X_val is already feature-transformed, so timings exclude AutoGluon's
+feature generation (identical for every profile).
+
+Usage (from the repo root):
+
+    python -m backend.benchmarks.inference_profiles [PATH ...] [--rows 200]
+
+Profiles whose models are missing fall back as in production; create them
+first with `python -m backend.ml.profiles prepare PATH`.
+"""
+import argparse
+import statistics
+import time
+import warnings
+
+import numpy as np
+
+from backend.ml.profiles import PROFILES, persist, resolve_model
+
+DEFAULT_PATHS = ["backend/api/routes/autogluon_models_rate_change"]
+
+
+def _time_single_rows(predictor, model, X, rows: int):
+    samples = []
+    for i in range(min(rows, len(X))):
+        row = X.iloc[[i]]
+        start = time.perf_counter()
+        predictor.predict(row, model=model, transform_features=False)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return statistics.median(samples), samples[int(0.95 * (len(samples) - 1))]
+
+
+def bench_path(path: str, rows: int):
+    from autogluon.tabular import TabularPredictor
+
+    predictor = TabularPredictor.load(path, require_py_version_match=False, verbosity=0)
+    X_val, y_val = predictor.load_data_internal(data="val", return_y=True)
+    y_true = np.asarray(y_val, dtype=np.float64)
+
+    print(f"\n{path}  (label={predictor.label}, {len(X_val)} validation rows)")
+    print(f"{'profile':10s} {'model':28s} {'MAE':>8s} {'RMSE':>8s} {'p50 ms':>8s} {'p95 ms':>8s} {'batch µs/row':>13s}")
+
+    baseline = None
+    for profile in PROFILES:
+        model = resolve_model(predictor, profile)
+        persist(predictor, model)
+
+        start = time.perf_counter()
+        y_pred = np.asarray(predictor.predict(X_val, model=model, transform_features=False), dtype=np.float64)
+        batch = (time.perf_counter() - start) / len(X_val)
+
+        predictor.predict(X_val.iloc[[0]], model=model, transform_features=False)  # warm
+        p50, p95 = _time_single_rows(predictor, model, X_val, rows)
+
+        err = y_pred - y_true
+        mae = float(np.mean(np.abs(err)))
+        rmse = float(np.sqrt(np.mean(err ** 2)))
+        baseline = baseline or p50
+
+        print(
+            f"{profile:10s} {(model or predictor.model_best):28s} {mae:8.4f} {rmse:8.4f} "
+            f"{p50 * 1e3:8.2f} {p95 * 1e3:8.2f} {batch * 1e6:13.1f}   ({baseline / p50:.1f}x)"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", default=DEFAULT_PATHS)
+    parser.add_argument("--rows", type=int, default=200, help="single-row predictions to time per profile")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    for path in args.paths:
+        bench_path(path, args.rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,406 @@
+# backend/benchmarks/loadtest.py
+"""
+Load test: N dashboard tabs against one API instance.
+
+Each simulated client replays what the frontend does:
+
+    dashboard.jsx    GET /plants/all, GET /carbon/co2/absorption   (on open)
+    PlantDetail.jsx  GET /carbon/co2/all + /carbon/elec/all        (every --poll-seconds)
+                     POST /chat/carbon-status                       (every --chat-seconds)
+
+Sensor polls revalidate with If-None-Match like a browser cache does.
+The API runs in its own process (uvicorn, one worker, normal lifespan incl.
+the sync loop) with local stand-ins:
+
+    Dropbox   FakeDropbox over synthetic WISE day folders (backend/benchmarks/synthetic.py)
+    MongoDB   in-memory collections (find / find_one)
+    Ollama    HTTP server in this process answering /api/chat after
+              --llm-ms, streaming at --llm-tokens-per-s
+
+Usage (from the repo root):
+
+    python -m backend.benchmarks.loadtest [--clients 1,5,10,25,50] [--duration 60]
+        [--poll-seconds 30] [--chat-seconds 120] [--slo-ms 1000]
+
+Per step: p50/p95/p99 per request kind, throughput, errors and the server's
+resident memory (peak). The largest client count whose sensor polls stay
+within --slo-ms (p95, no errors) is printed at the end; chat is left out
+because its latency is mostly the LLM's. Results go to --out as JSON.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+from backend.benchmarks import suite
+from backend.benchmarks.synthetic import build_tree
+
+DEFAULT_OUT = "backend/benchmarks/results/load"
+
+QUESTIONS = [
+    "สถานะคาร์บอนตอนนี้เป็นอย่างไร",
+    "ต้นไม้ดูดซับ CO2 ได้ดีไหมวันนี้",
+    "อุณหภูมิและความชื้นเหมาะสมหรือยัง",
+    "What is the current CO2 trend?",
+    "Is the plant healthy?",
+    "ควรรดน้ำไหม",
+]
+
+PLANTS = [
+    {"name": f"Mulberry {i}", "species": "Morus alba", "status": "online", "health": "Good",
+     "water": "Today", "image": f"/images/{i % 7 + 1}.jpg", "age_months": 6 + i}
+    for i in range(12)
+]
+
+
+# ─────────────────────────────────────────────────────────────
+# Stand-ins (server side)
+# ─────────────────────────────────────────────────────────────
+class _Cursor:
+    def __init__(self, docs: List[Dict], latency: float):
+        self._docs = docs
+        self._latency = latency
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        if self._latency:
+            await asyncio.sleep(self._latency)
+        for doc in self._docs:
+            yield dict(doc)
+
+
+class FakeCollection:
+    """The part of a motor collection the routes use for reads."""
+
+    def __init__(self, docs: List[Dict], latency: float = 0.0):
+        from bson import ObjectId
+
+        self.docs = [{"_id": ObjectId(), **doc} for doc in docs]
+        self.latency = latency
+
+    def find(self, *args, **kwargs) -> _Cursor:
+        return _Cursor(self.docs, self.latency)
+
+    async def find_one(self, query: Optional[Dict] = None):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        for doc in self.docs:
+            if all(doc.get(k) == v for k, v in (query or {}).items()):
+                return dict(doc)
+        return None
+
+
+class FakeDatabase(dict):
+    def __init__(self, collections: Dict[str, List[Dict]], latency: float = 0.0):
+        super().__init__({name: FakeCollection(docs, latency) for name, docs in collections.items()})
+
+    def __missing__(self, name: str) -> FakeCollection:
+        return self.setdefault(name, FakeCollection([]))
+
+    async def list_collection_names(self) -> List[str]:
+        return list(self)
+
+
+def serve(args) -> None:
+    """API process: stand-ins installed, then uvicorn."""
+    import uvicorn
+
+    entries = suite.configure(args)
+    tree = build_tree(entries, args.days, args.sample_seconds, args.files_per_day, seed=args.seed)
+    suite.install_fake_dropbox(tree, args)
+
+    from backend.core import ollama_service
+    from backend.mongo.main import MongoDB
+    from backend.main import app
+
+    # มี database แล้ว → get_database() ไม่ต่อ Atlas
+    MongoDB.database = FakeDatabase({"plant": PLANTS, "plants": PLANTS}, args.mongo_ms / 1000.0)
+    ollama_service.OLLAMA_URL = args.ollama_url
+
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning", access_log=False)
+
+
+# ─────────────────────────────────────────────────────────────
+# Ollama stand-in (this process)
+# ─────────────────────────────────────────────────────────────
+def start_fake_ollama(first_token: float, tokens_per_s: float, tokens: int = 60) -> ThreadingHTTPServer:
+    words = ("ระดับ CO2 อยู่ในเกณฑ์ปกติ ต้นไม้ดูดซับได้ดีในช่วงกลางวัน " * 10).split()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            reply = [words[i % len(words)] + " " for i in range(tokens)]
+            time.sleep(first_token)
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson" if payload.get("stream") else "application/json")
+            self.end_headers()
+            if not payload.get("stream"):
+                time.sleep(tokens / tokens_per_s)
+                self.wfile.write(json.dumps({"message": {"content": "".join(reply)}, "done": True}).encode())
+                return
+            for token in reply:
+                self.wfile.write((json.dumps({"message": {"content": token}, "done": False}) + "\n").encode())
+                self.wfile.flush()
+                time.sleep(1.0 / tokens_per_s)
+            self.wfile.write(b'{"message": {"content": ""}, "done": true}\n')
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="fake-ollama").start()
+    return server
+
+
+# ─────────────────────────────────────────────────────────────
+# Clients
+# ─────────────────────────────────────────────────────────────
+class Recorder:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.status: Dict[str, int] = {}
+        self.errors = 0
+
+    def add(self, kind: str, seconds: float, status) -> None:
+        self.samples.setdefault(kind, []).append(seconds)
+        self.status[str(status)] = self.status.get(str(status), 0) + 1
+        if not isinstance(status, int) or status >= 400:
+            self.errors += 1
+
+
+async def _request(client, rec: Recorder, kind: str, method: str, url: str,
+                   etags: Optional[Dict[str, str]] = None, **kwargs) -> None:
+    headers = {}
+    if etags is not None and url in etags:
+        headers["If-None-Match"] = etags[url]
+    start = time.perf_counter()
+    try:
+        r = await client.request(method, url, headers=headers, **kwargs)
+        status = r.status_code
+        if etags is not None and r.headers.get("etag"):
+            etags[url] = r.headers["etag"]
+    except Exception as e:
+        status = type(e).__name__
+    rec.add(kind, time.perf_counter() - start, status)
+
+
+async def dashboard_tab(client, rec: Recorder, args, deadline: float, offset: float) -> None:
+    """One browser tab: dashboard once, then PlantDetail polling + chat."""
+    await asyncio.sleep(offset)
+    await asyncio.gather(
+        _request(client, rec, "dashboard", "GET", "/plants/all"),
+        _request(client, rec, "dashboard", "GET", "/carbon/co2/absorption"),
+    )
+
+    etags: Dict[str, str] = {} if args.etag else None
+    sensors = [
+        f"/carbon/co2/all?limit=500&interval={args.interval}",
+        f"/carbon/elec/all?limit=500&interval={args.interval}",
+    ]
+    next_chat = time.monotonic() + random.uniform(0, args.chat_seconds) if args.chat_seconds else None
+
+    while time.monotonic() < deadline:
+        tick = time.monotonic()
+        await asyncio.gather(*(_request(client, rec, "sensors", "GET", url, etags) for url in sensors))
+
+        if next_chat is not None and time.monotonic() >= next_chat:
+            message = random.choice(QUESTIONS)
+            if args.chat_unique:
+                message += f" #{random.getrandbits(32)}"
+            await _request(client, rec, "chat", "POST", "/chat/carbon-status", json={"message": message})
+            next_chat = time.monotonic() + args.chat_seconds
+
+        await asyncio.sleep(max(0.0, args.poll_seconds - (time.monotonic() - tick)))
+
+
+def _rss(pid: int) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None   # ไม่ใช่ Linux
+
+
+async def run_step(base_url: str, pid: int, clients: int, args) -> Dict:
+    import httpx
+
+    rec = Recorder()
+    peak = [0]
+
+    async def sample_memory(stop: asyncio.Event):
+        while not stop.is_set():
+            peak[0] = max(peak[0], _rss(pid) or 0)
+            try:
+                await asyncio.wait_for(stop.wait(), 0.5)
+            except asyncio.TimeoutError:
+                pass
+
+    limits = httpx.Limits(max_connections=clients * 6, max_keepalive_connections=clients * 6)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        stop = asyncio.Event()
+        sampler = asyncio.create_task(sample_memory(stop))
+        start = time.monotonic()
+        deadline = start + args.duration
+        # เปิด tab กระจายกันตลอดรอบ poll แรก เหมือนผู้ใช้จริง
+        await asyncio.gather(*(
+            dashboard_tab(client, rec, args, deadline, offset=args.poll_seconds * i / clients)
+            for i in range(clients)
+        ))
+        wall = time.monotonic() - start
+        stop.set()
+        await sampler
+
+    every = [s for samples in rec.samples.values() for s in samples]
+    step = {
+        "clients": clients,
+        "requests": len(every),
+        "rps": round(len(every) / wall, 2),
+        "errors": rec.errors,
+        "status": rec.status,
+        "server_rss_peak": peak[0] or None,
+        "all": suite.summarize(every) if every else None,
+    }
+    for kind, samples in rec.samples.items():
+        step[kind] = suite.summarize(samples)
+    return step
+
+
+# ─────────────────────────────────────────────────────────────
+# Driver
+# ─────────────────────────────────────────────────────────────
+async def _wait_ready(base_url: str, proc: subprocess.Popen, timeout: float) -> None:
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url, timeout=5) as client:
+        while time.monotonic() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError(f"API process exited with {proc.returncode}")
+            try:
+                # พร้อมเมื่อ sync รอบแรกเสร็จ (มีข้อมูลให้ dashboard)
+                r = await client.get("/carbon/co2/all?limit=1&interval=raw")
+                if r.status_code == 200 and r.json():
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError(f"API not ready after {timeout:.0f}s")
+
+
+def _server_argv(args, port: int, ollama_url: str) -> List[str]:
+    return [
+        sys.executable, "-m", "backend.benchmarks.loadtest", "--serve",
+        "--port", str(port), "--ollama-url", ollama_url,
+        "--days", str(args.days), "--sample-seconds", str(args.sample_seconds),
+        "--files-per-day", str(args.files_per_day), "--devices", str(args.devices),
+        "--seed", str(args.seed), "--latency-ms", str(args.latency_ms),
+        "--bandwidth-mbps", str(args.bandwidth_mbps), "--mongo-ms", str(args.mongo_ms),
+    ]
+
+
+def _print_step(step: Dict) -> None:
+    def ms(kind: str, key: str) -> str:
+        return f"{step[kind][key] * 1e3:8.1f}" if step.get(kind) else f"{'-':>8s}"
+
+    rss = f"{step['server_rss_peak'] / 1e6:7.0f}" if step["server_rss_peak"] else f"{'-':>7s}"
+    print(
+        f"{step['clients']:7d} {step['rps']:8.1f} {step['errors']:6d} "
+        f"{ms('all', 'median')} {ms('all', 'p95')} {ms('all', 'p99')} "
+        f"{ms('sensors', 'p95')} {ms('chat', 'p95')} {rss}",
+        flush=True,
+    )
+
+
+def drive(args) -> None:
+    client_steps = [int(c) for c in args.clients.split(",") if c.strip()]
+    ollama = start_fake_ollama(args.llm_ms / 1000.0, args.llm_tokens_per_s)
+    ollama_url = f"http://127.0.0.1:{ollama.server_address[1]}/api/chat"
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    log_path = os.path.join(args.out, "server.log")
+    os.makedirs(args.out, exist_ok=True)
+    with open(log_path, "w") as log:
+        proc = subprocess.Popen(_server_argv(args, args.port, ollama_url), stdout=log, stderr=subprocess.STDOUT)
+    print(f"🚀 API pid {proc.pid} on {base_url} (log: {log_path})")
+
+    steps = []
+    try:
+        asyncio.run(_wait_ready(base_url, proc, args.startup_timeout))
+        print(f"\n{'clients':>7s} {'req/s':>8s} {'errors':>6s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s} "
+              f"{'sens p95':>8s} {'chat p95':>8s} {'RSS MB':>7s}")
+        for clients in client_steps:
+            step = asyncio.run(run_step(base_url, proc.pid, clients, args))
+            steps.append(step)
+            _print_step(step)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        ollama.shutdown()
+
+    within = [
+        s["clients"] for s in steps
+        if s.get("sensors") and not s["errors"] and s["sensors"]["p95"] * 1e3 <= args.slo_ms
+    ]
+    if within:
+        print(f"\n✅ up to {max(within)} dashboards with sensor p95 ≤ {args.slo_ms:.0f} ms")
+    else:
+        print(f"\n❌ no step met sensor p95 ≤ {args.slo_ms:.0f} ms without errors")
+
+    if not args.no_save:
+        params = {k: v for k, v in vars(args).items() if k not in ("out", "no_save", "serve", "ollama_url")}
+        path = suite.save({f"clients.{s['clients']}": s for s in steps}, params, args.out)
+        print(f"💾 {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", default="1,5,10,25,50", help="comma separated client counts, one step each")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds per step")
+    parser.add_argument("--poll-seconds", type=float, default=30.0, help="PlantDetail refresh period")
+    parser.add_argument("--chat-seconds", type=float, default=120.0, help="one chat message per client per period (0 = no chat)")
+    parser.add_argument("--chat-unique", action="store_true", help="never repeat a question (no reply cache hits)")
+    parser.add_argument("--interval", default="5min", help="interval the dashboard requests")
+    parser.add_argument("--no-etag", dest="etag", action="store_false", help="don't send If-None-Match")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--slo-ms", type=float, default=1000.0)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--startup-timeout", type=float, default=180.0)
+    # ข้อมูล / stand-ins
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--sample-seconds", type=int, default=10)
+    parser.add_argument("--files-per-day", type=int, default=24)
+    parser.add_argument("--devices", type=int, default=1, help="WISE-4051 + WISE-4012 pairs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="added to every fake Dropbox call")
+    parser.add_argument("--bandwidth-mbps", type=float, default=0.0, help="fake ZIP download speed (0 = unlimited)")
+    parser.add_argument("--mongo-ms", type=float, default=5.0, help="fake MongoDB query latency")
+    parser.add_argument("--llm-ms", type=float, default=800.0, help="fake Ollama time to first token")
+    parser.add_argument("--llm-tokens-per-s", type=float, default=40.0)
+    parser.add_argument("--out", default=DEFAULT_OUT)
+    parser.add_argument("--no-save", action="store_true")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--ollama-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+    else:
+        drive(args)
+
+
+if __name__ == "__main__":
+    main()
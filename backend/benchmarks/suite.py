@@ -0,0 +1,409 @@
+# backend/benchmarks/suite.py
+"""
+End-to-end benchmark on synthetic WISE data, no Dropbox account needed.
+
+    ingest      full sync cycle (refresh_sensor_cache) through DropboxSource
+                backed by FakeDropbox, plus the per-stage split
+    aggregate   aggregate_data on the cached WISE-4051 frame
+    records     df_to_records (JSON export) of raw and 5-min frames
+    endpoints   API latency under concurrency (in-process ASGI, no network);
+                *_uncached vary the query per request, so every one misses the
+                body cache and runs in the CPU pool (--cpu-workers)
+    predict     get_carbon_prediction, first call and warm
+
+Usage (from the repo root):
+
+    python -m backend.benchmarks.suite [--days 7] [--sample-seconds 10] [--devices 1]
+        [--concurrency 16] [--requests 400] [--cpu-workers N] [--latency-ms 0] [--only ingest,endpoints]
+        [--compare latest|FILE] [--tolerance 0.15]
+
+Each run is saved as JSON in --out (default backend/benchmarks/results).
+--compare prints the change of every median against an earlier run and
+exits with 1 if anything got slower by more than --tolerance.
+"""
+import argparse
+import asyncio
+import contextlib
+import glob
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import warnings
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from backend.benchmarks.synthetic import FakeDropbox, bench_devices, build_tree, tree_bytes
+
+SUITES = ("ingest", "aggregate", "records", "endpoints", "predict")
+DEFAULT_OUT = "backend/benchmarks/results"
+
+# ต่างกันน้อยกว่านี้ถือเป็น noise แม้ % จะสูง
+NOISE_FLOOR = 0.002   # วินาที
+
+ENDPOINTS = [
+    ("co2_5min", "/carbon/co2/all?limit=1000&interval=5min"),
+    ("co2_raw_lttb", "/carbon/co2/all?limit=20000&interval=raw&max_points=1000"),
+    # {limit} เปลี่ยนทุก request → ETag ไม่ซ้ำกัน ไม่โดน body cache
+    ("co2_raw_lttb_uncached", "/carbon/co2/all?limit={limit}&interval=raw&max_points=1000"),
+    ("elec_1min", "/carbon/elec/all?limit=1000&interval=1min"),
+    ("aligned", "/carbon/aligned?limit=1000"),
+    ("devices", "/carbon/devices"),
+]
+
+DEFAULT_MODELS = [
+    "backend/api/routes/autogluon_models_rate_change",
+    "backend/api/routes/autogluon_models_rate_per_hour/content/autogluon_models_rate_per_hour",
+]
+
+
+# ─────────────────────────────────────────────────────────────
+# Timing helpers
+# ─────────────────────────────────────────────────────────────
+def summarize(samples: List[float], **extra) -> Dict:
+    ordered = sorted(samples)
+
+    def pct(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(p * (len(ordered) - 1))))]
+
+    return {
+        "median": statistics.median(ordered),
+        "p95": pct(0.95),
+        "p99": pct(0.99),
+        "min": ordered[0],
+        "n": len(ordered),
+        **extra,
+    }
+
+
+def repeat(fn: Callable[[], object], runs: int, setup: Optional[Callable[[], None]] = None) -> List[float]:
+    samples = []
+    for _ in range(runs):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+# ─────────────────────────────────────────────────────────────
+# Environment (before any backend.dropbox import)
+# ─────────────────────────────────────────────────────────────
+def configure(args) -> List[Dict]:
+    entries = bench_devices(args.devices)
+    os.environ["SENSOR_DEVICES"] = json.dumps(entries)
+    os.environ["SENSOR_SOURCE"] = "dropbox"
+    os.environ["PRIMARY_DEVICES"] = "wise4051,wise4012"
+    os.environ.setdefault("DROPBOX_TOKEN", "benchmark")
+    if args.cpu_workers is not None:
+        os.environ["CPU_WORKERS"] = str(args.cpu_workers)
+    return entries
+
+
+def install_fake_dropbox(tree, args) -> FakeDropbox:
+    from backend.sources import DropboxSource, register_source
+
+    bandwidth = args.bandwidth_mbps * 1e6 / 8 if args.bandwidth_mbps else None
+    dbx = FakeDropbox(tree, latency=args.latency_ms / 1000.0, bandwidth=bandwidth)
+    dbx.prepare()
+    register_source("dropbox", DropboxSource(client_factory=lambda: dbx))
+    return dbx
+
+
+# ─────────────────────────────────────────────────────────────
+# Suites
+# ─────────────────────────────────────────────────────────────
+def bench_ingest(args, dbx: FakeDropbox) -> Dict[str, Dict]:
+    from backend.core import metrics
+    from backend.dropbox import service
+
+    stages_before = metrics.stage_totals()
+    calls_before = dict(dbx.calls)
+    samples = repeat(
+        lambda: service.refresh_sensor_cache(limit=1000, interval="5min"),
+        args.runs,
+        setup=service.clear_cache,
+    )
+    after = metrics.stage_totals()
+
+    # เวลาต่อรอบของแต่ละ stage (รวมทุก thread → อาจมากกว่า wall)
+    stages = {
+        stage: round((t["seconds"] - stages_before.get(stage, {}).get("seconds", 0.0)) / args.runs, 6)
+        for stage, t in after.items()
+        if stage not in ("sync_cycle", "sync_device")
+    }
+    rows = sum(len(df) for df in service._cache.values() if df is not None)
+    calls = {k: (v - calls_before[k]) // args.runs for k, v in dbx.calls.items()}
+
+    results = {"ingest.sync_cycle": summarize(samples, rows=rows, stages=stages, dropbox_calls=calls)}
+
+    # รอบถัดไป (cache อุ่นแล้ว): ยังโหลดใหม่ทั้งหมด แต่ quality / accounting ต่อจากเดิม
+    results["ingest.sync_cycle_warm"] = summarize(
+        repeat(lambda: service.refresh_sensor_cache(limit=1000, interval="5min"), args.runs)
+    )
+    return results
+
+
+def _co2_frame():
+    from backend.dropbox import service
+
+    df = service._cache.get(service.WISE4051_ROOT)
+    if df is None:
+        df = service.read_all_csv_under(service.WISE4051_ROOT)
+    return df
+
+
+def bench_aggregate(args) -> Dict[str, Dict]:
+    from backend.dropbox import service
+
+    df = _co2_frame()
+    results = {}
+    for interval in ("1min", "5min", "1hour"):
+        service.aggregate_data(df, interval)   # warm
+        results[f"aggregate.{interval}"] = summarize(
+            repeat(lambda: service.aggregate_data(df, interval), args.runs * 3),
+            rows=len(df),
+        )
+    return results
+
+
+def bench_records(args) -> Dict[str, Dict]:
+    from backend.dropbox import service
+
+    df = _co2_frame()
+    frames = {
+        "raw": df.tail(20000),
+        "5min": service.aggregate_data(df, "5min"),
+    }
+    results = {}
+    for name, frame in frames.items():
+        results[f"records.{name}"] = summarize(
+            repeat(lambda: service.df_to_records(frame), args.runs * 3),
+            rows=len(frame),
+        )
+    return results
+
+
+async def _hammer(client, path: str, total: int, concurrency: int) -> Dict:
+    samples: List[float] = []
+    statuses: Dict[int, int] = {}
+    queue = iter(range(total))
+
+    async def worker():
+        for i in queue:
+            start = time.perf_counter()
+            r = await client.get(path.format(limit=19999 - i))
+            samples.append(time.perf_counter() - start)
+            statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+
+    wall = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - wall
+    return summarize(samples, rps=round(total / wall, 1), concurrency=concurrency,
+                     status={str(k): v for k, v in statuses.items()})
+
+
+def bench_endpoints(args) -> Dict[str, Dict]:
+    import httpx
+
+    from backend.core import execution
+    from backend.dropbox import service
+    from backend.main import app
+
+    if service.get_sensor_snapshot_version() == 0:
+        service.refresh_sensor_cache(limit=1000, interval="5min")
+    execution.start()
+
+    async def run():
+        # ASGITransport ไม่รัน lifespan → ไม่มี sync loop / warm-up มารบกวน
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            results = {}
+            for name, path in ENDPOINTS:
+                await client.get(path.format(limit=20000))   # warm
+                results[f"endpoint.{name}"] = await _hammer(client, path, args.requests, args.concurrency)
+            return results
+
+    try:
+        return asyncio.run(run())
+    finally:
+        execution.shutdown()
+
+
+def bench_predict(args) -> Dict[str, Dict]:
+    from backend.api.routes import predict
+
+    predict.MODEL_PATH_RATE_CHANGE, predict.MODEL_PATH_RATE_PER_HOUR = args.models
+
+    start = time.perf_counter()
+    result = predict.get_carbon_prediction()
+    first = time.perf_counter() - start
+    if "error" in result:
+        print(f"   predict skipped: {result['error']}", file=sys.stderr)
+        return {}
+
+    warm = repeat(predict.get_carbon_prediction, args.runs * 5)
+    return {
+        "predict.first_call": summarize([first]),
+        "predict.warm": summarize(warm),
+    }
+
+
+# ─────────────────────────────────────────────────────────────
+# Results
+# ─────────────────────────────────────────────────────────────
+def _git_commit() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True)
+        return out.stdout.strip() or "unknown"
+    except OSError:
+        return "unknown"
+
+
+def save(results: Dict, params: Dict, out_dir: str) -> str:
+    import pandas as pd
+
+    commit = _git_commit()
+    payload = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "commit": commit,
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "cpus": os.cpu_count(),
+            "params": params,
+        },
+        "results": results,
+    }
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, f"{datetime.now():%Y%m%d-%H%M%S}-{commit}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2, default=str)
+    return path
+
+
+def _resolve_baseline(compare: str, out_dir: str, current: str) -> Optional[str]:
+    if compare != "latest":
+        return compare
+    runs = sorted(p for p in glob.glob(os.path.join(out_dir, "*.json")) if p != current)
+    return runs[-1] if runs else None
+
+
+def compare(results: Dict, params: Dict, baseline_path: str, tolerance: float) -> List[str]:
+    """Print median deltas; return the names that regressed."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    meta = baseline.get("meta", {})
+    print(f"\nvs {os.path.basename(baseline_path)} (commit {meta.get('commit')}, {meta.get('created')})")
+    if meta.get("params") != params:
+        print("   ⚠️ different parameters, deltas are not comparable")
+
+    regressed = []
+    for name, now in results.items():
+        before = baseline.get("results", {}).get(name)
+        if not before:
+            continue
+        old, new = before["median"], now["median"]
+        change = (new - old) / old if old else 0.0
+        flag = ""
+        if change > tolerance and new - old > NOISE_FLOOR:
+            flag = "  ← slower"
+            regressed.append(name)
+        elif change < -tolerance and old - new > NOISE_FLOOR:
+            flag = "  faster"
+        print(f"   {name:28s} {old * 1e3:10.2f} ms → {new * 1e3:10.2f} ms  {change:+7.1%}{flag}")
+    return regressed
+
+
+def print_results(results: Dict) -> None:
+    print(f"\n{'benchmark':28s} {'median ms':>10s} {'p95 ms':>10s} {'p99 ms':>10s} {'n':>5s}  extra")
+    for name, r in results.items():
+        extra = ", ".join(
+            f"{k}={r[k]}" for k in ("rows", "rps", "concurrency", "status") if k in r
+        )
+        print(f"{name:28s} {r['median'] * 1e3:10.2f} {r['p95'] * 1e3:10.2f} {r['p99'] * 1e3:10.2f} {r['n']:5d}  {extra}")
+        if "stages" in r:
+            top = sorted(r["stages"].items(), key=lambda x: -x[1])[:8]
+            print("   stages: " + ", ".join(f"{s} {v * 1e3:.0f}ms" for s, v in top))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--sample-seconds", type=int, default=10)
+    parser.add_argument("--files-per-day", type=int, default=24)
+    parser.add_argument("--devices", type=int, default=1, help="WISE-4051 + WISE-4012 pairs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="added to every fake Dropbox call")
+    parser.add_argument("--bandwidth-mbps", type=float, default=0.0, help="fake ZIP download speed (0 = unlimited)")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=400, help="requests per endpoint")
+    parser.add_argument("--cpu-workers", type=int, help="CPU_WORKERS for the endpoints suite (default: the setting)")
+    parser.add_argument("--models", nargs=2, default=DEFAULT_MODELS, metavar=("RATE_CHANGE", "RATE_PER_HOUR"))
+    parser.add_argument("--only", default=",".join(SUITES), help=f"comma separated subset of {','.join(SUITES)}")
+    parser.add_argument("--out", default=DEFAULT_OUT)
+    parser.add_argument("--no-save", action="store_true")
+    parser.add_argument("--verbose", action="store_true", help="keep the service's own log lines")
+    parser.add_argument("--compare", help="'latest' or a result file")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed slowdown before flagging (0.15 = 15%%)")
+    args = parser.parse_args()
+
+    selected = [s.strip() for s in args.only.split(",") if s.strip()]
+    unknown = set(selected) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suite(s): {', '.join(sorted(unknown))}")
+
+    entries = configure(args)
+    start = time.perf_counter()
+    tree = build_tree(entries, args.days, args.sample_seconds, args.files_per_day, seed=args.seed)
+    print(
+        f"🧪 {len(entries)} devices × {args.days} days @ {args.sample_seconds}s: "
+        f"{sum(len(f) for f in tree.values())} CSV files, {tree_bytes(tree) / 1e6:.1f} MB "
+        f"(generated in {time.perf_counter() - start:.1f}s)"
+    )
+    dbx = install_fake_dropbox(tree, args)
+
+    runners = {
+        "ingest": lambda: bench_ingest(args, dbx),
+        "aggregate": lambda: bench_aggregate(args),
+        "records": lambda: bench_records(args),
+        "endpoints": lambda: bench_endpoints(args),
+        "predict": lambda: bench_predict(args),
+    }
+    warnings.filterwarnings("ignore")
+    results: Dict[str, Dict] = {}
+    for suite in SUITES:
+        if suite in selected:
+            print(f"▶ {suite}", flush=True)
+            # log ของ service (Cache used / Download ZIP ...) ทุก request → ทิ้ง
+            with open(os.devnull, "w") as devnull, \
+                    contextlib.redirect_stdout(sys.stdout if args.verbose else devnull):
+                results.update(runners[suite]())
+
+    print_results(results)
+
+    params = {k: v for k, v in vars(args).items() if k not in ("only", "out", "no_save", "verbose", "compare", "tolerance")}
+    path = None
+    if not args.no_save:
+        path = save(results, params, args.out)
+        print(f"\n💾 {path}")
+
+    if args.compare:
+        baseline = _resolve_baseline(args.compare, args.out, path)
+        if baseline is None:
+            print("\nno earlier run to compare with")
+            return
+        regressed = compare(results, params, baseline, args.tolerance)
+        if regressed:
+            print(f"\n❌ {len(regressed)} regression(s) over {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+# backend/benchmarks/synthetic.py
+"""
+Synthetic WISE-4051 / WISE-4012 logs and a local stand-in for Dropbox.
+
+    tree = build_tree(bench_devices(2), days=7, sample_seconds=10)
+    dbx = FakeDropbox(tree, latency=0.05)      # files_list_folder / files_download_zip
+    DropboxSource(client_factory=lambda: dbx)
+
+Day folders look like the real ones (<root>/<YYYYMMDD>/*.csv, TIM column,
+raw registers incl. Evt and unused channels) so ingest runs the exact
+production path: listing, ZIP download, CSV parse, catalog, merge, quality.
+Everything is seeded, so runs with the same arguments see the same data.
+
+Write the same tree to disk for SENSOR_SOURCE=local:
+
+    python -m backend.benchmarks.synthetic OUT_DIR [--days 7] [--devices 1]
+"""
+import argparse
+import io
+import json
+import os
+import threading
+import time
+import zipfile
+from typing import Dict, List, Optional, Tuple
+
+import dropbox
+import numpy as np
+import pandas as pd
+
+START = "2025-11-01"
+
+# path → [(file name, CSV bytes)]
+Tree = Dict[str, List[Tuple[str, bytes]]]
+
+
+# ─────────────────────────────────────────────────────────────
+# Devices
+# ─────────────────────────────────────────────────────────────
+def bench_devices(pairs: int = 1, root: str = "/bench") -> List[Dict]:
+    """
+    SENSOR_DEVICES entries: one WISE-4051 + WISE-4012 per greenhouse.
+    The first pair keeps the default ids (PRIMARY_DEVICES).
+    """
+    entries = []
+    for i in range(pairs):
+        suffix = "" if i == 0 else f"-{i + 1}"
+        for device_type in ("wise4051", "wise4012"):
+            entries.append({
+                "id": f"{device_type}{suffix}",
+                "type": device_type,
+                "root": f"{root}/GH{i + 1}/{device_type.upper()}",
+                "source": "dropbox",
+                "plant_id": f"gh{i + 1}",
+            })
+    return entries
+
+
+# ─────────────────────────────────────────────────────────────
+# Raw logs
+# ─────────────────────────────────────────────────────────────
+def _daylight(ts: pd.DatetimeIndex) -> np.ndarray:
+    """0 at night, peaks at 1 around 12:30."""
+    hours = ts.hour.to_numpy() + ts.minute.to_numpy() / 60.0
+    return np.clip(np.sin((hours - 6.0) / 13.0 * np.pi), 0.0, None)
+
+
+def generate_day(device_type: str, day, sample_seconds: int = 10,
+                 seed: int = 0, spike_rate: float = 0.0005) -> pd.DataFrame:
+    """One day of raw registers as the module logs them."""
+    ts = pd.date_range(pd.Timestamp(day).normalize(), periods=86400 // sample_seconds,
+                       freq=f"{sample_seconds}s")
+    n = len(ts)
+    rng = np.random.default_rng(seed)
+    sun = _daylight(ts)
+    raw = {"TIM": ts.strftime("%Y-%m-%d %H:%M:%S")}
+
+    if device_type == "wise4051":
+        # CO2 ลดตอนกลางวัน (พืชดูดซับ) + random walk
+        co2 = 480.0 - 70.0 * sun + np.cumsum(rng.normal(0.0, 0.4, n)) * 0.2
+        spikes = rng.random(n) < spike_rate
+        co2[spikes] += rng.choice([-1.0, 1.0], spikes.sum()) * rng.uniform(200, 800, spikes.sum())
+        temp = 24.0 + 8.0 * sun + rng.normal(0.0, 0.05, n)
+        humid = 80.0 - 25.0 * sun + rng.normal(0.0, 0.2, n)
+        light = 900.0 * sun + rng.normal(0.0, 5.0, n).clip(0)
+        registers = [
+            np.round(co2, 1),
+            np.round(temp * 100),
+            np.round(humid * 100),
+            np.zeros(n),
+            np.round(light),
+            np.zeros(n),
+            np.round(light * 55.0),
+            np.zeros(n),
+        ]
+        for i, values in enumerate(registers):
+            raw[f"COM_1 Wd_{i}"] = values
+            raw[f"COM_1 Wd_{i} Evt"] = 0
+
+    elif device_type == "wise4012":
+        # ADC 16-bit: 32768 = 0 V
+        leaf = 0.25 + 0.1 * sun + rng.normal(0.0, 0.003, n)
+        ground = 0.08 + rng.normal(0.0, 0.002, n)
+        for i, volts in enumerate((leaf, ground, np.zeros(n), np.zeros(n))):
+            raw[f"AI_{i} Val"] = np.round(volts * 65535.0 / 20.0 + 32768.0).astype(np.int64)
+            raw[f"AI_{i} Evt"] = 0
+        for i in range(4):
+            raw[f"DI_{i}"] = (sun > 0.2).astype(np.int64) if i == 0 else 0
+
+    else:
+        raise ValueError(f"Unknown device type '{device_type}'")
+
+    return pd.DataFrame(raw)
+
+
+def build_tree(entries: List[Dict], days: int = 7, sample_seconds: int = 10,
+               files_per_day: int = 24, start: str = START, seed: int = 0) -> Tree:
+    """
+    {<root>/<YYYYMMDD>: [(name, csv bytes)]} for every device entry.
+    Each day is split into files_per_day CSVs (the module rotates logs).
+    """
+    tree: Tree = {}
+    for d_index, entry in enumerate(entries):
+        for day in range(days):
+            date = pd.Timestamp(start) + pd.Timedelta(days=day)
+            df = generate_day(entry["type"], date, sample_seconds, seed=seed + 1000 * d_index + day)
+            bounds = np.linspace(0, len(df), files_per_day + 1).astype(int)
+            tree[f"{entry['root']}/{date:%Y%m%d}"] = [
+                (f"{date:%Y%m%d}_{i:03d}.csv", df.iloc[lo:hi].to_csv(index=False).encode())
+                for i, (lo, hi) in enumerate(zip(bounds[:-1], bounds[1:]))
+            ]
+    return tree
+
+
+def tree_bytes(tree: Tree) -> int:
+    return sum(len(data) for files in tree.values() for _, data in files)
+
+
+def write_tree(tree: Tree, out_dir: str) -> int:
+    """Write the tree under out_dir (layout of LocalDirSource). Returns file count."""
+    count = 0
+    for folder, files in tree.items():
+        path = os.path.join(out_dir, folder.lstrip("/"))
+        os.makedirs(path, exist_ok=True)
+        for name, data in files:
+            with open(os.path.join(path, name), "wb") as f:
+                f.write(data)
+            count += 1
+    return count
+
+
+# ─────────────────────────────────────────────────────────────
+# Dropbox stand-in
+# ─────────────────────────────────────────────────────────────
+class _ListResult:
+    def __init__(self, entries, cursor: Optional[str]):
+        self.entries = entries
+        self.cursor = cursor
+        self.has_more = cursor is not None
+
+
+class _ZipResponse:
+    """Just what DropboxSource uses of requests.Response."""
+
+    def __init__(self, data: bytes, bandwidth: Optional[float]):
+        self._data = data
+        self._bandwidth = bandwidth
+
+    def iter_content(self, chunk_size: int = 1 << 20):
+        for i in range(0, len(self._data), chunk_size):
+            chunk = self._data[i:i + chunk_size]
+            if self._bandwidth:
+                time.sleep(len(chunk) / self._bandwidth)
+            yield chunk
+
+    def close(self) -> None:
+        pass
+
+
+class FakeDropbox:
+    """
+    In-memory dropbox.Dropbox for the calls DropboxSource makes.
+
+    latency    seconds added to every API call (round trip)
+    bandwidth  bytes/s while streaming a ZIP (None = unlimited)
+    page_size  folder entries per files_list_folder page
+    """
+
+    def __init__(self, tree: Tree, latency: float = 0.0,
+                 bandwidth: Optional[float] = None, page_size: int = 500):
+        self.tree = tree
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.page_size = page_size
+        self.calls: Dict[str, int] = {"list": 0, "download": 0}
+        self._zips: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def _round_trip(self, kind: str) -> None:
+        with self._lock:
+            self.calls[kind] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _page(self, path: str, offset: int) -> _ListResult:
+        prefix = path.rstrip("/") + "/"
+        folders = sorted(p for p in self.tree if p.startswith(prefix) and "/" not in p[len(prefix):])
+        page = folders[offset:offset + self.page_size]
+        entries = [
+            dropbox.files.FolderMetadata(
+                name=p.rsplit("/", 1)[-1], id=f"id:{p}", path_lower=p.lower(), path_display=p,
+            )
+            for p in page
+        ]
+        end = offset + len(page)
+        return _ListResult(entries, f"{end}:{path}" if end < len(folders) else None)
+
+    def files_list_folder(self, path: str) -> _ListResult:
+        self._round_trip("list")
+        return self._page(path, 0)
+
+    def files_list_folder_continue(self, cursor: str) -> _ListResult:
+        self._round_trip("list")
+        offset, path = cursor.split(":", 1)
+        return self._page(path, int(offset))
+
+    def _zip(self, path: str) -> bytes:
+        # Dropbox สร้าง ZIP ฝั่ง server → สร้างครั้งเดียวแล้วใช้ซ้ำ ไม่นับเป็นเวลา ingest
+        with self._lock:
+            data = self._zips.get(path)
+            if data is None:
+                buf = io.BytesIO()
+                folder = path.rsplit("/", 1)[-1]
+                with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+                    for name, csv in self.tree[path]:
+                        z.writestr(f"{folder}/{name}", csv)
+                data = self._zips[path] = buf.getvalue()
+        return data
+
+    def prepare(self) -> None:
+        """Build every ZIP up front."""
+        for path in self.tree:
+            self._zip(path)
+
+    def files_download_zip(self, path: str):
+        self._round_trip("download")
+        if path not in self.tree:
+            raise KeyError(path)
+        data = self._zip(path)
+        metadata = dropbox.files.FolderMetadata(
+            name=path.rsplit("/", 1)[-1], id=f"id:{path}", path_lower=path.lower(), path_display=path,
+        )
+        return metadata, _ZipResponse(data, self.bandwidth)
+
+    def close(self) -> None:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("out_dir")
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--sample-seconds", type=int, default=10)
+    parser.add_argument("--files-per-day", type=int, default=24)
+    parser.add_argument("--devices", type=int, default=1, help="WISE-4051 + WISE-4012 pairs")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    entries = bench_devices(args.devices)
+    tree = build_tree(entries, args.days, args.sample_seconds, args.files_per_day, seed=args.seed)
+    count = write_tree(tree, args.out_dir)
+    for entry in entries:
+        entry.update(source="local", root=os.path.join(os.path.abspath(args.out_dir), entry["root"].lstrip("/")))
+    print(f"✅ {count} CSV files, {tree_bytes(tree) / 1e6:.1f} MB → {args.out_dir}")
+    print(f"SENSOR_DEVICES='{json.dumps(entries)}'")
+
+
+if __name__ == "__main__":
+    main()
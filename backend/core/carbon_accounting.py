@@ -0,0 +1,241 @@
+# backend/core/carbon_accounting.py
+"""
+Incremental CO₂ drawdown accounting.
+
+Every sync cycle feeds the raw WISE-4051 frame to ingest(); only rows newer
+than the last processed timestamp are integrated, so totals stay correct
+beyond any query window and reading them is O(1).
+
+- drawdown  = sum of CO₂ decreases between consecutive samples (ppm)
+- emission  = sum of CO₂ increases (ppm)
+- mass      = ppm change × chamber volume → mg, using the measured
+              temperature / humidity (ideal gas, dry-air corrected)
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from backend.core.config import settings
+
+
+# ─────────────────────────────────────────────────────────────
+# Constants
+# ─────────────────────────────────────────────────────────────
+CO2_MOLAR_MASS = 44.01        # g/mol
+GAS_CONSTANT = 8.314462618    # J/(mol·K)
+STD_PRESSURE = 101325.0       # Pa
+DEFAULT_TEMP_C = 25.0
+
+# ช่องว่างระหว่าง sample ที่นานกว่านี้ไม่นำมารวม (เครื่องดับ / ไฟล์หาย)
+MAX_GAP = pd.Timedelta("10min")
+
+# เก็บรายชั่วโมงย้อนหลังได้ 90 วัน, รายวัน 2 ปี ต่อ plant
+HOURLY_RETENTION = 24 * 90
+DAILY_RETENTION = 366 * 2
+
+
+# ─────────────────────────────────────────────────────────────
+# State
+# ─────────────────────────────────────────────────────────────
+_lock = threading.Lock()
+
+# plant_id -> {"timestamp", "co2"} ของ sample สุดท้ายที่ประมวลผลแล้ว
+_last_sample: Dict[str, Dict] = {}
+
+# plant_id -> totals
+_totals: Dict[str, Dict] = {}
+
+# plant_id -> OrderedDict[period_start -> bucket]
+_hourly: Dict[str, "OrderedDict[pd.Timestamp, Dict]"] = {}
+_daily: Dict[str, "OrderedDict[pd.Timestamp, Dict]"] = {}
+
+_FIELDS = ("drawdown_ppm", "emission_ppm", "drawdown_mg", "emission_mg", "samples")
+
+
+def _empty_bucket() -> Dict:
+    return {f: 0.0 for f in _FIELDS}
+
+
+# ─────────────────────────────────────────────────────────────
+# Physics
+# ─────────────────────────────────────────────────────────────
+def mg_per_ppm(temp_c: np.ndarray, humid_pct: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    mg of CO₂ per m³ per ppm at the given air temperature (°C).
+    If relative humidity (%) is given, ppm is converted to a dry-air
+    mole fraction first (Magnus saturation vapour pressure).
+    """
+    temp_c = np.where(np.isnan(temp_c), DEFAULT_TEMP_C, temp_c)
+    temp_k = temp_c + 273.15
+
+    # mol/m³ ต่อ 1 ppm × g/mol × 1000 → mg/m³
+    factor = 1e-6 * STD_PRESSURE / (GAS_CONSTANT * temp_k) * CO2_MOLAR_MASS * 1000.0
+
+    if humid_pct is not None:
+        e_sat = 610.94 * np.exp(17.625 * temp_c / (temp_c + 243.04))
+        e = np.clip(np.nan_to_num(humid_pct), 0.0, 100.0) / 100.0 * e_sat
+        factor = factor / (1.0 - e / STD_PRESSURE)
+
+    return factor
+
+
+# ─────────────────────────────────────────────────────────────
+# Ingest
+# ─────────────────────────────────────────────────────────────
+def _add_grouped(store: "OrderedDict[pd.Timestamp, Dict]", grouped: pd.DataFrame) -> None:
+    for period, row in grouped.iterrows():
+        bucket = store.get(period)
+        if bucket is None:
+            bucket = store[period] = _empty_bucket()
+        for f in _FIELDS:
+            bucket[f] += float(row[f])
+
+
+def pending(df: pd.DataFrame, plant_id: str) -> pd.DataFrame:
+    """
+    Rows of df (sorted by 'timestamp') that ingest() has not integrated
+    yet, so callers mask / copy only those instead of the whole frame.
+    """
+    with _lock:
+        last = _last_sample.get(plant_id)
+    if last is None or df is None or df.empty:
+        return df
+    return df.iloc[int(df["timestamp"].searchsorted(last["timestamp"], side="right")):]
+
+
+def ingest(
+    df: pd.DataFrame,
+    plant_id: str,
+    co2_col: str,
+    temp_col: Optional[str] = None,
+    humid_col: Optional[str] = None,
+) -> int:
+    """
+    Integrate rows of df newer than the last processed sample for plant_id.
+    df must be sorted by 'timestamp'. Returns number of new rows.
+    """
+    if df is None or df.empty or co2_col not in df.columns:
+        return 0
+
+    with _lock:
+        last = _last_sample.get(plant_id)
+
+        ts = df["timestamp"]
+        if last is not None:
+            start = int(ts.searchsorted(last["timestamp"], side="right"))
+            df = df.iloc[start:]
+        df = df.dropna(subset=["timestamp", co2_col])
+        if df.empty:
+            return 0
+
+        ts = df["timestamp"].to_numpy(dtype="datetime64[ns]")
+        co2 = df[co2_col].to_numpy(dtype=np.float64)
+
+        # ต่อกับ sample สุดท้ายของรอบก่อน เพื่อ diff แถวแรกได้
+        if last is not None:
+            prev_ts = np.concatenate(([np.datetime64(last["timestamp"], "ns")], ts[:-1]))
+            prev_co2 = np.concatenate(([last["co2"]], co2[:-1]))
+        else:
+            prev_ts = np.concatenate(([ts[0]], ts[:-1]))
+            prev_co2 = np.concatenate(([co2[0]], co2[:-1]))
+
+        delta = co2 - prev_co2
+        gap = (ts - prev_ts) > MAX_GAP.to_timedelta64()
+        delta[gap] = 0.0
+
+        drawdown = np.where(delta < 0, -delta, 0.0)
+        emission = np.where(delta > 0, delta, 0.0)
+
+        temp = (
+            df[temp_col].to_numpy(dtype=np.float64)
+            if temp_col and temp_col in df.columns
+            else np.full(len(df), np.nan)
+        )
+        humid = (
+            df[humid_col].to_numpy(dtype=np.float64)
+            if humid_col and humid_col in df.columns
+            else None
+        )
+        mg = mg_per_ppm(temp, humid) * settings.CHAMBER_VOLUME_M3
+
+        frame = pd.DataFrame({
+            "timestamp": ts,
+            "drawdown_ppm": drawdown,
+            "emission_ppm": emission,
+            "drawdown_mg": drawdown * mg,
+            "emission_mg": emission * mg,
+            "samples": 1.0,
+        })
+
+        hourly = _hourly.setdefault(plant_id, OrderedDict())
+        daily = _daily.setdefault(plant_id, OrderedDict())
+        _add_grouped(hourly, frame.groupby(frame["timestamp"].dt.floor("h"))[list(_FIELDS)].sum())
+        _add_grouped(daily, frame.groupby(frame["timestamp"].dt.floor("D"))[list(_FIELDS)].sum())
+        while len(hourly) > HOURLY_RETENTION:
+            hourly.popitem(last=False)
+        while len(daily) > DAILY_RETENTION:
+            daily.popitem(last=False)
+
+        totals = _totals.setdefault(plant_id, {**_empty_bucket(), "since": pd.Timestamp(ts[0])})
+        sums = frame[list(_FIELDS)].sum()
+        for f in _FIELDS:
+            totals[f] += float(sums[f])
+        totals["until"] = pd.Timestamp(ts[-1])
+
+        _last_sample[plant_id] = {"timestamp": pd.Timestamp(ts[-1]), "co2": float(co2[-1])}
+        return len(df)
+
+
+# ─────────────────────────────────────────────────────────────
+# Read API (O(1) / O(limit))
+# ─────────────────────────────────────────────────────────────
+def _with_net(bucket: Dict) -> Dict:
+    out = dict(bucket)
+    out["net_drawdown_ppm"] = bucket["drawdown_ppm"] - bucket["emission_ppm"]
+    out["net_drawdown_mg"] = bucket["drawdown_mg"] - bucket["emission_mg"]
+    out["samples"] = int(bucket["samples"])
+    return out
+
+
+def get_totals(plant_id: Optional[str] = None, now: Optional[pd.Timestamp] = None) -> Dict:
+    """
+    total, current_hour and today per plant. current_hour / today are the
+    buckets of `now` (device wall-clock, default: local now); zeros when
+    the device sent nothing in that period (stalled), never an older one.
+    """
+    now = pd.Timestamp.now() if now is None else pd.Timestamp(now)
+    hour, day = now.floor("h"), now.floor("D")
+    with _lock:
+        plants = [plant_id] if plant_id else list(_totals)
+        result = {}
+        for pid in plants:
+            if pid not in _totals:
+                continue
+            hourly = _hourly.get(pid) or {}
+            daily = _daily.get(pid) or {}
+            result[pid] = {
+                "total": _with_net(_totals[pid]),
+                "current_hour": {"period_start": hour, **_with_net(hourly.get(hour) or _empty_bucket())},
+                "today": {"period_start": day, **_with_net(daily.get(day) or _empty_bucket())},
+            }
+        return result
+
+
+def get_series(plant_id: str, period: str = "hour", limit: int = 24) -> list:
+    with _lock:
+        store = (_daily if period == "day" else _hourly).get(plant_id)
+        if not store:
+            return []
+        keys = list(store.keys())[-limit:]
+        return [{"period_start": k, **_with_net(store[k])} for k in keys]
+
+
+def reset() -> None:
+    with _lock:
+        _last_sample.clear()
+        _totals.clear()
+        _hourly.clear()
+        _daily.clear()
@@ -1,9 +1,20 @@
 # backend/core/config.py
+import hashlib
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def _default_shared_frame_dir() -> str:
+    # แยกตาม user + ตำแหน่งของโค้ด → สอง deployment บนเครื่องเดียวไม่ใช้ lock / manifest ร่วมกัน
+    uid = os.getuid() if hasattr(os, "getuid") else 0
+    checkout = hashlib.sha1(os.path.dirname(os.path.abspath(__file__)).encode("utf-8")).hexdigest()[:10]
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, f"decarbonator-{uid}-{checkout}")
+
+
 class Settings:
     PROJECT_NAME = "Decarbonator API"
     VERSION = "1.0.0"
@@ -12,9 +23,63 @@ class Settings:
     WISE4051_FOLDER = os.getenv("WISE4051_FOLDER")
     WISE4012_FOLDER = os.getenv("WISE4012_FOLDER")
 
+    # Dropbox HTTP client (backend/dropbox/client.py)
+    DROPBOX_MAX_CONNECTIONS = int(os.getenv("DROPBOX_MAX_CONNECTIONS", "8"))
+    DROPBOX_TIMEOUT = float(os.getenv("DROPBOX_TIMEOUT", "60"))
+    DROPBOX_MAX_RETRIES = int(os.getenv("DROPBOX_MAX_RETRIES", "5"))
+
     MONGODB_URL = os.getenv("MONGODB_URL")
     DATABASE_NAME = os.getenv("DATABASE_NAME")
 
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+    # Device registry / sync
+    # คู่ device หลัก (CO₂, bioelectric) ที่ใช้กับ /carbon/co2/all, /carbon/elec/all, aligned view และ chat
+    PRIMARY_DEVICES = os.getenv("PRIMARY_DEVICES", "wise4051,wise4012").split(",")
+    SYNC_WORKERS = int(os.getenv("SYNC_WORKERS", "4"))
+    # จำนวน day partition ที่เก็บไว้ใน memory สำหรับ query ย้อนหลัง (/history)
+    HISTORY_PARTITION_CACHE = int(os.getenv("HISTORY_PARTITION_CACHE", "62"))
+
+    # Request execution (backend/core/execution.py)
+    # IO_WORKERS threads สำหรับงานรอ I/O, CPU_WORKERS process สำหรับ aggregate / export (0 = ใช้ thread)
+    IO_WORKERS = int(os.getenv("IO_WORKERS", "8"))
+    CPU_WORKERS = int(os.getenv("CPU_WORKERS", "2"))
+    # เกินจำนวนนี้ (กำลังทำ + รอคิว) → 503 ทันที
+    IO_MAX_PENDING = int(os.getenv("IO_MAX_PENDING", "64"))
+    CPU_MAX_PENDING = int(os.getenv("CPU_MAX_PENDING", "16"))
+    # frame ที่ส่งให้ CPU workers ผ่าน memory-mapped files (backend/dropbox/shared_frames.py)
+    # ต้องเป็นของ user ที่รัน API และเปิดให้เจ้าของเท่านั้น (0700) ไม่งั้นไม่ยอมใช้
+    SHARED_FRAME_DIR = os.getenv("SHARED_FRAME_DIR", _default_shared_frame_dir())
+    SHARED_FRAME_KEEP = int(os.getenv("SHARED_FRAME_KEEP", "2"))
+    # uvicorn --workers N: process เดียว (ได้ lock) sync จาก Dropbox, worker อื่น map snapshot ใน SHARED_FRAME_DIR
+    SHARED_SNAPSHOT = os.getenv("SHARED_SNAPSHOT", "false").lower() in ("1", "true", "yes")
+    SNAPSHOT_POLL_SECONDS = float(os.getenv("SNAPSHOT_POLL_SECONDS", "1"))
+
+    # HTTP push ingest (/ingest/{device_id})
+    INGEST_TOKEN = os.getenv("INGEST_TOKEN")
+    INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "256"))
+
+    # Sensor fault detection at ingest (backend/dropbox/quality.py)
+    QUALITY_CHECKS = os.getenv("QUALITY_CHECKS", "true").lower() in ("1", "true", "yes")
+    QUALITY_WINDOW = int(os.getenv("QUALITY_WINDOW", "31"))
+    QUALITY_SPIKE_K = float(os.getenv("QUALITY_SPIKE_K", "6.0"))
+    QUALITY_MISSING_BURST = int(os.getenv("QUALITY_MISSING_BURST", "5"))
+    QUALITY_ALERT_RETENTION = int(os.getenv("QUALITY_ALERT_RETENTION", "1000"))
+
+    # Prediction: โหลด autogluon + model ใน background หลัง startup (ค่าเริ่มต้น: โหลดตอนเรียกครั้งแรก)
+    PREDICT_WARMUP = os.getenv("PREDICT_WARMUP", "false").lower() in ("1", "true", "yes")
+    # ensemble | best | pruned | distilled (ดู backend/ml/profiles.py)
+    PREDICT_PROFILE = os.getenv("PREDICT_PROFILE", "ensemble")
+
+    # Per-request / sync-cycle profiling (backend/core/profiling.py), off by default
+    PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+    PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+    PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+    PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+    PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+
+    # Carbon accounting
+    WISE4051_PLANT_ID = os.getenv("WISE4051_PLANT_ID", "wise4051")
+    CHAMBER_VOLUME_M3 = float(os.getenv("CHAMBER_VOLUME_M3", "1.0"))
+
 settings = Settings()
\ No newline at end of file
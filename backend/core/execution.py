@@ -0,0 +1,173 @@
+# backend/core/execution.py
+"""
+Where request work runs.
+
+    await run_io(fn, *args)     thread pool (IO_WORKERS): cache / Dropbox reads,
+                                small pandas slices, model inference
+    await run_cpu(fn, *args)    process pool (CPU_WORKERS): aggregation, downsampling
+                                and JSON export of whole frames, off the GIL
+
+fn for run_cpu must be a module-level function with picklable arguments;
+frames reach the workers through backend/dropbox/shared_frames.py, and
+results should be small (e.g. the encoded JSON body). CPU_WORKERS=0 runs
+CPU work on the thread pool instead.
+
+Admission control: each pool accepts at most *_MAX_PENDING requests
+(running + queued). Beyond that run_* raises Overloaded, answered with
+503 + Retry-After (main.py), so a burst fails fast instead of piling up
+behind the sync loop.
+"""
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Callable, Dict, Optional, TypeVar
+
+from backend.core import metrics
+from backend.core.config import settings
+
+T = TypeVar("T")
+
+RETRY_AFTER = 1   # วินาที
+
+
+class Overloaded(Exception):
+    def __init__(self, pool: str):
+        super().__init__(f"Server busy ({pool} pool full), retry shortly")
+        self.pool = pool
+
+
+# ─────────────────────────────────────────────────────────────
+# Pools
+# ─────────────────────────────────────────────────────────────
+class _Pool:
+    def __init__(self, name: str, max_pending: int):
+        self.name = name
+        self.max_pending = max_pending
+        self.pending = 0            # แก้เฉพาะใน event loop thread
+        self.rejected = 0
+        self.executor: Optional[Executor] = None
+
+    async def run(self, fn: Callable[..., T], *args) -> T:
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise Overloaded(self.name)
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor(), partial(fn, *args))
+        finally:
+            self.pending -= 1
+
+    def _executor(self) -> Executor:
+        raise NotImplementedError
+
+
+class _ThreadPool(_Pool):
+    def _executor(self) -> Executor:
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=settings.IO_WORKERS, thread_name_prefix="api-io")
+        return self.executor
+
+
+class _ProcessPool(_Pool):
+    _lock = threading.Lock()
+
+    def _executor(self) -> Executor:
+        with self._lock:
+            if self.executor is None:
+                # spawn: fork หลังมี thread (sync loop, pools) ไม่ปลอดภัย
+                self.executor = ProcessPoolExecutor(
+                    max_workers=settings.CPU_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                )
+        return self.executor
+
+    async def run(self, fn: Callable[..., T], *args) -> T:
+        try:
+            return await super().run(fn, *args)
+        except BrokenProcessPool:
+            # worker ตาย (เช่น OOM) → สร้าง pool ใหม่ในครั้งถัดไป
+            print("⚠️ CPU pool broken, restarting")
+            self.shutdown()
+            raise
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = None
+
+
+_io = _ThreadPool("io", settings.IO_MAX_PENDING)
+_cpu = _ProcessPool("cpu", settings.CPU_MAX_PENDING)
+
+
+def _init_worker() -> None:
+    # import pandas / service ครั้งเดียวตอน worker เริ่ม ไม่ใช่ใน request แรก
+    import backend.dropbox.service  # noqa: F401
+
+
+def _ping() -> bool:
+    return True
+
+
+def cpu_enabled() -> bool:
+    return settings.CPU_WORKERS > 0
+
+
+async def run_io(fn: Callable[..., T], *args) -> T:
+    return await _io.run(fn, *args)
+
+
+async def run_cpu(fn: Callable[..., T], *args) -> T:
+    if not cpu_enabled():
+        return await _io.run(fn, *args)
+    return await _cpu.run(fn, *args)
+
+
+def start() -> None:
+    """Spawn the CPU workers now (startup) instead of on the first request."""
+    if cpu_enabled():
+        pool = _cpu._executor()
+        for _ in range(settings.CPU_WORKERS):
+            pool.submit(_ping)
+
+
+def shutdown() -> None:
+    _cpu.shutdown()
+    if _io.executor is not None:
+        _io.executor.shutdown(wait=False)
+        _io.executor = None
+
+
+def get_stats() -> Dict[str, Dict]:
+    return {
+        pool.name: {
+            "workers": settings.IO_WORKERS if pool is _io else settings.CPU_WORKERS,
+            "pending": pool.pending,
+            "max_pending": pool.max_pending,
+            "rejected": pool.rejected,
+        }
+        for pool in (_io, _cpu)
+    }
+
+
+# ─────────────────────────────────────────────────────────────
+# Metrics
+# ─────────────────────────────────────────────────────────────
+def _collect_metrics():
+    stats = get_stats()
+    return [
+        ("pool_pending", "gauge", "Requests running or queued per execution pool",
+         [({"pool": name}, s["pending"]) for name, s in stats.items()]),
+        ("pool_rejected_total", "counter", "Requests answered 503 because the pool was full",
+         [({"pool": name}, s["rejected"]) for name, s in stats.items()]),
+    ]
+
+
+metrics.register_collector(_collect_metrics)
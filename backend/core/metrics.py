@@ -0,0 +1,248 @@
+# backend/core/metrics.py
+"""
+In-process metrics in the Prometheus text format (GET /metrics).
+
+    inc("cache_hits_total", cache="sensor_frame")
+    set_gauge("cache_bytes", n, cache="history")
+    with timed("dropbox_download"):        # → stage_seconds{stage=...}
+        ...
+
+Values other modules already count (Dropbox client, history LRU, quality,
+push ingest, reply cache) are read at scrape time by collectors, so there
+is one source of truth per number. Every name gets the PREFIX.
+"""
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+PREFIX = "decarbonator_"
+
+# วินาที: ตั้งแต่ aggregate ไม่กี่ ms จนถึงโหลด ZIP / model
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+# ─────────────────────────────────────────────────────────────
+# Registry
+# ─────────────────────────────────────────────────────────────
+_lock = threading.Lock()
+
+# name → {"type", "help"}
+_meta: Dict[str, Dict[str, str]] = {}
+
+_counters: Dict[Tuple[str, Labels], float] = {}
+_gauges: Dict[Tuple[str, Labels], float] = {}
+# (name, labels) → {"buckets": [...], "sum", "count"}
+_histograms: Dict[Tuple[str, Labels], Dict] = {}
+
+# capture(): inc / observe ของ thread นี้ไปเก็บใน list แทน registry
+_captured = threading.local()
+
+# เรียกตอน scrape: คืน [(name, type, help, [(labels, value)])]
+_collectors: List[Callable[[], List[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]]] = []
+
+
+def describe(name: str, kind: str, help_text: str) -> None:
+    _meta[name] = {"type": kind, "help": help_text}
+
+
+def _key(name: str, labels: Dict[str, str]) -> Tuple[str, Labels]:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, value: float = 1.0, **labels) -> None:
+    if _capture("inc", name, value, labels):
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0.0) + value
+
+
+def set_gauge(name: str, value: float, **labels) -> None:
+    with _lock:
+        _gauges[_key(name, labels)] = float(value)
+
+
+def observe(name: str, value: float, **labels) -> None:
+    if _capture("observe", name, value, labels):
+        return
+    key = _key(name, labels)
+    with _lock:
+        h = _histograms.get(key)
+        if h is None:
+            h = _histograms[key] = {"buckets": [0] * len(STAGE_BUCKETS), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(STAGE_BUCKETS):
+            if value <= bound:
+                h["buckets"][i] += 1
+        h["sum"] += value
+        h["count"] += 1
+
+
+@contextmanager
+def timed(stage: str, **labels) -> Iterator[None]:
+    """Wall time of the block → stage_seconds{stage=...} (also when it raises)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("stage_seconds", time.perf_counter() - start, stage=stage, **labels)
+
+
+def _capture(kind: str, name: str, value: float, labels: Dict[str, str]) -> bool:
+    events = getattr(_captured, "events", None)
+    if events is None:
+        return False
+    events.append((kind, name, value, labels))
+    return True
+
+
+@contextmanager
+def capture() -> Iterator[List[Tuple[str, str, float, Dict[str, str]]]]:
+    """
+    Collect this thread's inc() / observe() calls instead of recording them.
+    For CPU pool workers: their registry is never scraped, so the task
+    returns the list and the API process replays it with record().
+    """
+    _captured.events = events = []
+    try:
+        yield events
+    finally:
+        _captured.events = None
+
+
+def record(events: List[Tuple[str, str, float, Dict[str, str]]]) -> None:
+    """Replay events from capture() into this process's registry."""
+    for kind, name, value, labels in events:
+        (inc if kind == "inc" else observe)(name, value, **labels)
+
+
+def register_collector(fn: Callable) -> None:
+    _collectors.append(fn)
+
+
+def stage_totals() -> Dict[str, Dict[str, float]]:
+    """stage → {"count", "seconds"} (summed over labels), for logs / benchmarks."""
+    totals: Dict[str, Dict[str, float]] = {}
+    with _lock:
+        for (name, labels), h in _histograms.items():
+            if name != "stage_seconds":
+                continue
+            stage = dict(labels).get("stage", "")
+            t = totals.setdefault(stage, {"count": 0, "seconds": 0.0})
+            t["count"] += h["count"]
+            t["seconds"] += h["sum"]
+    return totals
+
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _histograms.clear()
+
+
+describe("stage_seconds", "histogram", "Wall time per processing stage")
+describe("cache_hits_total", "counter", "Cache lookups answered from memory")
+describe("cache_misses_total", "counter", "Cache lookups that had to load / compute")
+describe("cache_bytes", "gauge", "Memory held by a cache (pandas memory_usage, deep)")
+describe("cache_entries", "gauge", "Entries held by a cache")
+
+
+# ─────────────────────────────────────────────────────────────
+# Process
+# ─────────────────────────────────────────────────────────────
+def _process_samples():
+    samples = [
+        ("process_cpu_seconds_total", "counter", "User + system CPU time of this process",
+         [({}, time.process_time())]),
+        ("process_threads", "gauge", "Live Python threads",
+         [({}, threading.active_count())]),
+    ]
+    try:
+        with open("/proc/self/statm") as f:
+            rss_pages = int(f.read().split()[1])
+        samples.append(("process_resident_memory_bytes", "gauge", "Resident set size",
+                        [({}, rss_pages * os.sysconf("SC_PAGE_SIZE"))]))
+    except (OSError, ValueError, IndexError):
+        pass   # ไม่ใช่ Linux
+    return samples
+
+
+register_collector(_process_samples)
+
+
+# ─────────────────────────────────────────────────────────────
+# Exposition (text format 0.0.4)
+# ─────────────────────────────────────────────────────────────
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels.items() if isinstance(labels, dict) else labels)
+    if extra:
+        items.append(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in items) + "}"
+
+
+def _number(value: float) -> str:
+    value = float(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def render() -> str:
+    families: Dict[str, Dict] = {}
+
+    def family(name: str, kind: str, help_text: str) -> List[str]:
+        fam = families.get(name)
+        if fam is None:
+            fam = families[name] = {"type": kind, "help": help_text, "lines": []}
+        return fam["lines"]
+
+    with _lock:
+        for store, kind in ((_counters, "counter"), (_gauges, "gauge")):
+            for (name, labels), value in store.items():
+                meta = _meta.get(name, {"type": kind, "help": name})
+                family(name, meta["type"], meta["help"]).append(
+                    f"{PREFIX}{name}{_labels(labels)} {_number(value)}"
+                )
+
+        for (name, labels), h in _histograms.items():
+            meta = _meta.get(name, {"type": "histogram", "help": name})
+            lines = family(name, "histogram", meta["help"])
+            for bound, n in zip(STAGE_BUCKETS, h["buckets"]):
+                lines.append(f"{PREFIX}{name}_bucket{_labels(labels, ('le', _number(bound)))} {n}")
+            lines.append(f"{PREFIX}{name}_bucket{_labels(labels, ('le', '+Inf'))} {h['count']}")
+            lines.append(f"{PREFIX}{name}_sum{_labels(labels)} {repr(h['sum'])}")
+            lines.append(f"{PREFIX}{name}_count{_labels(labels)} {h['count']}")
+
+    for collector in list(_collectors):
+        try:
+            collected = collector()
+        except Exception as e:
+            print(f"⚠️ Metrics collector {getattr(collector, '__name__', collector)} failed: {e}")
+            continue
+        for name, kind, help_text, values in collected:
+            lines = family(name, kind, help_text)
+            for labels, value in values:
+                lines.append(f"{PREFIX}{name}{_labels(labels)} {_number(value)}")
+
+    out = []
+    for name, fam in families.items():
+        out.append(f"# HELP {PREFIX}{name} {fam['help']}")
+        out.append(f"# TYPE {PREFIX}{name} {fam['type']}")
+        out.extend(fam["lines"])
+    return "\n".join(out) + "\n"
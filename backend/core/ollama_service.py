@@ -1,10 +1,25 @@
 # backend/core/ollama_service.py
-import requests
+import asyncio
+import json
 import math
-from typing import Optional
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+import httpx
+import numpy as np
+import pandas as pd
+import requests
 
+from backend.core import metrics
 from backend.dropbox.service import (
     get_sensor_cache,
+    get_aligned_frame,
+    get_sensor_snapshot_version,
+    CO2_DEVICE_ID,
+    ELEC_DEVICE_ID,
     CO2_COL,
     TEMP_COL,
     HUMID_COL,
@@ -14,22 +29,30 @@ from backend.dropbox.service import (
 # OLLAMA_HOST=127.0.0.1:8001
 OLLAMA_URL = "http://127.0.0.1:8001/api/chat"
 MODEL_NAME = "llama3"
+OLLAMA_TIMEOUT = 120.0
+
+# cache คำตอบ: key = (snapshot version, คำถามที่ normalize แล้ว, model)
+REPLY_CACHE_SIZE = 256
+REPLY_CACHE_TTL = 300.0  # วินาที
 
 
 def _fmt(x: Optional[float]) -> str:
     if x is None:
         return "-"
-    if isinstance(x, float) and (math.isnan(x) or math.isinf(x)):
+    if isinstance(x, (float, np.floating)) and (math.isnan(x) or math.isinf(x)):
         return "-"
     return f"{x:.2f}"
 
 
 def build_sensor_context() -> str:
     cache = get_sensor_cache()
-    wise4051 = cache["wise4051"]["data"]
-    wise4012 = cache["wise4012"]["data"]
-    updated4051 = cache["wise4051"]["last_updated"]
-    updated4012 = cache["wise4012"]["last_updated"]
+    empty = {"data": None, "last_updated": None}
+    entry4051 = cache.get(CO2_DEVICE_ID, empty)
+    entry4012 = cache.get(ELEC_DEVICE_ID, empty)
+    wise4051 = entry4051["data"]
+    wise4012 = entry4012["data"]
+    updated4051 = entry4051["last_updated"]
+    updated4012 = entry4012["last_updated"]
 
     if wise4051 is None or wise4051.empty:
         return "ยังไม่มีข้อมูลเซนเซอร์จากระบบใน cache"
@@ -88,7 +111,11 @@ def build_sensor_context() -> str:
     updated4012_text = "ไม่ทราบเวลาอัปเดต"
 
     if wise4012 is not None and not wise4012.empty:
+        # ใช้แถวที่ align กับเวลา CO₂ ล่าสุด ถ้ามี ไม่งั้นใช้แถวสุดท้ายของ 4012
+        aligned = get_aligned_frame()
         latest4012 = wise4012.iloc[-1]
+        if aligned is not None and not aligned.empty and not pd.isna(aligned.iloc[-1].get(LEAF_COL)):
+            latest4012 = aligned.iloc[-1]
         leaf_latest = latest4012.get(LEAF_COL)
         ground_latest = latest4012.get(GROUND_COL)
         if updated4012:
@@ -110,8 +137,8 @@ def build_sensor_context() -> str:
 
 [WISE-4012 | Leaf / Ground Bioelectric]
 - เวลาอัปเดตล่าสุด: {updated4012_text}
-- Leaf bioelectric ล่าสุด: {_fmt(leaf_latest)}
-- Ground bioelectric ล่าสุด: {_fmt(ground_latest)}
+- Leaf bioelectric ล่าสุด: {_fmt(leaf_latest)} V
+- Ground bioelectric ล่าสุด: {_fmt(ground_latest)} V
 
 สรุปแนวคิดสำหรับการวิเคราะห์:
 - ถ้า CO₂ มีแนวโน้มลดลง พร้อมกับอุณหภูมิและความชื้นอยู่ในช่วงเหมาะสม มักบ่งบอกว่าการสังเคราะห์แสงและการดูดซับคาร์บอนของพืชทำงานได้ดี
@@ -120,8 +147,10 @@ def build_sensor_context() -> str:
     return context.strip()
 
 
-def ask_carbon_status_ollama(user_message: str) -> str:
-    system_prompt = """
+# ─────────────────────────────────────────────────────────────
+# Prompt
+# ─────────────────────────────────────────────────────────────
+SYSTEM_PROMPT = """
 คุณคือผู้ช่วยวิเคราะห์สภาพแวดล้อมและการดูดซับคาร์บอน
 สำหรับโครงการ Decarbonator3000 ซึ่งมีเซนเซอร์ดังนี้:
 
@@ -145,19 +174,266 @@ def ask_carbon_status_ollama(user_message: str) -> str:
 - ย่อหน้าสุดท้าย: ข้อเสนอแนะง่าย ๆ (เช่น ปรับการระบายอากาศ หรือเฝ้าดูต่อ)
 """
 
-    sensor_context = build_sensor_context()
 
-    payload = {
+# ─────────────────────────────────────────────────────────────
+# Sensor context cache (1 ครั้งต่อ snapshot version)
+# ─────────────────────────────────────────────────────────────
+_context_cache = {"version": None, "text": None}
+
+
+def get_sensor_context() -> str:
+    """
+    build_sensor_context() memoized on the sensor snapshot version,
+    so chat messages between two syncs reuse the same string.
+    """
+    version = get_sensor_snapshot_version()
+    if version and _context_cache["version"] == version:
+        metrics.inc("cache_hits_total", cache="sensor_context")
+        return _context_cache["text"]
+
+    metrics.inc("cache_misses_total", cache="sensor_context")
+    with metrics.timed("sensor_context"):
+        text = build_sensor_context()
+    if version:
+        _context_cache["version"] = version
+        _context_cache["text"] = text
+    return text
+
+
+def _build_payload(user_message: str, stream: bool) -> dict:
+    return {
         "model": MODEL_NAME,
-        "stream": False,
+        "stream": stream,
         "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "system", "content": sensor_context},
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "system", "content": get_sensor_context()},
             {"role": "user", "content": user_message},
         ],
     }
 
-    resp = requests.post(OLLAMA_URL, json=payload)
+
+# ─────────────────────────────────────────────────────────────
+# Pooled async HTTP client
+# ─────────────────────────────────────────────────────────────
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(OLLAMA_TIMEOUT, connect=5.0),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+    return _http_client
+
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+# ─────────────────────────────────────────────────────────────
+# Chat
+# ─────────────────────────────────────────────────────────────
+def ask_carbon_status_ollama(user_message: str) -> str:
+    """Blocking version (scripts / notebooks)."""
+    with metrics.timed("ollama"):
+        resp = requests.post(OLLAMA_URL, json=_build_payload(user_message, stream=False))
+    resp.raise_for_status()
+    data = resp.json()
+    return data["message"]["content"]
+
+
+async def ask_carbon_status_ollama_async(user_message: str) -> str:
+    client = get_http_client()
+    with metrics.timed("ollama"):
+        resp = await client.post(OLLAMA_URL, json=_build_payload(user_message, stream=False))
     resp.raise_for_status()
     data = resp.json()
-    return data["message"]["content"]
\ No newline at end of file
+    return data["message"]["content"]
+
+
+async def stream_carbon_status_ollama(user_message: str) -> AsyncIterator[str]:
+    """
+    Yield reply tokens as Ollama produces them (NDJSON stream).
+    """
+    client = get_http_client()
+    payload = _build_payload(user_message, stream=True)
+
+    # ollama = ทั้งคำตอบ, ollama_first_token = เวลาจนได้ token แรก
+    start = time.perf_counter()
+    first = True
+    try:
+        async with client.stream("POST", OLLAMA_URL, json=payload) as resp:
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                token = chunk.get("message", {}).get("content")
+                if token:
+                    if first:
+                        metrics.observe("stage_seconds", time.perf_counter() - start, stage="ollama_first_token")
+                        first = False
+                    yield token
+                if chunk.get("done"):
+                    break
+    finally:
+        metrics.observe("stage_seconds", time.perf_counter() - start, stage="ollama")
+
+
+# ─────────────────────────────────────────────────────────────
+# Reply cache (LRU + TTL + in-flight dedup)
+# ─────────────────────────────────────────────────────────────
+ReplyKey = Tuple[int, str, str]
+
+_reply_cache: "OrderedDict[ReplyKey, Tuple[float, str]]" = OrderedDict()
+_inflight: Dict[ReplyKey, asyncio.Task] = {}
+_reply_stats = {"hits": 0, "misses": 0, "inflight_joins": 0, "expired": 0}
+
+_PUNCT_TAIL = re.compile(r"[\s?？!！.。]+$")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_message(message: str) -> str:
+    text = unicodedata.normalize("NFC", message).strip().lower()
+    text = _SPACES.sub(" ", text)
+    return _PUNCT_TAIL.sub("", text)
+
+
+def _reply_key(message: str) -> ReplyKey:
+    return (get_sensor_snapshot_version(), normalize_message(message), MODEL_NAME)
+
+
+def _reply_cache_get(key: ReplyKey) -> Optional[str]:
+    item = _reply_cache.get(key)
+    if item is None:
+        return None
+    expires_at, reply = item
+    if expires_at < time.monotonic():
+        del _reply_cache[key]
+        _reply_stats["expired"] += 1
+        return None
+    _reply_cache.move_to_end(key)
+    return reply
+
+
+def _reply_cache_put(key: ReplyKey, reply: str) -> None:
+    _reply_cache[key] = (time.monotonic() + REPLY_CACHE_TTL, reply)
+    _reply_cache.move_to_end(key)
+    while len(_reply_cache) > REPLY_CACHE_SIZE:
+        _reply_cache.popitem(last=False)
+
+
+def get_reply_cache_stats() -> dict:
+    lookups = _reply_stats["hits"] + _reply_stats["misses"] + _reply_stats["inflight_joins"]
+    return {
+        **_reply_stats,
+        "size": len(_reply_cache),
+        "inflight": len(_inflight),
+        "hit_ratio": (
+            (_reply_stats["hits"] + _reply_stats["inflight_joins"]) / lookups
+            if lookups else 0.0
+        ),
+    }
+
+
+def _collect_metrics():
+    labels = {"cache": "ollama_reply"}
+    return [
+        ("cache_hits_total", "counter", "Cache lookups answered from memory",
+         [(labels, _reply_stats["hits"] + _reply_stats["inflight_joins"])]),
+        ("cache_misses_total", "counter", "Cache lookups that had to load / compute",
+         [(labels, _reply_stats["misses"])]),
+        ("cache_entries", "gauge", "Entries held by a cache", [(labels, len(_reply_cache))]),
+    ]
+
+
+metrics.register_collector(_collect_metrics)
+
+
+def clear_reply_cache() -> None:
+    _reply_cache.clear()
+
+
+def _track(key: ReplyKey, task: asyncio.Task) -> asyncio.Task:
+    # ลงทะเบียนงาน generate ของ key → คำถามเดียวกัน (stream หรือไม่) รอผลเดียวกัน
+    _inflight[key] = task
+
+    def _done(t: asyncio.Task) -> None:
+        _inflight.pop(key, None)
+        if not t.cancelled() and t.exception() is None:
+            _reply_cache_put(key, t.result())
+
+    task.add_done_callback(_done)
+    return task
+
+
+async def ask_carbon_status_cached(user_message: str) -> str:
+    """
+    ask_carbon_status_ollama_async() with a reply cache.
+    Concurrent identical questions share one in-flight generation.
+    """
+    key = _reply_key(user_message)
+
+    reply = _reply_cache_get(key)
+    if reply is not None:
+        _reply_stats["hits"] += 1
+        return reply
+
+    task = _inflight.get(key)
+    if task is not None:
+        _reply_stats["inflight_joins"] += 1
+        return await asyncio.shield(task)
+
+    _reply_stats["misses"] += 1
+    task = _track(key, asyncio.ensure_future(ask_carbon_status_ollama_async(user_message)))
+    # shield: ถ้า client ตัดการเชื่อมต่อ งาน generate ยังทำต่อให้คนอื่นที่รออยู่
+    return await asyncio.shield(task)
+
+
+async def _stream_to_queue(user_message: str, tokens: "asyncio.Queue[Optional[str]]") -> str:
+    parts = []
+    try:
+        async for token in stream_carbon_status_ollama(user_message):
+            parts.append(token)
+            tokens.put_nowait(token)
+    finally:
+        tokens.put_nowait(None)     # จบ stream (สำเร็จหรือ error)
+    return "".join(parts)
+
+
+async def stream_carbon_status_cached(user_message: str) -> AsyncIterator[str]:
+    """
+    Streaming variant: cached / in-flight replies are sent as one chunk,
+    otherwise tokens are streamed and the full reply is cached at the end.
+    A streamed miss is in-flight like any other, so identical questions
+    (streamed or not) asked meanwhile wait for it instead of calling Ollama.
+    """
+    key = _reply_key(user_message)
+
+    reply = _reply_cache_get(key)
+    if reply is not None:
+        _reply_stats["hits"] += 1
+        yield reply
+        return
+
+    task = _inflight.get(key)
+    if task is not None:
+        _reply_stats["inflight_joins"] += 1
+        yield await asyncio.shield(task)
+        return
+
+    _reply_stats["misses"] += 1
+    tokens: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+    # generate ใน task แยก: client ตัดการเชื่อมต่อ → คนที่ join อยู่ยังได้คำตอบ
+    task = _track(key, asyncio.ensure_future(_stream_to_queue(user_message, tokens)))
+    while True:
+        token = await tokens.get()
+        if token is None:
+            break
+        yield token
+    await task     # error ของ Ollama → raise ที่นี่
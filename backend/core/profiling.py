@@ -0,0 +1,254 @@
+# backend/core/profiling.py
+"""
+Opt-in sampling profiler for single requests and sync cycles.
+
+    PROFILING_ENABLED=true          middleware is installed (off: not even that)
+    request header  X-Profile: 1    (or the PROFILE_TOKEN value if one is set)
+    response header X-Profile-Artifact: <name>  → GET /profiles/<name>
+    POST /profiles/sync             profile the next sync_loop cycle
+
+While a session runs, a background thread samples the stacks of every
+thread (sys._current_frames) each PROFILE_INTERVAL_MS, so work handed to
+thread pools (conditional_json, asyncio.to_thread, the sync executor) is
+included. Idle threads (waiting on a queue / selector / lock, or in
+time.sleep like sync_loop) are skipped.
+
+Artifacts are folded stacks ("thread;outer;…;inner count" per line) in
+PROFILE_DIR, the input format of flamegraph.pl and speedscope.app.
+One session at a time; a request that arrives while another is being
+profiled simply runs unprofiled.
+"""
+import asyncio
+import linecache
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from backend.core.config import settings
+
+
+ARTIFACT_SUFFIX = ".folded"
+MAX_DEPTH = 128
+
+# leaf frame ใน module เหล่านี้ = thread กำลังรอ ไม่ได้ทำงาน
+_IDLE_FILES = ("threading.py", "selectors.py", "queue.py", os.path.join("concurrent", "futures", "thread.py"))
+# time.sleep เป็น C ไม่มี frame → leaf คือบรรทัดที่เรียก sleep() (เช่น sync_loop ใน main.py)
+_SLEEP_RE = re.compile(r"\bsleep\(")
+_sleep_lines: Dict[Tuple[str, int], bool] = {}
+
+_NAME_RE = re.compile(r"^[\w.-]+\.folded$")
+
+_session_lock = threading.Lock()
+_sync_requested = threading.Event()
+
+
+# ─────────────────────────────────────────────────────────────
+# Sampler
+# ─────────────────────────────────────────────────────────────
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _is_idle(frame) -> bool:
+    filename = frame.f_code.co_filename
+    if filename.endswith(_IDLE_FILES):
+        return True
+    key = (filename, frame.f_lineno)
+    idle = _sleep_lines.get(key)
+    if idle is None:
+        idle = _sleep_lines[key] = bool(_SLEEP_RE.search(linecache.getline(filename, frame.f_lineno)))
+    return idle
+
+
+class _Sampler(threading.Thread):
+    def __init__(self, interval: float):
+        super().__init__(daemon=True, name="profiler")
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self.ticks = 0
+        self._done = threading.Event()
+
+    def run(self) -> None:
+        own = threading.get_ident()
+        while not self._done.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own or _is_idle(frame):
+                    continue
+                stack: List[str] = []
+                while frame is not None and len(stack) < MAX_DEPTH:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.samples[";".join(reversed(stack))] += 1
+            self.ticks += 1
+
+    def stop(self) -> None:
+        self._done.set()
+        self.join()
+
+
+class Session:
+    """One profile: start() → work → stop() writes the artifact."""
+
+    def __init__(self, label: str):
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        safe = re.sub(r"[^\w-]+", "_", label).strip("_")[:60] or "profile"
+        self.name = f"{stamp}-{safe}{ARTIFACT_SUFFIX}"
+        self.sampler = _Sampler(settings.PROFILE_INTERVAL_MS / 1000.0)
+        self.started = time.perf_counter()
+
+    def start(self) -> "Session":
+        self.sampler.start()
+        return self
+
+    def stop(self) -> Optional[str]:
+        self.sampler.stop()
+        _session_lock.release()
+        elapsed = time.perf_counter() - self.started
+        try:
+            return _write(self.name, self.sampler.samples)
+        finally:
+            print(f"🔬 Profile {self.name}: {elapsed:.2f}s, {self.sampler.ticks} ticks")
+
+
+def start_session(label: str) -> Optional[Session]:
+    """New running session, or None if another one is in progress."""
+    if not _session_lock.acquire(blocking=False):
+        return None
+    try:
+        return Session(label).start()
+    except Exception:
+        _session_lock.release()
+        raise
+
+
+@contextmanager
+def profile(label: str) -> Iterator[Optional[Session]]:
+    session = start_session(label)
+    try:
+        yield session
+    finally:
+        if session is not None:
+            session.stop()
+
+
+# ─────────────────────────────────────────────────────────────
+# Sync loop (on demand)
+# ─────────────────────────────────────────────────────────────
+def request_sync_profile() -> None:
+    _sync_requested.set()
+
+
+def sync_profile_pending() -> bool:
+    return _sync_requested.is_set()
+
+
+@contextmanager
+def sync_cycle() -> Iterator[None]:
+    """Profile this sync cycle if one was requested (POST /profiles/sync)."""
+    if not settings.PROFILING_ENABLED or not _sync_requested.is_set():
+        yield
+        return
+    _sync_requested.clear()
+    with profile("sync_cycle"):
+        yield
+
+
+# ─────────────────────────────────────────────────────────────
+# Artifacts
+# ─────────────────────────────────────────────────────────────
+def _write(name: str, samples: Counter) -> str:
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    path = os.path.join(settings.PROFILE_DIR, name)
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, n in samples.most_common():
+            f.write(f"{stack} {n}\n")
+    _prune()
+    return path
+
+
+def _prune() -> None:
+    files = list_artifacts()
+    for entry in files[settings.PROFILE_KEEP:]:
+        try:
+            os.remove(os.path.join(settings.PROFILE_DIR, entry["name"]))
+        except OSError:
+            pass
+
+
+def list_artifacts() -> List[Dict]:
+    """Newest first."""
+    if not os.path.isdir(settings.PROFILE_DIR):
+        return []
+    entries = []
+    for name in os.listdir(settings.PROFILE_DIR):
+        if _NAME_RE.match(name):
+            path = os.path.join(settings.PROFILE_DIR, name)
+            stat = os.stat(path)
+            entries.append({"name": name, "bytes": stat.st_size, "created": stat.st_mtime})
+    return sorted(entries, key=lambda e: e["name"], reverse=True)
+
+
+def artifact_path(name: str) -> Optional[str]:
+    if not _NAME_RE.match(name):
+        return None
+    path = os.path.join(settings.PROFILE_DIR, name)
+    return path if os.path.isfile(path) else None
+
+
+def authorized(header_value: Optional[str]) -> bool:
+    if header_value is None:
+        return False
+    if settings.PROFILE_TOKEN:
+        return header_value == settings.PROFILE_TOKEN
+    return header_value.strip().lower() not in ("", "0", "false", "no")
+
+
+# ─────────────────────────────────────────────────────────────
+# ASGI middleware
+# ─────────────────────────────────────────────────────────────
+class ProfilingMiddleware:
+    """
+    Profiles requests carrying the X-Profile header. Other requests cost
+    one header scan; install only when PROFILING_ENABLED.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        value = None
+        for key, raw in scope.get("headers", ()):
+            if key == b"x-profile":
+                value = raw.decode("latin-1")
+                break
+        if not authorized(value) or scope["path"].startswith("/profiles"):
+            return await self.app(scope, receive, send)
+
+        session = start_session(f"{scope['method']} {scope['path']}")
+        artifact = session.name if session else "busy"
+
+        async def send_with_header(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-artifact", artifact.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_header)
+        finally:
+            if session is not None:
+                # join sampler + เขียนไฟล์ นอก event loop
+                await asyncio.get_running_loop().run_in_executor(None, session.stop)
@@ -0,0 +1,95 @@
+# backend/dropbox/catalog.py
+"""
+Metric catalog: raw WISE register → named engineering-unit column.
+
+Applied once per CSV at ingest, so every consumer (API, chat context,
+prediction, accounting) sees the same compact float32 columns and no one
+renames or rescales registers per request.
+
+    value = (raw + offset) * scale
+
+`quality` (optional) holds the plausibility rules used by
+backend/dropbox/quality.py, in engineering units:
+
+    range     (min, max), None = open ended
+    max_rate  largest believable change per second
+    flatline  an unchanged value for this long is a stuck sensor
+    spike     smallest deviation from the rolling median that counts as a spike
+"""
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+
+# ─────────────────────────────────────────────────────────────
+# Catalog
+# ─────────────────────────────────────────────────────────────
+_ADC_OFFSET = -32768.0
+_ADC_SCALE = 20.0 / 65535.0   # ±10 V over 16-bit
+
+DEVICE_CATALOG: Dict[str, Dict[str, Dict]] = {
+    "wise4051": {
+        "COM_1 Wd_0": {"name": "carbon", "unit": "ppm", "scale": 1.0, "dtype": "float32",
+                       "quality": {"range": (0.0, 10000.0), "max_rate": 20.0, "flatline": "30min", "spike": 25.0}},
+        "COM_1 Wd_1": {"name": "Temp", "unit": "°C", "scale": 0.01, "dtype": "float32",
+                       "quality": {"range": (-20.0, 70.0), "max_rate": 0.1, "flatline": "2h", "spike": 1.0}},
+        "COM_1 Wd_2": {"name": "Humidity", "unit": "%", "scale": 0.01, "dtype": "float32",
+                       "quality": {"range": (0.0, 100.0), "max_rate": 1.0, "flatline": "2h", "spike": 5.0}},
+        "COM_1 Wd_4": {"name": "light_intensity", "unit": "raw", "scale": 1.0, "dtype": "float32",
+                       "quality": {"range": (0.0, None)}},
+        "COM_1 Wd_6": {"name": "lux", "unit": "lx", "scale": 1.0, "dtype": "float32",
+                       "quality": {"range": (0.0, None)}},
+    },
+    "wise4012": {
+        "AI_0 Val": {"name": "Leaf_Voltage", "unit": "V", "offset": _ADC_OFFSET, "scale": _ADC_SCALE, "dtype": "float32",
+                     "quality": {"range": (-10.0, 10.0), "flatline": "30min", "spike": 0.05}},
+        "AI_1 Val": {"name": "Ground_Voltage", "unit": "V", "offset": _ADC_OFFSET, "scale": _ADC_SCALE, "dtype": "float32",
+                     "quality": {"range": (-10.0, 10.0), "flatline": "30min", "spike": 0.05}},
+        "AI_2 Val": {"name": "Pure_Voltage", "unit": "V", "offset": _ADC_OFFSET, "scale": _ADC_SCALE, "dtype": "float32"},
+        "DI_0": {"name": "DI_0", "unit": "bool", "scale": 1.0, "dtype": "int8"},
+        "DI_1": {"name": "DI_1", "unit": "bool", "scale": 1.0, "dtype": "int8"},
+        "DI_2": {"name": "DI_2", "unit": "bool", "scale": 1.0, "dtype": "int8"},
+    },
+}
+
+
+def metric_names(device: str) -> List[str]:
+    return [spec["name"] for spec in DEVICE_CATALOG.get(device, {}).values()]
+
+
+def describe(device: str) -> List[Dict]:
+    return [
+        {"register": reg, **spec}
+        for reg, spec in DEVICE_CATALOG.get(device, {}).items()
+    ]
+
+
+# ─────────────────────────────────────────────────────────────
+# Apply
+# ─────────────────────────────────────────────────────────────
+def apply_catalog(df: pd.DataFrame, device: str) -> pd.DataFrame:
+    """
+    Replace catalogued raw registers with named, scaled, typed columns.
+    Columns not in the catalog are passed through unchanged.
+    """
+    catalog = DEVICE_CATALOG.get(device)
+    if not catalog or df is None or df.empty:
+        return df
+
+    present = [reg for reg in catalog if reg in df.columns]
+    if not present:
+        return df
+
+    named = {}
+    for reg in present:
+        spec = catalog[reg]
+        values = pd.to_numeric(df[reg], errors="coerce").to_numpy(dtype=np.float64)
+        values = (values + spec.get("offset", 0.0)) * spec.get("scale", 1.0)
+
+        dtype = np.dtype(spec["dtype"])
+        if np.issubdtype(dtype, np.integer):
+            values = np.nan_to_num(values)
+        named[spec["name"]] = values.astype(dtype)
+
+    return df.drop(columns=present).assign(**named)
@@ -1,10 +1,152 @@
 # app/dropbox/client.py
+"""
+One Dropbox client per process.
+
+- pooled keep-alive HTTP session (dropbox.create_session)
+- configurable timeout / pool size (DROPBOX_TIMEOUT, DROPBOX_MAX_CONNECTIONS)
+- call() retries rate limits (honouring Dropbox's retry_after) and
+  transient errors with exponential backoff + jitter
+- request / byte / retry counters, overall and per sync cycle
+"""
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional, TypeVar
+
 import dropbox
+import requests
+from dropbox.exceptions import InternalServerError, RateLimitError
+
+from backend.core import metrics
+from backend.core.config import settings
 from backend.dropbox import env
 
+T = TypeVar("T")
+
+BACKOFF_BASE = 1.0    # วินาที
+BACKOFF_CAP = 60.0
+
+_client: Optional[dropbox.Dropbox] = None
+_client_lock = threading.Lock()
+
+
 def get_client() -> dropbox.Dropbox:
     """
-    สร้าง Dropbox client จาก access token ใน .env
+    สร้าง Dropbox client จาก access token ใน .env (ครั้งเดียว ใช้ซ้ำทั้ง process)
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                session = dropbox.create_session(
+                    max_connections=settings.DROPBOX_MAX_CONNECTIONS,
+                )
+                _client = dropbox.Dropbox(
+                    env.DROPBOX_TOKEN,
+                    session=session,
+                    timeout=settings.DROPBOX_TIMEOUT,
+                    # retry จัดการเองใน call() เพื่อให้มีเพดานและนับ metrics ได้
+                    max_retries_on_error=0,
+                    max_retries_on_rate_limit=0,
+                )
+    return _client
+
+
+def close_client() -> None:
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+# ─────────────────────────────────────────────────────────────
+# Metrics
+# ─────────────────────────────────────────────────────────────
+_metrics_lock = threading.Lock()
+_FIELDS = ("requests", "bytes", "retries", "rate_limited", "errors")
+_totals: Dict[str, float] = {f: 0 for f in _FIELDS}
+_cycle: Dict[str, float] = {f: 0 for f in _FIELDS}
+
+
+def _count(field: str, n: float = 1) -> None:
+    with _metrics_lock:
+        _totals[field] += n
+        _cycle[field] += n
+
+
+def record_bytes(n: int) -> None:
+    _count("bytes", n)
+
+
+def get_metrics() -> Dict[str, float]:
+    with _metrics_lock:
+        return dict(_totals)
+
+
+_HELP = {
+    "requests": "Dropbox API calls (retries included)",
+    "bytes": "Bytes downloaded from Dropbox",
+    "retries": "Dropbox API calls retried",
+    "rate_limited": "Dropbox rate-limit responses",
+    "errors": "Dropbox API calls that failed after all retries",
+}
+
+
+def _collect_metrics():
+    totals = get_metrics()
+    return [
+        (f"dropbox_{field}_total", "counter", _HELP[field], [({}, totals[field])])
+        for field in _FIELDS
+    ]
+
+
+metrics.register_collector(_collect_metrics)
+
+
+def take_cycle_metrics() -> Dict[str, float]:
+    """Counters since the previous call (one sync cycle), then reset them."""
+    with _metrics_lock:
+        snapshot = dict(_cycle)
+        for f in _FIELDS:
+            _cycle[f] = 0
+    return snapshot
+
+
+# ─────────────────────────────────────────────────────────────
+# Retry / backoff
+# ─────────────────────────────────────────────────────────────
+def _backoff(attempt: int) -> float:
+    delay = min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt))
+    return delay * (0.5 + random.random() / 2)
+
+
+def call(fn: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Run one Dropbox API call with retries:
+    RateLimitError → wait e.backoff (Retry-After) or exponential backoff,
+    5xx / connection errors / timeouts / truncated bodies → exponential backoff.
     """
-    dbx = dropbox.Dropbox(env.DROPBOX_TOKEN)
-    return dbx
+    max_retries = settings.DROPBOX_MAX_RETRIES
+    attempt = 0
+    while True:
+        _count("requests")
+        try:
+            return fn(*args, **kwargs)
+        except RateLimitError as e:
+            _count("rate_limited")
+            if attempt >= max_retries:
+                _count("errors")
+                raise
+            delay = e.backoff if e.backoff is not None else _backoff(attempt)
+        except (InternalServerError, requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                requests.exceptions.ChunkedEncodingError) as e:
+            if attempt >= max_retries:
+                _count("errors")
+                raise
+            delay = _backoff(attempt)
+            print(f"⚠️ Dropbox error ({type(e).__name__}), retry in {delay:.1f}s")
+
+        _count("retries")
+        attempt += 1
+        time.sleep(delay)
@@ -0,0 +1,107 @@
+# backend/dropbox/devices.py
+"""
+Device registry: which WISE modules to sync and how to read them.
+
+Configured with SENSOR_DEVICES (JSON list, or path to a JSON file):
+
+    [
+      {"id": "gh1-4051", "type": "wise4051", "root": "/GH1/WISE4051", "plant_id": "gh1"},
+      {"id": "gh1-4012", "type": "wise4012", "root": "/GH1/WISE4012", "plant_id": "gh1"}
+    ]
+
+`type` selects the schema in backend/dropbox/catalog.py. `source` is
+"dropbox", "local" or "push" (default SENSOR_SOURCE); for "local", `root`
+is a directory on this machine, for "push" it is only a key.
+Without SENSOR_DEVICES the registry is the two devices from
+WISE4051_FOLDER / WISE4012_FOLDER, with ids "wise4051" / "wise4012".
+"""
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from backend.core.config import settings
+from backend.dropbox.catalog import DEVICE_CATALOG
+from backend.dropbox.env import SENSOR_DEVICES, SENSOR_SOURCE, WISE4051_ROOT, WISE4012_ROOT
+from backend.sources import SOURCES
+
+
+def _default_devices() -> List[Dict]:
+    return [
+        {"id": "wise4051", "type": "wise4051", "root": WISE4051_ROOT, "plant_id": settings.WISE4051_PLANT_ID},
+        {"id": "wise4012", "type": "wise4012", "root": WISE4012_ROOT, "plant_id": settings.WISE4051_PLANT_ID},
+    ]
+
+
+def _read_config(raw: str) -> List[Dict]:
+    if os.path.isfile(raw):
+        with open(raw, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return json.loads(raw)
+
+
+def load_devices(raw: Optional[str] = None) -> Dict[str, Dict]:
+    entries = _read_config(raw) if raw else _default_devices()
+
+    devices: Dict[str, Dict] = {}
+    for entry in entries:
+        device_id = entry.get("id")
+        device_type = entry.get("type")
+        root = entry.get("root")
+
+        if not device_id or not root:
+            raise RuntimeError(f"SENSOR_DEVICES entry needs 'id' and 'root': {entry}")
+        if device_type not in DEVICE_CATALOG:
+            raise RuntimeError(f"Unknown device type '{device_type}' for '{device_id}'")
+        if entry.get("source", SENSOR_SOURCE) not in SOURCES:
+            raise RuntimeError(f"Unknown source '{entry.get('source')}' for '{device_id}'")
+        if device_id in devices:
+            raise RuntimeError(f"Duplicate device id '{device_id}'")
+
+        devices[device_id] = {
+            **entry,
+            "id": device_id,
+            "type": device_type,
+            "root": root,
+            "source": entry.get("source", SENSOR_SOURCE),
+            "plant_id": entry.get("plant_id") or device_id,
+        }
+
+    return devices
+
+
+def primary_devices(ids: List[str], devices: Dict[str, Dict]) -> Tuple[Dict, Dict]:
+    """
+    (CO2 device, bioelectric device) named by PRIMARY_DEVICES: the pair
+    behind /co2/all, /elec/all, /aligned and chat. Checked at import so a
+    bad setting fails at startup, not in the first request.
+    """
+    ids = [i.strip() for i in ids if i.strip()]
+    if len(ids) != 2:
+        raise RuntimeError(f"PRIMARY_DEVICES needs exactly two device ids (CO2, bioelectric), got {ids}")
+
+    pair = []
+    for device_id, device_type in zip(ids, ("wise4051", "wise4012")):
+        device = devices.get(device_id)
+        if device is None:
+            raise RuntimeError(f"PRIMARY_DEVICES: '{device_id}' is not in SENSOR_DEVICES ({', '.join(devices)})")
+        if device["type"] != device_type:
+            raise RuntimeError(f"PRIMARY_DEVICES: '{device_id}' is a {device['type']}, expected a {device_type}")
+        pair.append(device)
+    return pair[0], pair[1]
+
+
+DEVICES: Dict[str, Dict] = load_devices(SENSOR_DEVICES)
+PRIMARY = primary_devices(settings.PRIMARY_DEVICES, DEVICES)
+_BY_ROOT: Dict[str, Dict] = {d["root"]: d for d in DEVICES.values()}
+
+
+def list_devices() -> List[Dict]:
+    return list(DEVICES.values())
+
+
+def get_device(device_id: str) -> Optional[Dict]:
+    return DEVICES.get(device_id)
+
+
+def device_for_root(root_path: str) -> Optional[Dict]:
+    return _BY_ROOT.get(root_path)
@@ -0,0 +1,142 @@
+# backend/dropbox/downsample.py
+"""
+Visual downsampling for chart-sized responses.
+
+- LTTB (Largest-Triangle-Three-Buckets): keeps the shape of the line
+- min/max envelope: keeps every peak and trough per bucket
+"""
+from typing import List, Literal, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+DownsampleMethod = Literal["lttb", "minmax"]
+
+
+# ─────────────────────────────────────────────────────────────
+# Index selection (pure numpy)
+# ─────────────────────────────────────────────────────────────
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Positions of the n_out points chosen by LTTB.
+    First and last points are always kept.
+    """
+    n = len(y)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1][:n_out], dtype=np.int64)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # n_out - 2 buckets ระหว่างจุดแรกกับจุดสุดท้าย
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+
+    # ค่าเฉลี่ยของแต่ละ bucket คำนวณทีเดียวด้วย cumsum
+    cx = np.concatenate(([0.0], np.cumsum(x)))
+    cy = np.concatenate(([0.0], np.cumsum(y)))
+    bounds = np.append(edges, n)
+    counts = np.maximum(bounds[1:] - bounds[:-1], 1)
+    avg_x = (cx[bounds[1:]] - cx[bounds[:-1]]) / counts
+    avg_y = (cy[bounds[1:]] - cy[bounds[:-1]]) / counts
+
+    out = np.empty(n_out, dtype=np.int64)
+    out[0] = 0
+    out[-1] = n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if hi <= lo:
+            hi = lo + 1
+        ax, ay = x[a], y[a]
+        area = np.abs(
+            (ax - avg_x[i + 1]) * (y[lo:hi] - ay)
+            - (ax - x[lo:hi]) * (avg_y[i + 1] - ay)
+        )
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+
+    return out
+
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Positions of the min and max of each bucket ((n_out - 2) // 2 buckets),
+    plus first and last points; never more than n_out. Below 4 points
+    there is no room for the endpoints: only the global min / max.
+    """
+    n = len(y)
+    if n_out >= n:
+        return np.arange(n)
+
+    y = np.asarray(y, dtype=np.float64)
+    if n_out < 4:
+        # ค่า peak สำคัญกว่าจุดปลาย (n_out = 1 → max อย่างเดียว)
+        return np.unique([int(np.argmax(y)), int(np.argmin(y))][:max(n_out, 0)]).astype(np.int64)
+
+    n_buckets = (n_out - 2) // 2
+    bucket = (np.arange(n) * n_buckets) // n
+
+    s = pd.Series(y)
+    g = s.groupby(bucket)
+    picked = np.concatenate((
+        [0, n - 1],
+        g.idxmin().to_numpy(),
+        g.idxmax().to_numpy(),
+    ))
+    return np.unique(picked.astype(np.int64))
+
+
+# ─────────────────────────────────────────────────────────────
+# DataFrame-level downsampling
+# ─────────────────────────────────────────────────────────────
+def _column_indices(
+    x: np.ndarray,
+    y: np.ndarray,
+    budget: int,
+    method: DownsampleMethod,
+) -> np.ndarray:
+    # ตัดแถวที่เป็น NaN ออกก่อน (เช่น bucket ว่างหลัง resample)
+    valid = np.flatnonzero(~np.isnan(y))
+    if len(valid) == 0:
+        return valid
+
+    if method == "minmax":
+        local = minmax_indices(y[valid], budget)
+    else:
+        local = lttb_indices(x[valid], y[valid], budget)
+    return valid[local]
+
+
+def downsample(
+    df: pd.DataFrame,
+    max_points: int,
+    method: DownsampleMethod = "lttb",
+    columns: Sequence[str] = (),
+) -> pd.DataFrame:
+    """
+    Reduce df to at most max_points rows, choosing rows that preserve the
+    visual shape of `columns`. The budget is split evenly between columns
+    and the selected rows are unioned, so the result never exceeds max_points.
+    """
+    if df is None or df.empty or not max_points or len(df) <= max_points:
+        return df
+
+    cols: List[str] = [c for c in columns if c in df.columns]
+    if not cols:
+        step = int(np.ceil(len(df) / max_points))
+        return df.iloc[::step]
+
+    # ทุก column ได้ไม่เกิน budget จุด → union ไม่เกิน max_points ไม่ต้องตัดทิ้งทีหลัง
+    cols = cols[:max_points]
+    budget = max_points // len(cols)
+    x = df["timestamp"].to_numpy(dtype="datetime64[ns]").astype(np.int64) / 1e9
+
+    picked = [
+        _column_indices(x, df[c].to_numpy(dtype=np.float64, na_value=np.nan), budget, method)
+        for c in cols
+    ]
+    return df.iloc[np.unique(np.concatenate(picked))]
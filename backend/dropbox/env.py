@@ -8,11 +8,17 @@ DROPBOX_TOKEN = os.getenv("DROPBOX_TOKEN")
 WISE4051_ROOT = os.getenv("WISE4051_FOLDER")
 WISE4012_ROOT = os.getenv("WISE4012_FOLDER")
 
-if not DROPBOX_TOKEN:
+# แหล่งข้อมูลเริ่มต้นของ device: "dropbox", "local" (โฟลเดอร์บนเครื่อง / NFS) หรือ "push" (HTTP)
+SENSOR_SOURCE = os.getenv("SENSOR_SOURCE", "dropbox")
+
+# JSON list ของ device หรือ path ไปยังไฟล์ .json (ดู backend/dropbox/devices.py)
+SENSOR_DEVICES = os.getenv("SENSOR_DEVICES")
+
+if SENSOR_SOURCE == "dropbox" and not DROPBOX_TOKEN:
     raise RuntimeError("DROPBOX_TOKEN is not set in .env")
 
-if not WISE4051_ROOT:
+if not SENSOR_DEVICES and not WISE4051_ROOT:
     raise RuntimeError("WISE4051_FOLDER is not set in .env")
 
-if not WISE4012_ROOT:
+if not SENSOR_DEVICES and not WISE4012_ROOT:
     raise RuntimeError("WISE4012_FOLDER is not set in .env")
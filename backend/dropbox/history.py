@@ -0,0 +1,178 @@
+# backend/dropbox/history.py
+"""
+Historical range queries beyond the 7-day sync window.
+
+    index   root → [(day, partition)]   listing cached for INDEX_TTL
+    prune   keep only day partitions overlapping [start, end]
+    load    each partition once, kept in an LRU (bounded by count)
+
+A month-long query therefore reads ~30 partitions no matter how large
+the archive is. The newest partition may still be growing, so it is
+re-read after INDEX_TTL like the listing.
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from backend.core import metrics
+from backend.core.config import settings
+
+
+INDEX_TTL = 300.0   # วินาที
+
+_DAY_PATTERNS = (
+    (re.compile(r"(\d{4})-(\d{2})-(\d{2})"), "{0}-{1}-{2}"),
+    (re.compile(r"(\d{4})(\d{2})(\d{2})"), "{0}-{1}-{2}"),
+)
+
+_lock = threading.Lock()
+
+# root → {"loaded_at", "days": [(day, partition)] sorted}
+_index: Dict[str, Dict] = {}
+
+# (root, partition) → {"loaded_at", "df", "bytes"}
+_partitions: "OrderedDict[Tuple[str, str], Dict]" = OrderedDict()
+
+_stats = {"partition_hits": 0, "partition_loads": 0, "index_loads": 0}
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.SYNC_WORKERS,
+    thread_name_prefix="history",
+)
+
+
+def partition_day(partition: str) -> Optional[pd.Timestamp]:
+    """Day of a date folder (…/20251101 or …/2025-11-01), None if not a date."""
+    name = partition.rstrip("/").rsplit("/", 1)[-1]
+    for pattern, fmt in _DAY_PATTERNS:
+        m = pattern.search(name)
+        if m:
+            day = pd.to_datetime(fmt.format(*m.groups()), errors="coerce")
+            if not pd.isna(day):
+                return day
+    return None
+
+
+# ─────────────────────────────────────────────────────────────
+# Index
+# ─────────────────────────────────────────────────────────────
+def get_index(root_path: str, refresh: bool = False) -> List[Tuple[pd.Timestamp, str]]:
+    from backend.dropbox.service import _source_for
+
+    with _lock:
+        entry = _index.get(root_path)
+        if entry and not refresh and time.monotonic() - entry["loaded_at"] < INDEX_TTL:
+            return entry["days"]
+
+    source, _ = _source_for(root_path)
+    days = []
+    for partition in source.list_partitions(root_path):
+        day = partition_day(partition)
+        if day is not None:
+            days.append((day, partition))
+    days.sort()
+
+    with _lock:
+        _index[root_path] = {"loaded_at": time.monotonic(), "days": days}
+        _stats["index_loads"] += 1
+    return days
+
+
+def prune(days: List[Tuple[pd.Timestamp, str]], start: pd.Timestamp, end: pd.Timestamp) -> List[Tuple[pd.Timestamp, str]]:
+    first = start.normalize()
+    return [(day, p) for day, p in days if first <= day <= end]
+
+
+# ─────────────────────────────────────────────────────────────
+# Partition LRU
+# ─────────────────────────────────────────────────────────────
+def _load_partition(root_path: str, partition: str, is_latest: bool) -> pd.DataFrame:
+    from backend.dropbox.service import _source_for, prepare_frames
+
+    key = (root_path, partition)
+    with _lock:
+        entry = _partitions.get(key)
+        fresh = entry is not None and (
+            not is_latest or time.monotonic() - entry["loaded_at"] < INDEX_TTL
+        )
+        if fresh:
+            _partitions.move_to_end(key)
+            _stats["partition_hits"] += 1
+            return entry["df"]
+
+    source, device_type = _source_for(root_path)
+    df = prepare_frames(source.read_partition(partition), device_type)
+    size = int(df.memory_usage(index=True, deep=True).sum()) if not df.empty else 0
+
+    with _lock:
+        _partitions[key] = {"loaded_at": time.monotonic(), "df": df, "bytes": size}
+        _partitions.move_to_end(key)
+        while len(_partitions) > settings.HISTORY_PARTITION_CACHE:
+            _partitions.popitem(last=False)
+        _stats["partition_loads"] += 1
+    return df
+
+
+def load_partitions(root_path: str, start: pd.Timestamp, end: pd.Timestamp) -> List[Tuple[pd.Timestamp, pd.DataFrame]]:
+    """(day, frame) of every day partition overlapping [start, end], oldest first."""
+    days = get_index(root_path)
+    selected = prune(days, start, end)
+    if not selected:
+        return []
+
+    latest = days[-1][1]
+    frames = _executor.map(
+        lambda item: _load_partition(root_path, item[1], item[1] == latest),
+        selected,
+    )
+    return [(day, df) for (day, _), df in zip(selected, frames)]
+
+
+def read_range(root_path: str, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+    """Rows of root_path with start <= timestamp <= end."""
+    from backend.dropbox.service import merge_sorted_runs
+
+    df = merge_sorted_runs([df for _, df in load_partitions(root_path, start, end)])
+    if df.empty:
+        return df
+
+    ts = df["timestamp"]
+    lo = int(ts.searchsorted(start, side="left"))
+    hi = int(ts.searchsorted(end, side="right"))
+    return df.iloc[lo:hi]
+
+
+def get_stats() -> Dict:
+    with _lock:
+        return {
+            **_stats,
+            "cached_partitions": len(_partitions),
+            "partition_capacity": settings.HISTORY_PARTITION_CACHE,
+            "indexed_roots": len(_index),
+        }
+
+
+def _collect_metrics():
+    with _lock:
+        labels = {"cache": "history_partition"}
+        return [
+            ("cache_hits_total", "counter", "Cache lookups answered from memory", [(labels, _stats["partition_hits"])]),
+            ("cache_misses_total", "counter", "Cache lookups that had to load / compute", [(labels, _stats["partition_loads"])]),
+            ("cache_entries", "gauge", "Entries held by a cache", [(labels, len(_partitions))]),
+            ("cache_bytes", "gauge", "Memory held by a cache (pandas memory_usage, deep)",
+             [(labels, sum(entry["bytes"] for entry in _partitions.values()))]),
+        ]
+
+
+metrics.register_collector(_collect_metrics)
+
+
+def clear() -> None:
+    with _lock:
+        _index.clear()
+        _partitions.clear()
@@ -0,0 +1,227 @@
+# backend/dropbox/ingest.py
+"""
+HTTP push ingest: WISE modules POST batches straight to the API instead of
+going through Dropbox CSV → ZIP poll.
+
+    request → parse + validate (catalog) → bounded queue → 202
+    worker  → coalesce batches per device → service.append_rows()
+
+The queue is bounded; when it is full the endpoint answers 503 with
+Retry-After so devices back off instead of the process buffering without
+limit. Rows at or before a device's latest timestamp are ignored, so a
+retried batch is harmless.
+"""
+import io
+import json
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backend.core import metrics
+from backend.core.config import settings
+from backend.dropbox import devices
+from backend.dropbox.catalog import DEVICE_CATALOG
+
+
+MAX_ROWS_PER_REQUEST = 10000
+MAX_BATCHES_PER_FLUSH = 64
+
+TIMESTAMP_COLS = ("timestamp", "TIM", "Time")
+
+
+class IngestError(ValueError):
+    """Payload rejected (→ 4xx). status is the HTTP status to answer with."""
+
+    def __init__(self, message: str, status: int = 422):
+        super().__init__(message)
+        self.status = status
+
+
+# ─────────────────────────────────────────────────────────────
+# Parse / validate
+# ─────────────────────────────────────────────────────────────
+def parse_payload(body: bytes, content_type: str) -> pd.DataFrame:
+    """
+    text/csv          → header line + rows (same as the logger CSV)
+    application/json  → [{...}, ...] or {"rows": [{...}, ...]}
+    """
+    if not body:
+        raise IngestError("Empty payload", 400)
+
+    try:
+        if "csv" in (content_type or ""):
+            return pd.read_csv(io.BytesIO(body))
+
+        payload = json.loads(body)
+    except (ValueError, pd.errors.ParserError) as e:
+        raise IngestError(f"Malformed payload: {e}", 400)
+
+    if isinstance(payload, dict):
+        payload = payload.get("rows")
+    if not isinstance(payload, list) or not all(isinstance(r, dict) for r in payload):
+        raise IngestError("JSON payload must be a list of objects or {\"rows\": [...]}", 400)
+
+    return pd.DataFrame.from_records(payload)
+
+
+def validate_rows(df: pd.DataFrame, device_type: str) -> pd.DataFrame:
+    """
+    Check rows against the device schema: a timestamp column, at least one
+    catalogued register (or its named column), numeric values only.
+    Returns the rows with a parsed datetime 'timestamp' column in place of
+    the timestamp column that was sent.
+    """
+    if df.empty:
+        raise IngestError("No rows", 400)
+    if len(df) > MAX_ROWS_PER_REQUEST:
+        raise IngestError(f"Too many rows ({len(df)} > {MAX_ROWS_PER_REQUEST})", 413)
+
+    ts_col = next((c for c in TIMESTAMP_COLS if c in df.columns), None)
+    if ts_col is None:
+        raise IngestError(f"Missing timestamp column (one of {', '.join(TIMESTAMP_COLS)})")
+    timestamps = pd.to_datetime(df[ts_col], errors="coerce")
+    if not pd.api.types.is_datetime64_any_dtype(timestamps):
+        raise IngestError(f"Mixed time zones in '{ts_col}'")
+    if timestamps.isna().any():
+        raise IngestError(f"Unparseable values in '{ts_col}'")
+    if timestamps.dt.tz is not None:
+        # เวลาของ device เป็น wall-clock ไม่มี tz เหมือน CSV
+        timestamps = timestamps.dt.tz_localize(None)
+
+    catalog = DEVICE_CATALOG[device_type]
+    known = set(catalog) | {spec["name"] for spec in catalog.values()}
+    metric_cols = [c for c in df.columns if c in known]
+    if not metric_cols:
+        raise IngestError(f"No {device_type} metrics in payload (expected any of {sorted(catalog)})")
+
+    for col in metric_cols:
+        values = pd.to_numeric(df[col], errors="coerce")
+        bad = values.isna() & df[col].notna()
+        if bad.any():
+            raise IngestError(f"Non-numeric value in '{col}' at row {int(np.flatnonzero(bad)[0])}")
+
+    # คิวเก็บ 'timestamp' ที่ parse แล้วเสมอ (JSON ส่ง "timestamp" เป็น string มา)
+    return df.drop(columns=[ts_col]).assign(timestamp=timestamps)
+
+
+# ─────────────────────────────────────────────────────────────
+# Bounded queue + worker
+# ─────────────────────────────────────────────────────────────
+_queue: "queue.Queue[Tuple[str, pd.DataFrame]]" = queue.Queue(maxsize=settings.INGEST_QUEUE_SIZE)
+_worker: Optional[threading.Thread] = None
+_worker_lock = threading.Lock()
+
+_stats = {
+    "accepted_batches": 0,
+    "accepted_rows": 0,
+    "rejected_batches": 0,
+    "throttled_batches": 0,
+    "appended_rows": 0,
+    "flushes": 0,
+    "last_flush_ms": 0.0,
+}
+
+
+def _flush(batches: List[Tuple[str, pd.DataFrame]]) -> None:
+    from backend.dropbox import service as dropbox_service
+
+    by_root: Dict[str, List[pd.DataFrame]] = {}
+    for root_path, df in batches:
+        by_root.setdefault(root_path, []).append(df)
+
+    start = time.perf_counter()
+    for root_path, frames in by_root.items():
+        try:
+            raw = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+            _stats["appended_rows"] += dropbox_service.append_rows(root_path, raw, initialize=True)
+        except Exception as e:
+            print(f"⚠️ Push ingest failed for {root_path}: {e}")
+    elapsed = time.perf_counter() - start
+    metrics.observe("stage_seconds", elapsed, stage="ingest_flush")
+    _stats["flushes"] += 1
+    _stats["last_flush_ms"] = round(elapsed * 1000, 2)
+
+
+def _run_worker() -> None:
+    while True:
+        batches = [_queue.get()]
+        # รวม batch ที่รออยู่ให้เป็นการ append ครั้งเดียวต่อ device
+        while len(batches) < MAX_BATCHES_PER_FLUSH:
+            try:
+                batches.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            _flush(batches)
+        finally:
+            for _ in batches:
+                _queue.task_done()
+
+
+def _ensure_worker() -> None:
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run_worker, daemon=True, name="push-ingest")
+            _worker.start()
+
+
+def submit(device_id: str, body: bytes, content_type: str) -> int:
+    """
+    Validate a pushed batch and queue it. Returns accepted row count.
+    Raises IngestError (4xx) or queue.Full (→ 503).
+    """
+    device = devices.get_device(device_id)
+    if device is None:
+        raise IngestError(f"Unknown device '{device_id}'", 404)
+
+    try:
+        df = validate_rows(parse_payload(body, content_type), device["type"])
+    except IngestError:
+        _stats["rejected_batches"] += 1
+        raise
+
+    _ensure_worker()
+    try:
+        _queue.put_nowait((device["root"], df))
+    except queue.Full:
+        _stats["throttled_batches"] += 1
+        raise
+
+    _stats["accepted_batches"] += 1
+    _stats["accepted_rows"] += len(df)
+    return len(df)
+
+
+def _collect_metrics():
+    fields = ("accepted_batches", "accepted_rows", "rejected_batches", "throttled_batches", "appended_rows")
+    return [
+        ("ingest_events_total", "counter", "Push ingest batches / rows by outcome",
+         [({"event": field}, _stats[field]) for field in fields]),
+        ("ingest_queue_depth", "gauge", "Push ingest batches waiting in the queue", [({}, _queue.qsize())]),
+    ]
+
+
+metrics.register_collector(_collect_metrics)
+
+
+def get_stats() -> Dict:
+    return {
+        **_stats,
+        "queued_batches": _queue.qsize(),
+        "queue_capacity": _queue.maxsize,
+    }
+
+
+def drain(timeout: float = 5.0) -> bool:
+    """Wait until every queued batch has been appended (tests / shutdown)."""
+    deadline = time.monotonic() + timeout
+    while _queue.unfinished_tasks:
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
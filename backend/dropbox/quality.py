@@ -0,0 +1,389 @@
+# backend/dropbox/quality.py
+"""
+Streaming sensor-fault detection at ingest.
+
+Every frame that is published (sync, watcher, push) goes through
+annotate(); only rows newer than the last checked timestamp of the device
+are examined, with a small fixed state per metric:
+
+    spike     |x − rolling median| > QUALITY_SPIKE_K × 1.4826 × rolling MAD
+              (window = last QUALITY_WINDOW valid samples, at least `spike`)
+    flatline  same value for longer than `flatline`
+    rate      |Δx / Δt| above `max_rate`
+    range     outside `range`
+    missing   NaN (an alert is raised after QUALITY_MISSING_BURST in a row)
+
+Rules live in the metric catalog (backend/dropbox/catalog.py, `quality`).
+
+Flags are stored per row in one uint16 column, QUALITY_COL, one bit per
+metric (QUALITY_BITS); rows that were already checked keep their flags
+across syncs. mask_flagged() turns flagged values into NaN so means,
+accounting and prediction skip them. Consecutive flagged samples of one
+metric and kind are coalesced into a single alert (get_alerts()).
+"""
+import threading
+from collections import deque
+from itertools import count
+from typing import Deque, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from backend.core import metrics
+from backend.core.config import settings
+from backend.dropbox.catalog import DEVICE_CATALOG
+
+
+QUALITY_COL = "quality_flags"
+
+KINDS = ("spike", "flatline", "rate", "range", "missing")
+
+MAD_TO_SIGMA = 1.4826
+
+# ช่องว่างระหว่าง sample ที่นานกว่านี้ไม่เช็ค rate (เครื่องดับ / ไฟล์หาย)
+MAX_RATE_GAP = pd.Timedelta("10min")
+
+# metric name → bit (ทุก device type ใช้ชุดเดียวกัน, ≤ 16 metric)
+QUALITY_BITS: Dict[str, int] = {}
+for _catalog in DEVICE_CATALOG.values():
+    for _spec in _catalog.values():
+        if "quality" in _spec and _spec["name"] not in QUALITY_BITS:
+            QUALITY_BITS[_spec["name"]] = len(QUALITY_BITS)
+assert len(QUALITY_BITS) <= 16, "QUALITY_COL is uint16"
+
+
+def _rules(device_type: str) -> Dict[str, Dict]:
+    return {
+        spec["name"]: spec["quality"]
+        for spec in DEVICE_CATALOG.get(device_type, {}).values()
+        if "quality" in spec
+    }
+
+
+# ─────────────────────────────────────────────────────────────
+# State
+# ─────────────────────────────────────────────────────────────
+_lock = threading.Lock()
+
+# device id → {"last_ts", "metrics": {name → metric state}}
+_state: Dict[str, Dict] = {}
+
+# device id → {"checked", "flagged", kind → count}
+_counters: Dict[str, Dict[str, int]] = {}
+
+_alerts: Deque[Dict] = deque(maxlen=settings.QUALITY_ALERT_RETENTION)
+_alert_ids = count(1)
+
+
+def _metric_state() -> Dict:
+    return {
+        "window": np.empty(0),   # ค่าล่าสุด ≤ QUALITY_WINDOW ค่า (ไม่รวม NaN)
+        "last_value": None,
+        "last_ts": None,
+        "run_start": None,       # เวลาที่ค่าปัจจุบันเริ่มค้าง
+        "open": {},              # kind → alert ที่ยังต่อเนื่องถึง sample ล่าสุด
+    }
+
+
+# ─────────────────────────────────────────────────────────────
+# Checks (vectorised over one batch, state carried between batches)
+# ─────────────────────────────────────────────────────────────
+def _spikes(values: np.ndarray, st: Dict, floor: float) -> np.ndarray:
+    window = settings.QUALITY_WINDOW
+    history = np.concatenate((st["window"], values))
+    n_prev = len(st["window"])
+    st["window"] = history[-window:]
+
+    flags = np.zeros(len(values), dtype=bool)
+    if len(history) <= window:
+        return flags
+
+    # แถวที่ r = ค่าก่อนหน้า window ค่าของ history[r + window]
+    windows = sliding_window_view(history[:-1], window)
+    median = np.median(windows, axis=1)
+    mad = np.median(np.abs(windows - median[:, None]), axis=1)
+
+    target = np.arange(len(windows)) + window - n_prev
+    threshold = settings.QUALITY_SPIKE_K * np.maximum(MAD_TO_SIGMA * mad, floor)
+    flags[target] = np.abs(values[target] - median) > threshold
+    return flags
+
+
+def _flatline(values: np.ndarray, ts: np.ndarray, st: Dict, duration: pd.Timedelta) -> np.ndarray:
+    prev = np.concatenate(([np.nan if st["last_value"] is None else st["last_value"]], values[:-1]))
+    changed = values != prev
+
+    # เวลาเริ่มของ run ที่มีค่าเท่ากัน (forward fill จากจุดที่ค่าเปลี่ยน)
+    idx = np.maximum.accumulate(np.where(changed, np.arange(len(values)), -1))
+    carried = np.datetime64(st["run_start"], "ns") if st["run_start"] is not None else ts[0]
+    run_start = np.where(idx >= 0, ts[np.maximum(idx, 0)], carried)
+
+    st["run_start"] = pd.Timestamp(run_start[-1])
+    return (ts - run_start) >= duration.to_timedelta64()
+
+
+def _rate(values: np.ndarray, ts: np.ndarray, st: Dict, max_rate: float) -> np.ndarray:
+    if st["last_ts"] is None:
+        prev_v = np.concatenate(([values[0]], values[:-1]))
+        prev_ts = np.concatenate(([ts[0]], ts[:-1]))
+    else:
+        prev_v = np.concatenate(([st["last_value"]], values[:-1]))
+        prev_ts = np.concatenate(([np.datetime64(st["last_ts"], "ns")], ts[:-1]))
+
+    dt = (ts - prev_ts) / np.timedelta64(1, "s")
+    valid = (dt > 0) & (dt <= MAX_RATE_GAP.total_seconds())
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rate = np.abs(values - prev_v) / dt
+    return valid & (rate > max_rate)
+
+
+def _range(values: np.ndarray, bounds) -> np.ndarray:
+    lo, hi = bounds
+    flags = np.zeros(len(values), dtype=bool)
+    if lo is not None:
+        flags |= values < lo
+    if hi is not None:
+        flags |= values > hi
+    return flags
+
+
+# ─────────────────────────────────────────────────────────────
+# Alerts
+# ─────────────────────────────────────────────────────────────
+def _runs(mask: np.ndarray):
+    """(start, end) index pairs (inclusive) of consecutive True values."""
+    edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    return zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1) - 1)
+
+
+def _record(device_id: str, metric: str, kind: str, mask: np.ndarray,
+            ts: np.ndarray, values: np.ndarray, st: Dict, min_samples: int = 1) -> None:
+    open_alert = st["open"].pop(kind, None)
+    for start, end in _runs(mask):
+        if start == 0 and open_alert is not None:
+            alert = open_alert
+        else:
+            alert = {
+                "id": None,
+                "device_id": device_id,
+                "metric": metric,
+                "kind": kind,
+                "start": pd.Timestamp(ts[start]),
+                "samples": 0,
+            }
+        alert["end"] = pd.Timestamp(ts[end])
+        alert["samples"] += int(end - start + 1)
+        alert["value"] = None if np.isnan(values[end]) else float(values[end])
+
+        if alert["id"] is None and alert["samples"] >= min_samples:
+            alert["id"] = next(_alert_ids)
+            _alerts.append(alert)
+        if end == len(mask) - 1:
+            st["open"][kind] = alert
+
+
+def _alert_json(alert: Dict, open_ids) -> Dict:
+    return {
+        **alert,
+        "start": alert["start"].isoformat(),
+        "end": alert["end"].isoformat(),
+        "active": alert["id"] in open_ids,
+    }
+
+
+# ─────────────────────────────────────────────────────────────
+# Annotate
+# ─────────────────────────────────────────────────────────────
+def _carry_flags(df: pd.DataFrame, previous: Optional[pd.DataFrame]) -> np.ndarray:
+    """Flags of rows that previous already had (matched by timestamp)."""
+    flags = np.zeros(len(df), dtype=np.uint16)
+    if previous is None or previous.empty or QUALITY_COL not in previous.columns:
+        return flags
+
+    prev_ts = previous["timestamp"].to_numpy()
+    ts = df["timestamp"].to_numpy()
+    pos = np.minimum(prev_ts.searchsorted(ts), len(prev_ts) - 1)
+    match = prev_ts[pos] == ts
+    flags[match] = previous[QUALITY_COL].to_numpy()[pos[match]]
+    return flags
+
+
+def _new_state() -> Dict:
+    return {"last_ts": None, "metrics": {}}
+
+
+def _new_counters() -> Dict[str, int]:
+    return {"checked": 0, "flagged": 0, **{k: 0 for k in KINDS}}
+
+
+def _check(device_id: Optional[str], device_type: str, df: pd.DataFrame,
+           state: Dict, counters: Dict[str, int], alerts: bool = True) -> np.ndarray:
+    """
+    Flags of the new rows in df; updates state / counters. Caller holds
+    _lock when they are the shared ones. alerts=False: no alerts recorded.
+    """
+    ts_all = df["timestamp"].to_numpy(dtype="datetime64[ns]")
+    flags = np.zeros(len(df), dtype=np.uint16)
+
+    for metric, rule in _rules(device_type).items():
+        if metric not in df.columns:
+            continue
+        st = state["metrics"].setdefault(metric, _metric_state())
+        raw = df[metric].to_numpy(dtype=np.float64)
+        bad = np.zeros(len(df), dtype=bool)
+
+        missing = np.isnan(raw)
+        if alerts:
+            _record(device_id, metric, "missing", missing, ts_all, raw, st, settings.QUALITY_MISSING_BURST)
+        counters["missing"] += int(missing.sum())
+        bad |= missing
+
+        valid = ~missing
+        if valid.any():
+            values, ts = raw[valid], ts_all[valid]
+            checks = {}
+            if "spike" in rule:
+                checks["spike"] = _spikes(values, st, rule["spike"])
+            if "flatline" in rule:
+                checks["flatline"] = _flatline(values, ts, st, pd.Timedelta(rule["flatline"]))
+            if "max_rate" in rule:
+                checks["rate"] = _rate(values, ts, st, rule["max_rate"])
+            if "range" in rule:
+                checks["range"] = _range(values, rule["range"])
+
+            for kind, mask in checks.items():
+                if alerts:
+                    _record(device_id, metric, kind, mask, ts, values, st)
+                counters[kind] += int(mask.sum())
+                bad[valid] |= mask
+
+            st["last_value"] = float(values[-1])
+            st["last_ts"] = pd.Timestamp(ts[-1])
+
+        flags[bad] |= np.uint16(1 << QUALITY_BITS[metric])
+
+    counters["checked"] += len(df)
+    counters["flagged"] += int(np.count_nonzero(flags))
+    state["last_ts"] = pd.Timestamp(ts_all[-1])
+    return flags
+
+
+def annotate(device: Optional[Dict], df: pd.DataFrame, previous: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    df with QUALITY_COL. Rows up to the last checked timestamp of the
+    device keep the flags they have in previous (the frame df replaces);
+    newer rows are checked. df must be sorted by 'timestamp'.
+    """
+    if not settings.QUALITY_CHECKS or device is None or df is None or df.empty:
+        return df
+
+    flags = _carry_flags(df, previous)
+    with _lock:
+        last_ts = (_state.get(device["id"]) or {}).get("last_ts")
+        start = 0 if last_ts is None else int(df["timestamp"].searchsorted(last_ts, side="right"))
+        if start < len(df):
+            state = _state.setdefault(device["id"], _new_state())
+            counters = _counters.setdefault(device["id"], _new_counters())
+            flags[start:] = _check(device["id"], device["type"], df.iloc[start:], state, counters)
+
+    return df.assign(**{QUALITY_COL: flags})
+
+
+def annotate_history(device_type: str, frames: List[Optional[pd.DataFrame]]) -> List[Optional[pd.DataFrame]]:
+    """
+    annotate() for offline use (training on day partitions): frames are
+    checked in order with one fresh detector state, so rows get the flags
+    ingest would have given them. No alerts, counters or device state.
+    """
+    if not settings.QUALITY_CHECKS:
+        return frames
+
+    state, counters = _new_state(), _new_counters()
+    result = []
+    for df in frames:
+        if df is None or df.empty:
+            result.append(df)
+            continue
+        flags = _check(None, device_type, df, state, counters, alerts=False)
+        result.append(df.assign(**{QUALITY_COL: flags}))
+    return result
+
+
+def mask_flagged(df: pd.DataFrame) -> pd.DataFrame:
+    """Flagged values → NaN (QUALITY_COL itself is kept)."""
+    if df is None or df.empty or QUALITY_COL not in df.columns:
+        return df
+
+    flags = df[QUALITY_COL].to_numpy()
+    if not flags.any():
+        return df
+
+    masked = {}
+    for metric, bit in QUALITY_BITS.items():
+        if metric in df.columns:
+            hit = (flags & (1 << bit)) != 0
+            if hit.any():
+                masked[metric] = df[metric].mask(hit)
+    return df.assign(**masked)
+
+
+# ─────────────────────────────────────────────────────────────
+# Read API
+# ─────────────────────────────────────────────────────────────
+def get_alerts(device_id: Optional[str] = None, active_only: bool = False, limit: int = 100) -> List[Dict]:
+    """Newest first. `active` = the fault still continues at the latest sample."""
+    with _lock:
+        open_ids = {
+            alert["id"]
+            for state in _state.values()
+            for st in state["metrics"].values()
+            for alert in st["open"].values()
+        }
+        result = []
+        for alert in reversed(_alerts):
+            if device_id and alert["device_id"] != device_id:
+                continue
+            if active_only and alert["id"] not in open_ids:
+                continue
+            result.append(_alert_json(alert, open_ids))
+            if len(result) >= limit:
+                break
+        return result
+
+
+def get_stats() -> Dict:
+    with _lock:
+        return {
+            "bits": dict(QUALITY_BITS),
+            "devices": {
+                device_id: {**counters, "last_checked": _state[device_id]["last_ts"]}
+                for device_id, counters in _counters.items()
+            },
+            "alerts": len(_alerts),
+        }
+
+
+def _collect_metrics():
+    with _lock:
+        samples = [
+            ({"device": device_id, "kind": kind}, counters[kind])
+            for device_id, counters in _counters.items()
+            for kind in KINDS
+        ]
+        checked = [({"device": device_id}, c["checked"]) for device_id, c in _counters.items()]
+        alerts = len(_alerts)
+    return [
+        ("quality_checked_rows_total", "counter", "Rows checked by the sensor fault detector", checked),
+        ("quality_flagged_samples_total", "counter", "Samples flagged as sensor faults", samples),
+        ("quality_alerts", "gauge", "Alerts currently retained", [({}, alerts)]),
+    ]
+
+
+metrics.register_collector(_collect_metrics)
+
+
+def reset() -> None:
+    """Forget detector state (alerts are kept); the next frame is checked from scratch."""
+    with _lock:
+        _state.clear()
@@ -1,108 +1,218 @@
-# backend/dropbox/service.py  (ZIP-ACCELERATED VERSION)
+# backend/dropbox/service.py
 
-import io
-import tempfile
-import zipfile
-from typing import List, Dict, Optional, Literal
-from datetime import datetime
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Literal, Tuple
+from datetime import datetime, timedelta, timezone
 
-import dropbox
 import pandas as pd
 import numpy as np
 
-from backend.dropbox.env import DROPBOX_TOKEN, WISE4051_ROOT, WISE4012_ROOT
+from backend.dropbox.downsample import downsample
+from backend.dropbox.catalog import apply_catalog, metric_names
+from backend.dropbox import devices
+from backend.dropbox import client as dropbox_client
+from backend.dropbox import history
+from backend.dropbox import quality
+from backend.dropbox import shared_frames
+from backend.sources import SensorSource, get_source, stop_all as stop_sources
+from backend.core import carbon_accounting
+from backend.core import metrics
+from backend.core.config import settings
 
 
 # ─────────────────────────────────────────────────────────────
-# Sensor Columns
+# Sensor Columns (named by backend/dropbox/catalog.py at ingest)
 # ─────────────────────────────────────────────────────────────
-CO2_COL = "COM_1 Wd_0"
-TEMP_COL = "COM_1 Wd_1"
-HUMID_COL = "COM_1 Wd_2"
+CO2_COL = "carbon"            # COM_1 Wd_0
+TEMP_COL = "Temp"             # COM_1 Wd_1 / 100
+HUMID_COL = "Humidity"        # COM_1 Wd_2 / 100
+
+LEAF_COL = "Leaf_Voltage"     # AI_0 Val → V
+GROUND_COL = "Ground_Voltage" # AI_1 Val → V
+
+# คอลัมน์ที่ต้องรักษา peak ไว้ตอน downsample
+CO2_PLOT_COLS = [CO2_COL]
+ELEC_PLOT_COLS = [LEAF_COL, GROUND_COL]
+PLOT_COLS_BY_TYPE = {
+    "wise4051": CO2_PLOT_COLS,
+    "wise4012": ELEC_PLOT_COLS,
+}
+
+
+# ─────────────────────────────────────────────────────────────
+# Devices (backend/dropbox/devices.py)
+# ─────────────────────────────────────────────────────────────
+# ตรวจแล้วตอน import devices (PRIMARY_DEVICES ผิด → error ตอน start)
+CO2_DEVICE_ID, ELEC_DEVICE_ID = (d["id"] for d in devices.PRIMARY)
+WISE4051_ROOT, WISE4012_ROOT = (d["root"] for d in devices.PRIMARY)
 
-LEAF_COL = "AI_0 Val"
-GROUND_COL = "AI_1 Val"
+_sync_executor = ThreadPoolExecutor(
+    max_workers=settings.SYNC_WORKERS,
+    thread_name_prefix="sensor-sync",
+)
 
 
 # ─────────────────────────────────────────────────────────────
 # CACHE
 # ─────────────────────────────────────────────────────────────
 _cache: Dict[str, pd.DataFrame] = {}
-_sensor_cache = {
-    "wise4051": {"data": None, "last_updated": None},
-    "wise4012": {"data": None, "last_updated": None},
-}
 
+# merge เข้า _cache[root] แล้ว publish (append_rows / refresh_device) ทีละ thread
+_append_lock = threading.Lock()
 
-# ─────────────────────────────────────────────────────────────
-# Dropbox Utils
-# ─────────────────────────────────────────────────────────────
-def get_client() -> dropbox.Dropbox:
-    return dropbox.Dropbox(DROPBOX_TOKEN)
 
+def _empty_sensor_cache() -> Dict[str, Dict]:
+    return {
+        device_id: {"data": None, "last_updated": None}
+        for device_id in devices.DEVICES
+    }
 
-def list_date_folders(root_path: str) -> List[str]:
-    """
-    List subfolders (day folders). Works for WISE-4051 and WISE-4012.
-    """
-    dbx = get_client()
-    res = dbx.files_list_folder(root_path)
-    folders: List[str] = []
 
-    while True:
-        for entry in res.entries:
-            if isinstance(entry, dropbox.files.FolderMetadata):
-                folders.append(entry.path_display)
-        if not res.has_more:
-            break
-        res = dbx.files_list_folder_continue(res.cursor)
+# device id -> {"data", "last_updated"}
+_sensor_cache = _empty_sensor_cache()
 
-    return folders
+# 4051 ⨝ 4012 จัดเวลาให้ตรงกัน คำนวณครั้งเดียวต่อรอบ sync
+ALIGNED_KEY = f"aligned:{CO2_DEVICE_ID}+{ELEC_DEVICE_ID}"
+ALIGN_TOLERANCE = pd.Timedelta("2min")
+_aligned_cache = {"data": None, "last_updated": None}
+
+# root_path -> {"version", "last_modified", "fingerprint"}
+# version จะเพิ่มขึ้นเฉพาะตอนที่ข้อมูลใน _cache เปลี่ยนจริง ๆ (ใช้ทำ ETag)
+_snapshot_meta: Dict[str, Dict] = {}
 
 
 # ─────────────────────────────────────────────────────────────
-# ZIP FAST DOWNLOAD (instead of reading CSV file-by-file)
+# Sources (backend/sources: Dropbox / local directory)
 # ─────────────────────────────────────────────────────────────
-def download_folder_as_zip(dbx: dropbox.Dropbox, folder_path: str) -> str:
+def _source_for(root_path: str) -> Tuple[SensorSource, Optional[str]]:
+    """(source, catalog type) of the device registered at root_path."""
+    device = devices.device_for_root(root_path)
+    if device is None:
+        return get_source(), None
+    return get_source(device["source"]), device["type"]
+
+
+def _check_quality(root_path: str, df: pd.DataFrame) -> pd.DataFrame:
+    """Fault flags for rows of df not checked yet (backend/dropbox/quality.py)."""
+    with metrics.timed("quality"):
+        return quality.annotate(devices.device_for_root(root_path), df, _cache.get(root_path))
+
+
+def merge_sorted_runs(frames: List[pd.DataFrame]) -> pd.DataFrame:
     """
-    Downloads a Dropbox folder as a single ZIP file.
-    MUCH faster than downloading each CSV individually.
+    Merge frames that are each (almost always) already in time order.
+
+    - a run that is not monotonic is sorted on its own (rare)
+    - runs are ordered by their first timestamp; if none overlap the
+      result is a plain concat in that order (append-only, no sort)
+    - overlapping runs (re-exported files) are merged with a stable
+      mergesort, which only merges the existing runs, then duplicate
+      timestamps are dropped keeping the later file's row
+    Rows without a timestamp are dropped.
     """
-    print(f"📦 Download ZIP: {folder_path}")
-    _, res = dbx.files_download_zip(folder_path)
+    runs = []
+    for df in frames:
+        if df is None or df.empty:
+            continue
+        ts = df["timestamp"]
+        if ts.hasnans:
+            df = df[ts.notna()]
+            ts = df["timestamp"]
+            if df.empty:
+                continue
+        if not ts.is_monotonic_increasing:
+            df = df.sort_values("timestamp", kind="mergesort")
+        runs.append(df)
+
+    if not runs:
+        return pd.DataFrame()
+    if len(runs) == 1:
+        return runs[0].reset_index(drop=True)
 
-    temp_zip_path = tempfile.mktemp(suffix=".zip")
-    with open(temp_zip_path, "wb") as f:
-        f.write(res.content)
+    order = sorted(range(len(runs)), key=lambda i: (runs[i]["timestamp"].iloc[0], i))
+    runs = [runs[i] for i in order]
 
-    return temp_zip_path
+    overlapping = any(
+        runs[i]["timestamp"].iloc[0] <= runs[i - 1]["timestamp"].iloc[-1]
+        for i in range(1, len(runs))
+    )
 
+    df_all = pd.concat(runs, ignore_index=True)
+    if not overlapping:
+        return df_all
 
-def read_zip_csvs(zip_path: str) -> pd.DataFrame:
+    df_all = df_all.sort_values("timestamp", kind="mergesort", ignore_index=True)
+    dup = df_all["timestamp"].duplicated(keep="last")
+    if dup.any():
+        df_all = df_all[~dup].reset_index(drop=True)
+    return df_all
+
+
+def prepare_frames(frames: List[pd.DataFrame], device: Optional[str] = None) -> pd.DataFrame:
     """
-    Extract CSVs from ZIP → merge → sort by timestamp.
+    Raw CSV frames → timestamp → apply metric catalog → compact → merge sorted runs.
     """
     dfs = []
+    with metrics.timed("catalog"):
+        for df in frames:
+            df = add_timestamp_column(df)
+            if device:
+                df = apply_catalog(df, device)
+            dfs.append(df)
 
-    with zipfile.ZipFile(zip_path, "r") as z:
-        for f in z.namelist():
-            if f.lower().endswith(".csv"):
-                with z.open(f) as fp:
-                    df = pd.read_csv(fp)
-                    df = add_timestamp_column(df)
-                    dfs.append(df)
+    with metrics.timed("merge"):
+        # compact ครั้งเดียวหลัง merge (ต่อไฟล์ช้ากว่า: overhead ของ pandas ต่อ call)
+        return compact_frame(merge_sorted_runs(dfs))
 
-    if not dfs:
-        return pd.DataFrame()
 
-    df_all = pd.concat(dfs, ignore_index=True)
-    df_all = df_all.sort_values("timestamp").reset_index(drop=True)
-    return df_all
+# ─────────────────────────────────────────────────────────────
+# Compact Layout (what the cache keeps)
+# ─────────────────────────────────────────────────────────────
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Drop columns nothing reads (timestamp sources like TIM / Year..Second,
+    '* Evt' event registers) and downcast 64-bit registers that passed
+    through the catalog: int64 → smallest int, float64 → float32 when the
+    JSON export (df_to_records) stays identical.
+    """
+    if df is None or df.empty:
+        return df
+
+    drop = [c for c in df.columns if c in TIMESTAMP_SOURCE_COLS or str(c).endswith(" Evt")]
+    if drop:
+        df = df.drop(columns=drop)
+
+    cast = {}
+    for col in df.columns:
+        values = df[col].to_numpy()
+        if values.dtype == np.int64:
+            cast[col] = pd.to_numeric(df[col], downcast="integer")
+        elif values.dtype == np.float64:
+            f32 = values.astype(np.float32)
+            if np.array_equal(_float32_for_json(f32), values, equal_nan=True):
+                cast[col] = f32
+    return df.assign(**cast) if cast else df
 
 
 # ─────────────────────────────────────────────────────────────
 # Timestamp Builder
 # ─────────────────────────────────────────────────────────────
+TIMESTAMP_PARTS = {
+    "year": ["Year", "YEAR", "year"],
+    "month": ["Month", "MONTH", "month"],
+    "day": ["Day", "DAY", "day"],
+    "hour": ["Hour", "HOUR", "hour"],
+    "minute": ["Minute", "MINUTE", "minute"],
+    "second": ["Second", "SECOND", "second"],
+}
+
+# ใช้สร้าง timestamp เท่านั้น → compact_frame ทิ้งหลัง parse
+TIMESTAMP_SOURCE_COLS = {"TIM", "Time"} | {n for names in TIMESTAMP_PARTS.values() for n in names}
+
+
 def add_timestamp_column(df: pd.DataFrame) -> pd.DataFrame:
     if "timestamp" in df.columns:
         return df
@@ -111,14 +221,7 @@ def add_timestamp_column(df: pd.DataFrame) -> pd.DataFrame:
         df["timestamp"] = pd.to_datetime(df["TIM"], errors="coerce")
         return df
 
-    keys = {
-        "year": ["Year", "YEAR", "year"],
-        "month": ["Month", "MONTH", "month"],
-        "day": ["Day", "DAY", "day"],
-        "hour": ["Hour", "HOUR", "hour"],
-        "minute": ["Minute", "MINUTE", "minute"],
-        "second": ["Second", "SECOND", "second"],
-    }
+    keys = TIMESTAMP_PARTS
 
     def pick(names):
         for n in names:
@@ -149,7 +252,7 @@ def add_timestamp_column(df: pd.DataFrame) -> pd.DataFrame:
 
 
 # ─────────────────────────────────────────────────────────────
-# Read All CSV (ZIP FAST VERSION)
+# Read All CSV
 # ─────────────────────────────────────────────────────────────
 def read_all_csv_under(
     root_path: str,
@@ -158,11 +261,17 @@ def read_all_csv_under(
 ) -> pd.DataFrame:
 
     if use_cache and root_path in _cache:
+        metrics.inc("cache_hits_total", cache="sensor_frame")
         print(f"✔ Cache used for {root_path}")
         return _cache[root_path]
+    if use_cache:
+        metrics.inc("cache_misses_total", cache="sensor_frame")
+        if _is_consumer():
+            # worker อื่นไม่โหลดจาก source เอง → รอ snapshot จาก producer
+            return pd.DataFrame()
 
-    dbx = get_client()
-    folders = list_date_folders(root_path)
+    source, device_type = _source_for(root_path)
+    folders = source.list_partitions(root_path)
     if skip_old_data and len(folders) > 7:
         folders = sorted(folders)[-7:]   # keep last 7 subfolders
 
@@ -170,38 +279,125 @@ def read_all_csv_under(
 
     for folder in folders:
         try:
-            zip_path = download_folder_as_zip(dbx, folder)
-            df = read_zip_csvs(zip_path)
-            dfs.append(df)
+            df = prepare_frames(source.read_partition(folder), device_type)
+            if not df.empty:
+                dfs.append(df)
         except Exception as e:
-            print(f"⚠️ Failed ZIP load in {folder}: {e}")
+            print(f"⚠️ Failed to load {folder}: {e}")
 
     if not dfs:
         return pd.DataFrame()
 
-    df_all = pd.concat(dfs, ignore_index=True)
-    df_all = df_all.sort_values("timestamp").reset_index(drop=True)
+    # แต่ละโฟลเดอร์เรียงเวลามาแล้ว → ต่อกันตรง ๆ ถ้าไม่ทับช่วงกัน
+    with metrics.timed("merge"):
+        df_all = merge_sorted_runs(dfs)
 
     if use_cache:
-        _cache[root_path] = df_all
+        df_all = _check_quality(root_path, df_all)
+        publish_snapshot(root_path, df_all)
         print(f"💾 Cached ({len(df_all)} rows) for {root_path}")
 
     return df_all
 
 
+# ─────────────────────────────────────────────────────────────
+# Snapshot Versioning (for ETag / Last-Modified)
+# ─────────────────────────────────────────────────────────────
+def _fingerprint(df: pd.DataFrame) -> Tuple:
+    if df is None or df.empty:
+        return (0, None)
+    # hash ทุกแถว (~5 ms / 7 วัน): แถวที่ถูก export ใหม่/แก้ค่า ตรงกลาง frame ก็ต้องได้ ETag ใหม่
+    rows = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return (tuple(df.columns), hashlib.sha1(rows.tobytes()).hexdigest())
+
+
+def publish_snapshot(root_path: str, df: pd.DataFrame, fingerprint: Optional[Tuple] = None) -> int:
+    """
+    Store df as the cached frame for root_path.
+    Bumps the snapshot version only if the content (columns or any value)
+    changed. A caller that already knows it did (append_rows) passes a
+    fingerprint instead of having the whole frame hashed.
+    """
+    _cache[root_path] = df
+    return _touch_version(root_path, df, fingerprint)
+
+
+def _touch_version(key: str, df: pd.DataFrame, fingerprint: Optional[Tuple] = None) -> int:
+    fp = fingerprint if fingerprint is not None else _fingerprint(df)
+    meta = _snapshot_meta.get(key)
+    if meta is None or meta["fingerprint"] != fp:
+        last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+        if meta is not None and last_modified <= meta["last_modified"]:
+            # Last-Modified มีความละเอียดแค่วินาที แต่ push / tail bump ได้หลายครั้งต่อวินาที
+            # → เลื่อนไป 1 วินาที ไม่งั้น If-Modified-Since ได้ 304 ทั้งที่ข้อมูลเปลี่ยน
+            last_modified = meta["last_modified"] + timedelta(seconds=1)
+        meta = {
+            "version": (meta["version"] + 1) if meta else 1,
+            "last_modified": last_modified,
+            "fingerprint": fp,
+        }
+        _snapshot_meta[key] = meta
+
+    return meta["version"]
+
+
+def get_snapshot_version(root_path: str) -> Tuple[int, Optional[datetime]]:
+    """
+    (version, last_modified) of the cached frame. (0, None) = not loaded yet.
+    """
+    meta = _snapshot_meta.get(root_path)
+    if meta is None:
+        return 0, None
+    return meta["version"], meta["last_modified"]
+
+
+def get_sensor_snapshot_version() -> int:
+    """
+    Version of the synced sensor snapshot (changes when either device changes).
+    0 = sync has not run yet.
+    """
+    return get_snapshot_version(ALIGNED_KEY)[0]
+
+
 # ─────────────────────────────────────────────────────────────
 # Export Cleaner
 # ─────────────────────────────────────────────────────────────
+def _float32_for_json(values: np.ndarray) -> np.ndarray:
+    """
+    float32 → float64 rounded to 7 significant digits,
+    so 28.03 is sent as 28.03 and not 28.030000686645508.
+    """
+    x = values.astype(np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mag = np.floor(np.log10(np.abs(x)))
+    decimals = np.where(np.isfinite(mag), 6 - mag, 0)
+    factor = np.power(10.0, decimals)
+    return np.round(x * factor) / factor
+
+
 def df_to_records(df: pd.DataFrame) -> List[Dict]:
     if df.empty:
         return []
-    df = df.replace({np.nan: None})
-    return df.to_dict(orient="records")
+    with metrics.timed("serialize"):
+        f32 = df.select_dtypes(include=[np.float32]).columns
+        if len(f32):
+            df = df.assign(**{c: _float32_for_json(df[c].to_numpy()) for c in f32})
+        df = df.replace({np.nan: None})
+        return df.to_dict(orient="records")
 
 
 # ─────────────────────────────────────────────────────────────
 # Aggregation
 # ─────────────────────────────────────────────────────────────
+AGG_FREQ = {
+    "1min": "1T",
+    "5min": "5T",
+    "15min": "15T",
+    "30min": "30T",
+    "1hour": "1H",
+}
+
+
 def aggregate_data(
     df: pd.DataFrame,
     interval: Literal["1min", "5min", "15min", "30min", "1hour"],
@@ -210,116 +406,615 @@ def aggregate_data(
     if df.empty:
         return df
 
-    freq = {
-        "1min": "1T",
-        "5min": "5T",
-        "15min": "15T",
-        "30min": "30T",
-        "1hour": "1H",
-    }.get(interval, "5T")
+    freq = AGG_FREQ.get(interval, "5T")
 
-    numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-    df_numeric = df[["timestamp"] + numeric_cols].copy()
+    with metrics.timed("aggregate"):
+        # ค่าที่ถูก flag (spike / ค้าง / ผิดช่วง) ไม่นำมาเฉลี่ย
+        df = quality.mask_flagged(df)
+        numeric_cols = [
+            c for c in df.select_dtypes(include=[np.number]).columns
+            if c != quality.QUALITY_COL
+        ]
+        df_numeric = df[["timestamp"] + numeric_cols].copy()
 
-    df_agg = df_numeric.set_index("timestamp").resample(freq).mean().reset_index()
+        df_agg = df_numeric.set_index("timestamp").resample(freq).mean().reset_index()
     return df_agg
 
 
 # ─────────────────────────────────────────────────────────────
-# Bioelectric Voltage Conversion
+# Delta (rows since timestamp)
 # ─────────────────────────────────────────────────────────────
-def convert_bioelectric_voltage(df: pd.DataFrame) -> pd.DataFrame:
-    if df is None or df.empty:
+def _naive(ts: pd.Timestamp) -> pd.Timestamp:
+    return ts.tz_localize(None) if ts.tzinfo is not None else ts
+
+
+def slice_since(df: pd.DataFrame, since, interval: str = "raw") -> pd.DataFrame:
+    """
+    Rows with timestamp >= since (binary search on the sorted frame).
+    For aggregated intervals `since` is floored to its bucket so the
+    bucket the client already has (possibly partial) is sent again.
+    tz-aware values are taken as wall-clock time like the device data.
+    """
+    if since is None or df is None or df.empty:
         return df
 
-    def adc_to_voltage(v):
-        try:
-            return (float(v) - 32768.0) * (20.0 / 65535.0)
-        except Exception:
-            return None
+    since = _naive(pd.Timestamp(since))
+    if interval != "raw":
+        since = since.floor(AGG_FREQ.get(interval, "5T"))
 
-    if LEAF_COL in df.columns:
-        df["Leaf_Voltage"] = df[LEAF_COL].apply(adc_to_voltage)
-    if GROUND_COL in df.columns:
-        df["Ground_Voltage"] = df[GROUND_COL].apply(adc_to_voltage)
+    start = int(df["timestamp"].searchsorted(since, side="left"))
+    return df.iloc[start:]
 
-    return df
+
+# ─────────────────────────────────────────────────────────────
+# Multi-device Time Alignment (WISE-4051 × WISE-4012)
+# ─────────────────────────────────────────────────────────────
+def align_devices(
+    df4051: Optional[pd.DataFrame],
+    df4012: Optional[pd.DataFrame],
+    tolerance: pd.Timedelta = ALIGN_TOLERANCE,
+) -> pd.DataFrame:
+    """
+    As-of join: every WISE-4051 row gets the nearest WISE-4012 row
+    within `tolerance` (NaN if none). Both sides must have 'timestamp'.
+    """
+    if df4051 is None or df4051.empty:
+        return pd.DataFrame()
+    if df4012 is None or df4012.empty:
+        return df4051.reset_index(drop=True)
+
+    left = df4051.dropna(subset=["timestamp"])
+    right = df4012.dropna(subset=["timestamp"])
+    if not left["timestamp"].is_monotonic_increasing:
+        left = left.sort_values("timestamp")
+    if not right["timestamp"].is_monotonic_increasing:
+        right = right.sort_values("timestamp")
+
+    return pd.merge_asof(
+        left,
+        right,
+        on="timestamp",
+        direction="nearest",
+        tolerance=tolerance,
+        suffixes=("", "_4012"),
+    )
+
+
+def get_aligned_frame() -> Optional[pd.DataFrame]:
+    """
+    Latest aligned 4051+4012 frame from the sync loop (None until first sync).
+    Feature code should read this instead of joining the devices itself.
+    """
+    return _aligned_cache["data"]
+
+
+def get_aligned_all(limit=None, max_points=None, method="lttb") -> List[Dict]:
+    df = get_aligned_frame()
+    if df is None:
+        return []
+    return frame_records(df, CO2_PLOT_COLS + ELEC_PLOT_COLS, limit=limit, max_points=max_points, method=method)
 
 
 # ─────────────────────────────────────────────────────────────
 # High-level API
 # ─────────────────────────────────────────────────────────────
-def get_co2_all_raw(limit=None, interval="raw") -> List[Dict]:
-    df = read_all_csv_under(WISE4051_ROOT)
+def frame_records(
+    df: pd.DataFrame,
+    plot_cols=(),
+    limit=None,
+    interval="raw",
+    max_points=None,
+    method="lttb",
+    since=None,
+) -> List[Dict]:
+    """
+    since → aggregate → tail(limit) → downsample → records.
+    limit does not apply to a delta (since=...): cutting it would drop the
+    rows right after the client's last one and leave a gap.
+    Pure function of df, so it also runs in the CPU pool on a shared frame.
+    """
+    df = slice_since(df, since, interval)
 
     if interval != "raw":
         df = aggregate_data(df, interval)
 
-    if limit:
+    if limit and since is None:
         df = df.tail(limit)
 
+    if max_points:
+        df = downsample(df, max_points, method, plot_cols)
+
     return df_to_records(df)
 
 
-def get_elec_all_raw(limit=None, interval="raw") -> List[Dict]:
-    df = read_all_csv_under(WISE4012_ROOT)
-    df = convert_bioelectric_voltage(df)
+def get_device_all_raw(
+    device_id: str,
+    limit=None,
+    interval="raw",
+    max_points=None,
+    method="lttb",
+    since=None,
+) -> List[Dict]:
+    device = devices.get_device(device_id)
+    if device is None:
+        raise KeyError(f"Unknown device '{device_id}'")
+    df = read_all_csv_under(device["root"])
+    return frame_records(df, PLOT_COLS_BY_TYPE.get(device["type"], ()), limit, interval, max_points, method, since)
+
+
+def get_device_history_raw(
+    device_id: str,
+    start,
+    end,
+    interval="1hour",
+    max_points=None,
+    method="lttb",
+) -> List[Dict]:
+    """
+    Any time range, including data older than the 7-day sync window.
+    Only day partitions overlapping [start, end] are loaded (backend/dropbox/history.py).
+    """
+    device = devices.get_device(device_id)
+    if device is None:
+        raise KeyError(f"Unknown device '{device_id}'")
+
+    start, end = (_naive(pd.Timestamp(t)) for t in (start, end))
+    df = history.read_range(device["root"], start, end)
 
     if interval != "raw":
         df = aggregate_data(df, interval)
 
-    if limit:
-        df = df.tail(limit)
+    if max_points:
+        df = downsample(df, max_points, method, PLOT_COLS_BY_TYPE.get(device["type"], ()))
 
     return df_to_records(df)
 
 
+def get_co2_all_raw(limit=None, interval="raw", max_points=None, method="lttb", since=None) -> List[Dict]:
+    return get_device_all_raw(CO2_DEVICE_ID, limit, interval, max_points, method, since)
+
+
+def get_elec_all_raw(limit=None, interval="raw", max_points=None, method="lttb", since=None) -> List[Dict]:
+    return get_device_all_raw(ELEC_DEVICE_ID, limit, interval, max_points, method, since)
+
+
+# ─────────────────────────────────────────────────────────────
+# Shared frames (CPU pool, backend/core/execution.py)
+# ─────────────────────────────────────────────────────────────
+def shared_frame(key: str) -> Optional[Dict]:
+    """
+    Ref to the cached frame of a device root (or ALIGNED_KEY) at its
+    current snapshot version, exported once per version. None = not loaded.
+    """
+    version, _ = get_snapshot_version(key)
+    ref = _shared_refs.get(key)
+    if ref is not None and ref["version"] == version:
+        return ref   # SHARED_SNAPSHOT: producer export ไว้แล้ว
+    df = get_aligned_frame() if key == ALIGNED_KEY else _cache.get(key)
+    if not version or df is None or df.empty:
+        return None
+    with metrics.timed("share_frame"):
+        return shared_frames.export(key, version, df)
+
+
 # ─────────────────────────────────────────────────────────────
 # REALTIME CACHE
 # ─────────────────────────────────────────────────────────────
-def refresh_sensor_cache(limit=1000, interval="5min"):
-    global _sensor_cache
+def _keep_live_tail(df: pd.DataFrame, live: Optional[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Rows pushed / tailed after the last file that the source has are kept
+    on top of the full read, so a sync never rolls the snapshot back.
+    """
+    if live is None or live.empty:
+        return df
+    if df.empty:
+        return live
+
+    tail = live[live["timestamp"] > df["timestamp"].iloc[-1]]
+    if tail.empty:
+        return df
+    return pd.concat([df, tail], ignore_index=True)
 
-    print("🔁 Refreshing sensors...")
 
-    # 4051
-    df4051 = read_all_csv_under(WISE4051_ROOT, use_cache=False)
+def refresh_device(device: Dict, limit=1000, interval="5min") -> Optional[pd.DataFrame]:
+    """
+    Reload one device from Dropbox, publish its snapshot, feed carbon
+    accounting and store the aggregated tail in _sensor_cache.
+    """
+    root = device["root"]
+
+    with metrics.timed("sync_device", device=device["id"]):
+        df = read_all_csv_under(root, use_cache=False)
+        # download นอก lock, merge → publish ใน lock: แถวที่ append_rows publish
+        # ระหว่างนี้ (push ไม่มีใน Dropbox) ต้องไม่ถูกทับ
+        with _append_lock:
+            df = _keep_live_tail(df, _cache.get(root))
+            df = _check_quality(root, df)
+            publish_snapshot(root, df)
+
+    if CO2_COL in metric_names(device["type"]):
+        with metrics.timed("accounting"):
+            new = carbon_accounting.pending(df, device["plant_id"])
+            carbon_accounting.ingest(quality.mask_flagged(new), device["plant_id"], CO2_COL, TEMP_COL, HUMID_COL)
+
     if interval != "raw":
-        df4051 = aggregate_data(df4051, interval)
+        df = aggregate_data(df, interval)
     if limit:
-        df4051 = df4051.tail(limit)
+        df = df.tail(limit)
 
-    _sensor_cache["wise4051"] = {
-        "data": df4051.copy() if not df4051.empty else None,
+    # aggregate / tail ได้ frame ใหม่อยู่แล้ว (raw = view ของ frame ที่ cache ไว้) ไม่ต้อง copy
+    _sensor_cache[device["id"]] = {
+        "data": df if not df.empty else None,
         "last_updated": datetime.now(),
     }
+    # ค่าของ bucket สุดท้ายเปลี่ยนได้โดย (len, first, last) ไม่เปลี่ยน → ผูกกับ version ของ device
+    _touch_version(_tail_key(device["id"]), df, fingerprint=(get_snapshot_version(root)[0], limit, interval))
+    return df
 
-    # 4012
-    df4012 = read_all_csv_under(WISE4012_ROOT, use_cache=False)
-    df4012 = convert_bioelectric_voltage(df4012)
-    if interval != "raw":
-        df4012 = aggregate_data(df4012, interval)
-    if limit:
-        df4012 = df4012.tail(limit)
 
-    _sensor_cache["wise4012"] = {
-        "data": df4012.copy() if not df4012.empty else None,
-        "last_updated": datetime.now(),
+def _refresh_device_safe(device: Dict, limit, interval) -> Optional[pd.DataFrame]:
+    try:
+        return refresh_device(device, limit, interval)
+    except Exception as e:
+        print(f"⚠️ Failed to refresh {device['id']}: {e}")
+        # ใช้ tail ของรอบก่อน: version ของ device ไม่เปลี่ยน → aligned view ต้องเหมือนเดิมด้วย
+        return (_sensor_cache.get(device["id"]) or {}).get("data")
+
+
+def _print_cycle_stages(before: Dict[str, Dict[str, float]], wall: float, cpu: float) -> None:
+    """Where the cycle's time went: network stages vs CPU stages."""
+    after = metrics.stage_totals()
+    spent = {
+        stage: t["seconds"] - before.get(stage, {}).get("seconds", 0.0)
+        for stage, t in after.items()
+        if stage not in ("sync_cycle", "sync_device")
     }
+    top = sorted(((s, v) for s, v in spent.items() if v >= 0.01), key=lambda x: -x[1])[:6]
+    print(
+        f"⏱ Sync {wall:.1f}s (CPU {cpu:.1f}s): "
+        + (", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in top) or "no stages")
+    )
+
+
+def refresh_sensor_cache(limit=1000, interval="5min"):
+    print(f"🔁 Refreshing {len(devices.DEVICES)} devices...")
+    stages_before = metrics.stage_totals()
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+
+    # ทุก device พร้อมกัน (จำกัดด้วย SYNC_WORKERS)
+    results = dict(zip(
+        devices.DEVICES,
+        _sync_executor.map(
+            lambda d: _refresh_device_safe(d, limit, interval),
+            devices.list_devices(),
+        ),
+    ))
+
+    cycle = dropbox_client.take_cycle_metrics()
+    if cycle["requests"]:
+        print(
+            f"📊 Dropbox: {int(cycle['requests'])} requests, "
+            f"{cycle['bytes'] / 1e6:.1f} MB, {int(cycle['retries'])} retries"
+        )
+
+    # 4051 ⨝ 4012
+    aligned = align_devices(results.get(CO2_DEVICE_ID), results.get(ELEC_DEVICE_ID))
+    _aligned_cache["data"] = aligned if not aligned.empty else None
+    _aligned_cache["last_updated"] = datetime.now()
+    # version ของ aligned ผูกกับ version ของทั้งสอง device
+    _touch_version(
+        ALIGNED_KEY,
+        aligned,
+        fingerprint=(
+            get_snapshot_version(WISE4051_ROOT)[0],
+            get_snapshot_version(WISE4012_ROOT)[0],
+        ),
+    )
+
+    # CPU ≈ wall → CPU-bound, CPU ≪ wall → รอ network (CPU รวมทุก thread ของ process)
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    metrics.observe("stage_seconds", wall, stage="sync_cycle")
+    metrics.set_gauge("sync_last_seconds", wall, clock="wall")
+    metrics.set_gauge("sync_last_seconds", cpu, clock="cpu")
+    metrics.set_gauge("sync_last_timestamp_seconds", time.time())
+    _print_cycle_stages(stages_before, wall, cpu)
+    print("💾 Cache: " + ", ".join(
+        f"{device_id} {u['rows']} rows {u['bytes'] / 1e6:.1f} MB ({u['bytes_per_row']:.0f} B/row)"
+        for device_id, u in cache_usage().items()
+    ))
 
 
 def get_sensor_cache():
     return _sensor_cache
 
 
+# ─────────────────────────────────────────────────────────────
+# LIVE INGEST (sources that can watch, e.g. local directory)
+# ─────────────────────────────────────────────────────────────
+def append_rows(root_path: str, raw: pd.DataFrame, initialize: bool = False) -> int:
+    """
+    Merge freshly written CSV rows into the cached frame of root_path and
+    publish a new snapshot. Rows at or before the cached last timestamp are
+    ignored. Returns the number of rows added.
+
+    initialize=True publishes the rows even if the device has not been
+    loaded yet (push ingest); the next sync keeps them on top of the
+    full read.
+
+    Under SHARED_SNAPSHOT a non-producer worker forwards the batch to the
+    producer instead (shared_frames inbox) and returns its row count.
+    """
+    if _is_consumer():
+        shared_frames.post_rows(root_path, raw)
+        return len(raw)
+
+    device = devices.device_for_root(root_path)
+    device_type = device["type"] if device else None
+    df_new = prepare_frames([raw], device_type)
+    if df_new.empty:
+        return 0
+
+    with _append_lock:
+        current = _cache.get(root_path)
+        if current is None or current.empty:
+            if not initialize:
+                # ยังไม่เคยโหลดเต็ม → รอ sync รอบแรก
+                return 0
+            df_all = df_new = quality.annotate(device, df_new)
+            fingerprint = None
+        else:
+            df_new = df_new[df_new["timestamp"] > current["timestamp"].iloc[-1]]
+            if df_new.empty:
+                return 0
+            df_new = quality.annotate(device, df_new)
+            df_all = pd.concat([current, df_new], ignore_index=True)
+            # มีแถวใหม่แน่นอน → ไม่ต้อง hash ทั้ง frame (O(n) ต่อ batch) แค่ให้ fingerprint ไม่ซ้ำ
+            fingerprint = ("append", get_snapshot_version(root_path)[0], df_all["timestamp"].iloc[-1], len(df_all))
+
+        publish_snapshot(root_path, df_all, fingerprint)
+
+    if device and CO2_COL in metric_names(device_type):
+        # mask เฉพาะแถวที่ accounting ยังไม่ได้รวม (ไม่ใช่ทั้ง frame ทุก batch)
+        new = carbon_accounting.pending(df_all, device["plant_id"])
+        carbon_accounting.ingest(quality.mask_flagged(new), device["plant_id"], CO2_COL, TEMP_COL, HUMID_COL)
+
+    return len(df_new)
+
+
+def start_watchers() -> List[str]:
+    """Start change notification for every device whose source supports it."""
+    watched = []
+    for device in devices.list_devices():
+        try:
+            if get_source(device["source"]).watch(device["root"], append_rows):
+                watched.append(device["id"])
+        except Exception as e:
+            print(f"⚠️ Cannot watch {device['id']}: {e}")
+    return watched
+
+
+def stop_watchers() -> None:
+    stop_sources()
+
+
+# ─────────────────────────────────────────────────────────────
+# SHARED SNAPSHOT (SHARED_SNAPSHOT, uvicorn --workers N)
+# ─────────────────────────────────────────────────────────────
+# key -> ref ใน shared/ ที่ process นี้ใช้อยู่ (producer: export แล้ว, consumer: map แล้ว)
+_shared_refs: Dict[str, Dict] = {}
+
+# consumer: root_path -> timestamp ล่าสุดที่ replay quality / accounting แล้ว
+_replayed_until: Dict[str, pd.Timestamp] = {}
+
+
+def _tail_key(device_id: str) -> str:
+    return f"tail:{device_id}"
+
+
+def _is_consumer() -> bool:
+    return settings.SHARED_SNAPSHOT and not shared_frames.is_producer()
+
+
+def _tail(device_id: str):
+    entry = _sensor_cache.get(device_id) or {}
+    return entry.get("data"), {"last_updated": entry.get("last_updated")}
+
+
+def _shared_entries():
+    """(key, getter → (current frame, extra manifest fields)) of everything workers serve."""
+    for device in devices.list_devices():
+        yield device["root"], lambda root=device["root"]: (_cache.get(root), {})
+        yield _tail_key(device["id"]), lambda device_id=device["id"]: _tail(device_id)
+    yield ALIGNED_KEY, lambda: (get_aligned_frame(), {"last_updated": _aligned_cache["last_updated"]})
+
+
+def publish_shared() -> int:
+    """
+    Producer: export every frame whose snapshot version changed to shared/
+    and rewrite the manifest. Returns the number of frames exported.
+    """
+    frames, exported = {}, 0
+    for key, current in _shared_entries():
+        # version ก่อน frame: frame ใหม่กว่า version ได้ (publish_snapshot) แต่ไม่เก่ากว่า
+        version, last_modified = get_snapshot_version(key)
+        df, extra = current()
+        if not version or df is None or df.empty:
+            continue
+
+        ref = _shared_refs.get(key)
+        if ref is None or ref["version"] != version:
+            with metrics.timed("share_frame"):
+                ref = shared_frames.export(key, version, df, shared=True)
+            _shared_refs[key] = ref
+            _adopt_mapped(key, df, ref)
+            exported += 1
+        frames[key] = {**ref, "last_modified": last_modified, **extra}
+
+    if exported:
+        shared_frames.write_manifest(frames)
+    return exported
+
+
+def _adopt_mapped(key: str, df: pd.DataFrame, ref: Dict) -> None:
+    """Producer serves from the mapped copy too, so its heap copy is freed."""
+    mapped = shared_frames.load(ref)
+    with _append_lock:
+        # เปลี่ยนเฉพาะถ้ายังเป็น frame เดิมที่ export ไป (ไม่ทับ frame ที่ใหม่กว่า)
+        if key == ALIGNED_KEY:
+            if _aligned_cache["data"] is df:
+                _aligned_cache["data"] = mapped
+        elif key.startswith("tail:"):
+            entry = _sensor_cache.get(key[len("tail:"):])
+            if entry and entry["data"] is df:
+                entry["data"] = mapped
+        elif _cache.get(key) is df:
+            _cache[key] = mapped
+
+
+def load_shared() -> int:
+    """
+    Consumer: map every frame whose manifest version differs from the one
+    in use. Each frame is swapped in whole (data first, then version), so
+    a request sees either the old or the new snapshot of a key.
+    Returns the number of frames picked up.
+    """
+    manifest = shared_frames.read_manifest()
+    if manifest is None:
+        return 0
+
+    picked = 0
+    for key, entry in manifest["frames"].items():
+        if (_shared_refs.get(key) or {}).get("version") == entry["version"]:
+            continue
+        try:
+            df = shared_frames.load(entry)
+        except FileNotFoundError:
+            continue   # producer prune ไปแล้ว → รอ manifest ถัดไป
+
+        last_updated = entry.get("last_updated")
+        last_updated = datetime.fromisoformat(last_updated) if last_updated else datetime.now()
+        if key == ALIGNED_KEY:
+            _aligned_cache["data"], _aligned_cache["last_updated"] = df, last_updated
+        elif key.startswith("tail:"):
+            _sensor_cache[key[len("tail:"):]] = {"data": df, "last_updated": last_updated}
+        else:
+            _cache[key] = df
+            _replay_derived(key, df)
+
+        _snapshot_meta[key] = {
+            "version": entry["version"],
+            "last_modified": datetime.fromisoformat(entry["last_modified"]),
+            "fingerprint": None,
+        }
+        _shared_refs[key] = entry
+        picked += 1
+    return picked
+
+
+def _replay_derived(root_path: str, df: pd.DataFrame) -> None:
+    """
+    Alerts and carbon accounting are per-process state: feed them the rows
+    of the shared frame this worker has not seen yet (same input as the
+    producer, so the same result).
+    """
+    device = devices.device_for_root(root_path)
+    if device is None or df.empty:
+        return
+
+    last = _replayed_until.get(root_path)
+    new = df if last is None else df.iloc[int(df["timestamp"].searchsorted(last, side="right")):]
+    if new.empty:
+        return
+    _replayed_until[root_path] = new["timestamp"].iloc[-1]
+
+    quality.annotate(device, new)
+    if CO2_COL in metric_names(device["type"]):
+        carbon_accounting.ingest(quality.mask_flagged(new), device["plant_id"], CO2_COL, TEMP_COL, HUMID_COL)
+
+
+def sync_shared() -> None:
+    """
+    One SNAPSHOT_POLL_SECONDS tick. Producer: append rows forwarded by
+    other workers, then publish. Consumer: pick up the newest snapshot.
+    """
+    if _is_consumer():
+        if load_shared():
+            print(f"🔗 Mapped shared snapshot (sensor version {get_sensor_snapshot_version()})")
+        return
+
+    for root_path, raw in shared_frames.drain_rows():
+        append_rows(root_path, raw, initialize=True)
+    publish_shared()
+
+
 # ─────────────────────────────────────────────────────────────
 # CLEAR CACHE
 # ─────────────────────────────────────────────────────────────
 def clear_cache():
     global _cache, _sensor_cache
     _cache = {}
-    _sensor_cache = {
-        "wise4051": {"data": None, "last_updated": None},
-        "wise4012": {"data": None, "last_updated": None},
-    }
+    _sensor_cache = _empty_sensor_cache()
+    _shared_refs.clear()
+    _replayed_until.clear()
+    _aligned_cache["data"] = None
+    _aligned_cache["last_updated"] = None
+    history.clear()
+    quality.reset()
     print("🧹 Cache cleared.")
+
+
+# ─────────────────────────────────────────────────────────────
+# METRICS (cache memory, read at /metrics scrape time)
+# ─────────────────────────────────────────────────────────────
+# key -> (id(df), len(df), bytes) วัดใหม่เฉพาะตอน frame เปลี่ยน
+_frame_bytes_memo: Dict[str, Tuple[int, int, int]] = {}
+
+
+def _frame_bytes(key: str, df: Optional[pd.DataFrame]) -> int:
+    if df is None or df.empty:
+        return 0
+    memo = _frame_bytes_memo.get(key)
+    if memo and memo[0] == id(df) and memo[1] == len(df):
+        return memo[2]
+    size = int(df.memory_usage(index=True, deep=True).sum())
+    _frame_bytes_memo[key] = (id(df), len(df), size)
+    return size
+
+
+def cache_usage() -> Dict[str, Dict]:
+    """device id → rows / bytes of its cached frame (the 7-day window)."""
+    usage = {}
+    for device in devices.list_devices():
+        df = _cache.get(device["root"])
+        rows = 0 if df is None else len(df)
+        size = _frame_bytes(f"sensor_frame:{device['id']}", df)
+        usage[device["id"]] = {"rows": rows, "bytes": size, "bytes_per_row": size / rows if rows else 0.0}
+    return usage
+
+
+def _collect_cache_metrics():
+    sizes, rows = [], []
+    for device in devices.list_devices():
+        frame = _cache.get(device["root"])
+        tail = (_sensor_cache.get(device["id"]) or {}).get("data")
+        for cache, df in (("sensor_frame", frame), ("sensor_tail", tail)):
+            labels = {"cache": cache, "device": device["id"]}
+            sizes.append((labels, _frame_bytes(f"{cache}:{device['id']}", df)))
+            rows.append((labels, 0 if df is None else len(df)))
+
+    aligned = _aligned_cache["data"]
+    sizes.append(({"cache": "aligned"}, _frame_bytes("aligned", aligned)))
+    rows.append(({"cache": "aligned"}, 0 if aligned is None else len(aligned)))
+
+    return [
+        ("cache_bytes", "gauge", "Memory held by a cache (pandas memory_usage, deep)", sizes),
+        ("cache_rows", "gauge", "Rows held by a cached frame", rows),
+        ("sync_producer", "gauge", "1 if this process syncs from the sources (0 = maps the shared snapshot)",
+         [({}, 0 if _is_consumer() else 1)]),
+    ]
+
+
+metrics.register_collector(_collect_cache_metrics)
+metrics.describe("sync_last_seconds", "gauge", "Duration of the last sync cycle (clock=cpu counts every thread of the process)")
+metrics.describe("sync_last_timestamp_seconds", "gauge", "Unix time the last sync cycle finished")
@@ -0,0 +1,280 @@
+# backend/dropbox/shared_frames.py
+"""
+Cached frames as memory-mapped column files, so other processes (the CPU
+pool in backend/core/execution.py, other uvicorn workers) read them
+without pickling.
+
+    ref = export(key, version, df)      # once per (key, version)
+    df = load(ref)                      # in any process, zero-copy
+
+Layout under SHARED_FRAME_DIR (tmpfs /dev/shm when available):
+
+    <pid>/<key>/v<version>/frame.json   column names / dtypes / rows
+    <pid>/<key>/v<version>/<i>.npy      one file per column
+    shared/<key>/v<version>/...         same, written by the sync producer
+    shared/manifest.json                key → ref of the current version
+    shared/producer.lock                held by the sync producer
+    shared/inbox/*.json                 pushed rows forwarded to the producer
+
+Numeric and datetime columns are mapped read-only (np.load mmap_mode="r");
+object columns are stored as JSON lists and loaded whole. Nothing here is
+unpickled, and SHARED_FRAME_DIR must be owned by this user with mode 0700.
+Only the newest SHARED_FRAME_KEEP versions per key are kept; a process
+that still maps an older one keeps reading it until it lets go (Linux).
+
+SHARED_SNAPSHOT (uvicorn --workers N): the first process to take
+producer.lock syncs and publishes; the others read manifest.json and map
+the frames it lists (backend/dropbox/service.py, "Shared snapshot").
+"""
+import io
+import json
+import os
+import re
+import shutil
+import stat
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backend.core.config import settings
+
+try:
+    import fcntl
+except ImportError:     # Windows: ไม่มี flock → ทุก process เป็น producer
+    fcntl = None
+
+META_FILE = "frame.json"
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = "producer.lock"
+INBOX_DIR = "inbox"
+
+_lock = threading.Lock()
+# key dir -> ref ของ version ล่าสุดที่ export แล้ว
+_exported: Dict[str, Dict] = {}
+# ฝั่งผู้อ่าน: key -> (version, DataFrame)
+_loaded: Dict[str, tuple] = {}
+# fd ของ producer.lock (เปิดค้างไว้ตลอดอายุ process)
+_producer_fd: Optional[int] = None
+# SHARED_FRAME_DIR ที่ตรวจแล้วว่าเป็นของเรา
+_checked_root: Optional[str] = None
+
+
+def _root() -> str:
+    """
+    SHARED_FRAME_DIR, created 0700. Refuses a directory another user
+    created or can write to (e.g. pre-created in /dev/shm): whatever is in
+    it is loaded by every worker.
+    """
+    global _checked_root
+    root = settings.SHARED_FRAME_DIR
+    if _checked_root == root:
+        return root
+
+    os.makedirs(root, mode=0o700, exist_ok=True)
+    st = os.lstat(root)
+    if not stat.S_ISDIR(st.st_mode):
+        raise RuntimeError(f"SHARED_FRAME_DIR {root} is not a directory")
+    if hasattr(os, "getuid") and (st.st_uid != os.getuid() or st.st_mode & 0o077):
+        raise RuntimeError(
+            f"SHARED_FRAME_DIR {root} must be owned by uid {os.getuid()} with mode 0700 "
+            f"(found uid {st.st_uid}, mode {stat.S_IMODE(st.st_mode):o})"
+        )
+    _checked_root = root
+    return root
+
+
+def _base_dir(shared: bool = False) -> str:
+    return os.path.join(_root(), "shared" if shared else str(os.getpid()))
+
+
+def _safe(key: str) -> str:
+    return re.sub(r"[^\w.-]+", "_", key).strip("_") or "frame"
+
+
+def _write_atomic(path: str, write) -> None:
+    # เขียนไฟล์ชั่วคราวแล้ว os.replace → ผู้อ่านเห็นไฟล์เก่าหรือใหม่ทั้งไฟล์
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+# ─────────────────────────────────────────────────────────────
+# Writer
+# ─────────────────────────────────────────────────────────────
+def export(key: str, version: int, df: pd.DataFrame, shared: bool = False) -> Dict:
+    """
+    Write df (snapshot `version` of key) once; returns a picklable ref.
+    shared=True writes under shared/ (sync producer) instead of <pid>/.
+    """
+    key_dir = os.path.join(_base_dir(shared), _safe(key))
+    with _lock:
+        ref = _exported.get(key_dir)
+        if ref is not None and ref["version"] == version:
+            return ref
+
+        path = os.path.join(key_dir, f"v{version}")
+        os.makedirs(path, exist_ok=True)
+
+        columns = []
+        for i, col in enumerate(df.columns):
+            values = df[col].to_numpy()
+            if values.dtype != object:
+                np.save(os.path.join(path, f"{i}.npy"), values, allow_pickle=False)
+                columns.append({"name": col, "file": f"{i}.npy", "mapped": True})
+            else:
+                with open(os.path.join(path, f"{i}.json"), "w", encoding="utf-8") as f:
+                    json.dump(values.tolist(), f, default=str)
+                columns.append({"name": col, "file": f"{i}.json", "mapped": False})
+
+        # frame.json เขียนท้ายสุด → มีไฟล์นี้ = ครบ
+        with open(os.path.join(path, META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"key": key, "version": version, "rows": len(df), "columns": columns}, f)
+
+        ref = _exported[key_dir] = {"key": key, "version": version, "path": path}
+        _prune(key_dir)
+        return ref
+
+
+def _prune(key_dir: str) -> None:
+    versions = sorted(
+        (d for d in os.listdir(key_dir) if d.startswith("v") and d[1:].isdigit()),
+        key=lambda d: int(d[1:]),
+    )
+    for old in versions[:-settings.SHARED_FRAME_KEEP]:
+        shutil.rmtree(os.path.join(key_dir, old), ignore_errors=True)
+
+
+def cleanup() -> None:
+    """Remove this process's exported frames (shutdown). shared/ stays for the next producer."""
+    with _lock:
+        base = _base_dir()
+        for key_dir in [d for d in _exported if d.startswith(base + os.sep)]:
+            del _exported[key_dir]
+        shutil.rmtree(base, ignore_errors=True)
+
+
+# ─────────────────────────────────────────────────────────────
+# Reader
+# ─────────────────────────────────────────────────────────────
+def load(ref: Dict) -> pd.DataFrame:
+    """DataFrame for ref; columns map the files read-only (cached per key)."""
+    cached = _loaded.get(ref["key"])
+    if cached is not None and cached[0] == ref["version"]:
+        return cached[1]
+
+    with open(os.path.join(ref["path"], META_FILE), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+
+    data = {}
+    for col in meta["columns"]:
+        file = os.path.join(ref["path"], col["file"])
+        if col["mapped"]:
+            data[col["name"]] = np.load(file, mmap_mode="r", allow_pickle=False)
+        else:
+            with open(file, "r", encoding="utf-8") as f:
+                data[col["name"]] = np.array(json.load(f), dtype=object)
+
+    df = pd.DataFrame(data, copy=False)
+    _loaded[ref["key"]] = (ref["version"], df)
+    return df
+
+
+# ─────────────────────────────────────────────────────────────
+# Producer election (SHARED_SNAPSHOT)
+# ─────────────────────────────────────────────────────────────
+def claim_producer() -> bool:
+    """
+    Try to become the sync producer (non-blocking flock on producer.lock).
+    The lock is held until the process exits, so when the producer dies a
+    waiting worker takes over on its next try.
+    """
+    global _producer_fd
+    if _producer_fd is not None or fcntl is None:
+        return True
+
+    os.makedirs(_base_dir(shared=True), exist_ok=True)
+    fd = os.open(os.path.join(_base_dir(shared=True), LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return False
+
+    os.ftruncate(fd, 0)
+    os.write(fd, str(os.getpid()).encode())
+    _producer_fd = fd
+    return True
+
+
+def is_producer() -> bool:
+    return _producer_fd is not None or fcntl is None
+
+
+def release_producer() -> None:
+    global _producer_fd
+    if _producer_fd is not None:
+        os.close(_producer_fd)     # ปิด fd = ปล่อย flock
+        _producer_fd = None
+
+
+# ─────────────────────────────────────────────────────────────
+# Manifest (current version of every shared frame)
+# ─────────────────────────────────────────────────────────────
+def write_manifest(frames: Dict[str, Dict]) -> None:
+    """frames: key → ref from export(..., shared=True) plus extra fields."""
+    manifest = {"producer": os.getpid(), "published": time.time(), "frames": frames}
+    path = os.path.join(_base_dir(shared=True), MANIFEST_FILE)
+    _write_atomic(path, lambda f: f.write(json.dumps(manifest, default=str).encode("utf-8")))
+
+
+def read_manifest() -> Optional[Dict]:
+    try:
+        with open(os.path.join(_base_dir(shared=True), MANIFEST_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+# ─────────────────────────────────────────────────────────────
+# Inbox (rows pushed to a non-producer worker)
+# ─────────────────────────────────────────────────────────────
+def post_rows(root_path: str, raw: pd.DataFrame) -> None:
+    inbox = os.path.join(_base_dir(shared=True), INBOX_DIR)
+    os.makedirs(inbox, mode=0o700, exist_ok=True)
+    # ชื่อไฟล์เรียงตามเวลา → producer append ตามลำดับที่รับมา
+    path = os.path.join(inbox, f"{time.time_ns():020d}-{os.getpid()}.json")
+    # CSV ใน JSON (ไม่ใช่ pickle): float ครบทุกหลัก, timestamp เป็น ISO
+    batch = {"root_path": root_path, "csv": raw.to_csv(index=False, date_format="%Y-%m-%dT%H:%M:%S.%f")}
+    _write_atomic(path, lambda f: f.write(json.dumps(batch).encode("utf-8")))
+
+
+def _read_batch(path: str) -> Tuple[str, pd.DataFrame]:
+    with open(path, "r", encoding="utf-8") as f:
+        batch = json.load(f)
+    raw = pd.read_csv(io.StringIO(batch["csv"]))
+    if "timestamp" in raw.columns:
+        raw["timestamp"] = pd.to_datetime(raw["timestamp"])
+    return batch["root_path"], raw
+
+
+def drain_rows() -> List[Tuple[str, pd.DataFrame]]:
+    """Forwarded batches in arrival order; each file is removed once read."""
+    inbox = os.path.join(_base_dir(shared=True), INBOX_DIR)
+    try:
+        names = sorted(n for n in os.listdir(inbox) if n.endswith(".json"))
+    except FileNotFoundError:
+        return []
+
+    batches = []
+    for name in names:
+        path = os.path.join(inbox, name)
+        try:
+            batches.append(_read_batch(path))
+        except Exception as e:
+            print(f"⚠️ Dropping unreadable forwarded batch {name}: {e}")
+        os.remove(path)
+    return batches
@@ -1,9 +1,14 @@
 # app/main.py
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import FastAPI,HTTPException
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi import FastAPI,HTTPException,Request
+from fastapi.responses import JSONResponse
 from backend.mongo.main import mongodb
+from backend.core.config import settings
+from backend.core.execution import Overloaded, RETRY_AFTER
 
+import os
 import threading
 import time
 
@@ -18,28 +23,71 @@ async def lifespan(app: FastAPI):
     print("🚀 Starting background Dropbox sensor sync...")
 
     from backend.dropbox import service as dropbox_service
+    from backend.dropbox import client as dropbox_client
+    from backend.core import execution
+    from backend.core import ollama_service
+    from backend.core import profiling
+    from backend.dropbox import shared_frames
 
     stop_flag = {"stop": False}
 
+    # CPU workers (spawn) เริ่มตอน startup ไม่ใช่ใน request แรก
+    execution.start()
+
+    if settings.PREDICT_WARMUP:
+        from backend.api.routes import predict
+        threading.Thread(target=predict.warm_up, daemon=True, name="predict-warmup").start()
+
     def sync_loop():
         while not stop_flag["stop"]:
             try:
-                dropbox_service.refresh_sensor_cache(
-                    limit=1000,        # เก็บข้อมูลล่าสุด 1,000 แถว
-                    interval="5min"    # aggregate ราย 5 นาที
-                )
+                # POST /profiles/sync → รอบนี้ถูก profile
+                with profiling.sync_cycle():
+                    dropbox_service.refresh_sensor_cache(
+                        limit=1000,        # เก็บข้อมูลล่าสุด 1,000 แถว
+                        interval="5min"    # aggregate ราย 5 นาที
+                    )
+                    # สร้าง context ของ LLM ไว้ล่วงหน้า (ครั้งเดียวต่อ snapshot)
+                    ollama_service.get_sensor_context()
             except Exception as e:
                 print(f"⚠️ Error refreshing sensor cache: {e}")
 
             time.sleep(60)  # Sync ทุก 60 วินาที
 
-    thread = threading.Thread(target=sync_loop, daemon=True)
-    thread.start()
+    def start_sync():
+        # แหล่งข้อมูลที่ดูการเปลี่ยนแปลงไฟล์ได้ (local) → ingest ภายในไม่ถึงวินาที
+        dropbox_service.start_watchers()
+        threading.Thread(target=sync_loop, daemon=True, name="sensor-sync").start()
+
+    def snapshot_loop():
+        # SHARED_SNAPSHOT: worker ที่ได้ lock เป็น producer (sync + publish) ที่เหลือ map snapshot
+        # producer ตาย → lock หลุด → worker ถัดไปรับช่วงในรอบถัดไป
+        while not stop_flag["stop"]:
+            try:
+                if not shared_frames.is_producer() and shared_frames.claim_producer():
+                    print(f"👑 Worker {os.getpid()} is the sensor sync producer")
+                    start_sync()
+                dropbox_service.sync_shared()
+            except Exception as e:
+                print(f"⚠️ Error sharing sensor snapshot: {e}")
+
+            time.sleep(settings.SNAPSHOT_POLL_SECONDS)
+
+    if settings.SHARED_SNAPSHOT:
+        threading.Thread(target=snapshot_loop, daemon=True, name="snapshot-share").start()
+    else:
+        start_sync()
 
     yield  # แอปพร้อมให้บริการ
 
     print("👋 Shutting down background Dropbox sensor sync...")
     stop_flag["stop"] = True
+    dropbox_service.stop_watchers()
+    dropbox_client.close_client()
+    await ollama_service.close_http_client()
+    execution.shutdown()
+    shared_frames.cleanup()
+    shared_frames.release_producer()
     time.sleep(1)
 
 
@@ -69,6 +117,32 @@ app.add_middleware(
 )
 
 
+# ────────────────────────────────────────────────────────────
+# Compression (sensor JSON compresses ~10x)
+# ────────────────────────────────────────────────────────────
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+
+# ────────────────────────────────────────────────────────────
+# Profiling (opt-in: PROFILING_ENABLED + X-Profile header)
+# ────────────────────────────────────────────────────────────
+if settings.PROFILING_ENABLED:
+    from backend.core.profiling import ProfilingMiddleware
+    app.add_middleware(ProfilingMiddleware)
+
+
+# ────────────────────────────────────────────────────────────
+# Admission control (backend/core/execution.py): pool full → 503
+# ────────────────────────────────────────────────────────────
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(RETRY_AFTER)},
+    )
+
+
 # ────────────────────────────────────────────────────────────
 # Routers
 # ────────────────────────────────────────────────────────────
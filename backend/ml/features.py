@@ -0,0 +1,221 @@
+# backend/ml/features.py
+"""
+Feature engineering shared by serving (/co2/predict) and training
+(backend/ml/train.py), so both see exactly the same columns.
+
+A trained model directory may carry feature_schema.json (written by
+train.py) with the scaler statistics and the carbon z-score statistics of
+its training data. With a schema, serving scales with those fixed stats;
+without one it falls back to fitting on the loaded history (legacy models).
+"""
+import json
+import os
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from backend.dropbox import quality
+
+SCHEMA_FILE = "feature_schema.json"
+
+# Define the numerical features that were scaled during training
+SCALED_NUMERICAL_FEATURES = [
+    'Temp', 'Humidity', 'light_intensity', 'lux',
+    'instantaneous_rate_change', 'instantaneous_rate_per_hour',
+    'carbon_lag1', 'carbon_lag2', 'carbon_lag3', 'carbon_lag4', 'carbon_lag5',
+    'carbon_rolling_mean_3', 'carbon_rolling_std_3', 'carbon_rolling_min_3', 'carbon_rolling_max_3',
+    'carbon_rolling_mean_5', 'carbon_rolling_std_5', 'carbon_rolling_min_5', 'carbon_rolling_max_5',
+    'carbon_rolling_mean_10', 'carbon_rolling_std_10', 'carbon_rolling_min_10', 'carbon_rolling_max_10',
+    'carbon_lag1_diff', 'carbon_lag2_diff',
+    'temp_humidity_interaction', 'comfort_index',
+    'carbon_zscore'
+]
+
+# Define the final features used by the model
+FINAL_FEATURE_COLUMNS = [
+    'Temp', 'Humidity', 'light_intensity', 'lux',
+    'instantaneous_rate_change', 'instantaneous_rate_per_hour',
+    'hour', 'day_of_week', 'minute', 'is_weekend', 'time_of_day',
+    'carbon_lag1', 'carbon_lag2', 'carbon_lag3', 'carbon_lag4', 'carbon_lag5',
+    'carbon_rolling_mean_3', 'carbon_rolling_std_3', 'carbon_rolling_min_3', 'carbon_rolling_max_3',
+    'carbon_rolling_mean_5', 'carbon_rolling_std_5', 'carbon_rolling_min_5', 'carbon_rolling_max_5',
+    'carbon_rolling_mean_10', 'carbon_rolling_std_10', 'carbon_rolling_min_10', 'carbon_rolling_max_10',
+    'carbon_lag1_diff', 'carbon_lag2_diff',
+    'temp_humidity_interaction', 'comfort_index',
+    'light_category', 'hour_sin', 'hour_cos', 'day_sin', 'day_cos', 'carbon_zscore'
+]
+
+# Required by AutoGluon pipeline
+AUTOGLUON_PIPELINE_REQUIREMENTS = ['light intensity', 'time_diff_hours']
+PREDICTION_INPUT_COLUMNS = list(set(FINAL_FEATURE_COLUMNS + AUTOGLUON_PIPELINE_REQUIREMENTS))
+
+
+# ─────────────────────────────────────────────────────────────
+# Model input metrics (already named/scaled by the metric catalog)
+# ─────────────────────────────────────────────────────────────
+PREDICT_METRICS = ['carbon', 'Temp', 'Humidity', 'light_intensity', 'lux']
+
+
+def clean_inputs(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    timestamp + PREDICT_METRICS of the rows with a carbon value, values
+    flagged as sensor faults (quality.annotate) masked first.
+    Serving and training both start from this.
+    """
+    df = quality.mask_flagged(df)
+    df = df[["timestamp"] + [c for c in PREDICT_METRICS if c in df.columns]]
+    return df.dropna(subset=["carbon"])
+
+
+# ─────────────────────────────────────────────────────────────
+# AI FEATURE ENGINEERING (Restored the safe version)
+# ─────────────────────────────────────────────────────────────
+def create_advanced_features(df: pd.DataFrame, zscore_stats: Optional[Dict[str, float]] = None) -> pd.DataFrame:
+    """
+    Create sophisticated features for carbon prediction WITHOUT data leakage.
+    zscore_stats ({"mean", "std"} of carbon) makes carbon_zscore independent
+    of the frame, so a day partition gets the same values as the full series.
+    """
+    df = df.copy()
+
+    # Rename 'timestamp' to 'TIM' for consistency with training
+    df = df.rename(columns={'timestamp': 'TIM'})
+
+    # Ensure 'TIM' is datetime and sort
+    df['TIM'] = pd.to_datetime(df['TIM'])
+    df = df.sort_values('TIM').reset_index(drop=True)
+
+    # Calculate instantaneous changes (mandatory for AutoGluon pipeline)
+    df['instantaneous_rate_change'] = df['carbon'].diff()
+    df['time_diff_hours'] = df['TIM'].diff().dt.total_seconds() / 3600
+    df['instantaneous_rate_per_hour'] = df['instantaneous_rate_change'] / df['time_diff_hours'].replace(0, np.nan)
+    df['time_diff_hours'] = df['time_diff_hours'].fillna(0.0) # Fill first row NaN
+
+    # Required by AutoGluon pipeline (renaming)
+    if 'light_intensity' in df.columns and 'light intensity' not in df.columns:
+        df['light intensity'] = df['light_intensity']
+
+    # Basic time features
+    df['hour'] = df['TIM'].dt.hour
+    df['day_of_week'] = df['TIM'].dt.dayofweek
+    df['minute'] = df['TIM'].dt.minute
+    df['is_weekend'] = (df['day_of_week'] >= 5).astype(int)
+
+    # Time of day categories
+    df['time_of_day'] = pd.cut(df['hour'],
+                                 bins=[0, 6, 12, 18, 24],
+                                 labels=['night', 'morning', 'afternoon', 'evening'],
+                                 right=False,
+                                 include_lowest=True)
+
+    # Carbon-based features (using only PAST information - CRITICAL SHIFT(1))
+    df['carbon_lag1'] = df['carbon'].shift(1)
+    df['carbon_lag2'] = df['carbon'].shift(2)
+    df['carbon_lag3'] = df['carbon'].shift(3)
+    df['carbon_lag4'] = df['carbon'].shift(4)
+    df['carbon_lag5'] = df['carbon'].shift(5)
+
+    # Rolling statistics (using only PAST information - CRITICAL SHIFT(1))
+    for window in [3, 5, 10]:
+        df[f'carbon_rolling_mean_{window}'] = df['carbon'].rolling(window=window).mean().shift(1)
+        df[f'carbon_rolling_std_{window}'] = df['carbon'].rolling(window=window).std().shift(1)
+        df[f'carbon_rolling_min_{window}'] = df['carbon'].rolling(window=window).min().shift(1)
+        df[f'carbon_rolling_max_{window}'] = df['carbon'].rolling(window=window).max().shift(1)
+
+    # Safe lagged differences
+    df['carbon_lag1_diff'] = df['carbon_lag1'] - df['carbon_lag2']
+    df['carbon_lag2_diff'] = df['carbon_lag2'] - df['carbon_lag3']
+
+    # Interaction features
+    if 'Temp' in df.columns and 'Humidity' in df.columns:
+        df['temp_humidity_interaction'] = df['Temp'] * df['Humidity']
+        df['comfort_index'] = 0.5 * (df['Temp'] + df['Humidity'])
+
+    # Light intensity category
+    if 'light_intensity' in df.columns:
+        df['light_category'] = pd.cut(df['light_intensity'],
+                                     bins=[0, 100, 500, 1000, float('inf')],
+                                     labels=['dark', 'low', 'medium', 'bright'],
+                                     right=False,
+                                     include_lowest=True)
+
+    # Cyclical time features
+    df['hour_sin'] = np.sin(2 * np.pi * df['hour']/24)
+    df['hour_cos'] = np.cos(2 * np.pi * df['hour']/24)
+    df['day_sin'] = np.sin(2 * np.pi * df['day_of_week']/7)
+    df['day_cos'] = np.cos(2 * np.pi * df['day_of_week']/7)
+
+    # Statistical features
+    if zscore_stats is None:
+        zscore_stats = {"mean": df['carbon'].mean(), "std": df['carbon'].std()}
+    df['carbon_zscore'] = (df['carbon'] - zscore_stats["mean"]) / zscore_stats["std"]
+
+    return df
+
+
+# We need enough clean rows to calculate features for the very last row (T)
+ROWS_NEEDED_FOR_FEATURES = 11
+
+
+# ─────────────────────────────────────────────────────────────
+# Feature schema (written next to a trained model)
+# ─────────────────────────────────────────────────────────────
+def load_schema(model_path: str) -> Optional[Dict]:
+    path = os.path.join(model_path, SCHEMA_FILE)
+    if not os.path.isfile(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_schema(model_path: str, schema: Dict) -> str:
+    path = os.path.join(model_path, SCHEMA_FILE)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(schema, f, indent=2, default=str)
+    return path
+
+
+def fit_scaler(df: pd.DataFrame) -> Dict[str, Dict[str, float]]:
+    """StandardScaler statistics (population std, like sklearn) of the scaled columns."""
+    cols = [c for c in SCALED_NUMERICAL_FEATURES if c in df.columns]
+    values = df[cols].astype(np.float64)
+    scale = values.std(ddof=0).replace(0.0, 1.0)
+    return {"mean": values.mean().to_dict(), "scale": scale.to_dict()}
+
+
+def apply_scaler(df: pd.DataFrame, scaler: Dict[str, Dict[str, float]]) -> pd.DataFrame:
+    cols = [c for c in scaler["mean"] if c in df.columns]
+    mean = pd.Series(scaler["mean"])[cols]
+    scale = pd.Series(scaler["scale"])[cols]
+    return df.assign(**((df[cols].astype(np.float64) - mean) / scale))
+
+
+# ─────────────────────────────────────────────────────────────
+# Serving
+# ─────────────────────────────────────────────────────────────
+def inference_row(df_clean: pd.DataFrame, schema: Optional[Dict] = None) -> Optional[pd.DataFrame]:
+    """
+    Model input for the latest row of df_clean (timestamp + PREDICT_METRICS).
+    None if there is not enough clean history for the lag / rolling features.
+    """
+    zscore_stats = schema.get("zscore") if schema else None
+    df_processed = create_advanced_features(df_clean, zscore_stats)
+
+    df_final_input = df_processed.iloc[-ROWS_NEEDED_FOR_FEATURES:].dropna().copy()
+    if df_final_input.empty:
+        return None
+
+    if schema:
+        df_final_input = apply_scaler(df_final_input, schema["scaler"])
+    else:
+        # Legacy models: fit scaler on the full processed history, then transform the final input block
+        from sklearn.preprocessing import StandardScaler
+        mock_scaler = StandardScaler()
+        cols_to_fit = [col for col in SCALED_NUMERICAL_FEATURES if col in df_processed.columns]
+        mock_scaler.fit(df_processed[cols_to_fit])
+        df_final_input[cols_to_fit] = mock_scaler.transform(df_final_input[cols_to_fit])
+
+    # Always the last row
+    columns = schema.get("input_columns", PREDICTION_INPUT_COLUMNS) if schema else PREDICTION_INPUT_COLUMNS
+    return df_final_input.iloc[[-1]][columns]
@@ -0,0 +1,137 @@
+# backend/ml/profiles.py
+"""
+Inference profiles: which model inside a TabularPredictor answers /co2/predict.
+
+    ensemble   WeightedEnsemble_L2 (AutoGluon's best, default)
+    best       best single base model by validation score, no ensemble step
+    pruned     weighted ensemble refit over the top-k base models only
+    distilled  small model trained on the ensemble's soft predictions
+               (falls back to a refit_full model, then to "best")
+
+"pruned" and "distilled" need extra models inside the predictor directory;
+create them once, offline:
+
+    python -m backend.ml.profiles prepare ./autogluon_models_rate_change --time-limit 300
+
+Choose at runtime with PREDICT_PROFILE. Compare with
+backend/benchmarks/inference_profiles.py.
+"""
+import argparse
+from typing import List, Optional
+
+PROFILES = ("ensemble", "best", "pruned", "distilled")
+
+PRUNED_SUFFIX = "Pruned"
+PRUNED_TOP_K = 2
+DISTILL_SUFFIX = "_DSTL"
+FULL_SUFFIX = "_FULL"
+
+
+def _ranked(predictor, single_only: bool = False) -> List[str]:
+    """Inferable models, best validation score first."""
+    lb = predictor.leaderboard(silent=True)
+    lb = lb[lb["can_infer"]]
+    if single_only:
+        lb = lb[lb["stack_level"] == 1]
+    return lb.sort_values("score_val", ascending=False)["model"].tolist()
+
+
+def resolve_model(predictor, profile: str) -> Optional[str]:
+    """
+    Model name to pass to predictor.predict(model=...) for profile.
+    None = predictor's own best model (the full ensemble).
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown PREDICT_PROFILE '{profile}' (choose from {', '.join(PROFILES)})")
+
+    if profile == "ensemble":
+        return None
+
+    if profile == "pruned":
+        pruned = [m for m in _ranked(predictor) if m.endswith(PRUNED_SUFFIX)]
+        if pruned:
+            return pruned[0]
+        print("⚠️ No pruned ensemble in predictor (run `python -m backend.ml.profiles prepare`), using full ensemble")
+        return None
+
+    singles = _ranked(predictor, single_only=True)
+
+    if profile == "distilled":
+        for suffix in (DISTILL_SUFFIX, FULL_SUFFIX):
+            matches = [m for m in singles if suffix in m]
+            if matches:
+                return matches[0]
+        print("⚠️ No distilled model in predictor (run `python -m backend.ml.profiles prepare`), using best single model")
+
+    # "best" (และ fallback ของ distilled): base model ที่ดีที่สุด ไม่ผ่าน ensemble
+    originals = [m for m in singles if DISTILL_SUFFIX not in m and FULL_SUFFIX not in m]
+    return (originals or singles or [None])[0]
+
+
+def persist(predictor, model: Optional[str]) -> None:
+    """Keep the selected model (and its base models) in memory between predictions."""
+    try:
+        predictor.persist(models=[model or predictor.model_best], with_ancestors=True)
+    except Exception as e:
+        print(f"⚠️ Could not persist {model or predictor.model_best}: {e}")
+
+
+# ─────────────────────────────────────────────────────────────
+# Offline preparation
+# ─────────────────────────────────────────────────────────────
+def prepare(path: str, time_limit: float = 300, top_k: int = PRUNED_TOP_K, profiles=("pruned", "distilled")) -> List[str]:
+    """
+    Add the pruned ensemble and/or distilled model to the predictor at path
+    (uses the train / validation data cached inside the predictor).
+    Returns the names of the created models.
+    """
+    from autogluon.tabular import TabularPredictor
+
+    predictor = TabularPredictor.load(path, require_py_version_match=False)
+    created: List[str] = []
+
+    if "pruned" in profiles:
+        base = _ranked(predictor, single_only=True)[:top_k]
+        created += predictor.fit_weighted_ensemble(base_models=base, name_suffix=PRUNED_SUFFIX)
+
+    if "distilled" in profiles:
+        created += predictor.distill(
+            time_limit=time_limit,
+            hyperparameters={"GBM": {}},
+            teacher_preds="soft",
+        )
+
+    return created
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    prep = sub.add_parser("prepare", help="create pruned / distilled models inside a predictor")
+    prep.add_argument("paths", nargs="+")
+    prep.add_argument("--time-limit", type=float, default=300)
+    prep.add_argument("--top-k", type=int, default=PRUNED_TOP_K)
+    prep.add_argument("--only", choices=["pruned", "distilled"])
+
+    show = sub.add_parser("show", help="print the model each profile resolves to")
+    show.add_argument("paths", nargs="+")
+
+    args = parser.parse_args()
+
+    if args.command == "prepare":
+        profiles = (args.only,) if args.only else ("pruned", "distilled")
+        for path in args.paths:
+            created = prepare(path, args.time_limit, args.top_k, profiles)
+            print(f"{path}: {', '.join(created) or 'nothing created'}")
+    else:
+        from autogluon.tabular import TabularPredictor
+        for path in args.paths:
+            predictor = TabularPredictor.load(path, require_py_version_match=False, verbosity=0)
+            for profile in PROFILES:
+                model = resolve_model(predictor, profile) or predictor.model_best
+                print(f"{path}  {profile:9s} → {model}")
+
+
+if __name__ == "__main__":
+    main()
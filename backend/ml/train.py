@@ -0,0 +1,252 @@
+# backend/ml/train.py
+"""
+Offline training for the /co2/predict models, using the production
+feature code (backend/ml/features.py) for train/serve parity.
+
+    load     day partitions of a device for [start, end] (backend/dropbox/history.py)
+    clean    sensor-fault flags as at ingest (quality.annotate_history), flagged
+             values masked — same clean_inputs() as serving
+    features one task per day in a process pool; each day gets the tail
+             of the previous day as warm-up for lags / rolling windows
+    targets  next-step change of carbon (ppm) and its hourly rate
+    fit      StandardScaler stats + AutoGluon TabularPredictor within --time-limit
+    write    feature_schema.json next to each model (scaler, z-score stats,
+             interval, input columns) — read back by predict.py
+
+Usage (from the repo root, with the usual .env):
+
+    python -m backend.ml.train --start 2025-09-01 --end 2025-11-30 \\
+        --out ./models --time-limit 1800 --workers 4
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backend.dropbox import quality
+from backend.ml.features import (
+    AUTOGLUON_PIPELINE_REQUIREMENTS,
+    FINAL_FEATURE_COLUMNS,
+    ROWS_NEEDED_FOR_FEATURES,
+    apply_scaler,
+    clean_inputs,
+    create_advanced_features,
+    fit_scaler,
+    write_schema,
+)
+
+TARGETS = {
+    "rate_change": "TARGET_RATE_CHANGE",
+    "rate_per_hour": "TARGET_RATE_PER_HOUR",
+}
+
+INTERVAL_DELTA = {
+    "raw": pd.Timedelta(0),
+    "1min": pd.Timedelta("1min"),
+    "5min": pd.Timedelta("5min"),
+    "15min": pd.Timedelta("15min"),
+    "30min": pd.Timedelta("30min"),
+    "1hour": pd.Timedelta("1h"),
+}
+
+
+# ─────────────────────────────────────────────────────────────
+# Per-day features (runs in worker processes)
+# ─────────────────────────────────────────────────────────────
+def day_features(
+    day_start: pd.Timestamp,
+    df: pd.DataFrame,
+    interval: str,
+    zscore_stats: Dict[str, float],
+) -> pd.DataFrame:
+    """
+    Features for the rows of df at or after day_start. Rows before
+    day_start are warm-up from the previous day and are dropped again.
+    """
+    if interval != "raw":
+        from backend.dropbox.service import aggregate_data
+        df = aggregate_data(df, interval)
+
+    df = df.dropna(subset=["carbon"])
+    if df.empty:
+        return df
+
+    features = create_advanced_features(df, zscore_stats)
+    return features[features["TIM"] >= day_start]
+
+
+def _warmup_tail(prev: Optional[pd.DataFrame], interval: str) -> Optional[pd.DataFrame]:
+    if prev is None or prev.empty:
+        return None
+    # ROWS_NEEDED_FOR_FEATURES bucket ของวันก่อน (+1 เผื่อ bucket ที่ไม่ครบ)
+    span = INTERVAL_DELTA[interval] * (ROWS_NEEDED_FOR_FEATURES + 1)
+    if span == pd.Timedelta(0):
+        return prev.iloc[-(ROWS_NEEDED_FOR_FEATURES + 1):]
+    last = prev["timestamp"].iloc[-1]
+    return prev[prev["timestamp"] > last - span]
+
+
+def build_dataset(
+    days: List[Tuple[pd.Timestamp, pd.DataFrame]],
+    interval: str = "1min",
+    workers: Optional[int] = None,
+    device_type: str = "wise4051",
+) -> Tuple[pd.DataFrame, Dict[str, float]]:
+    """
+    Feature frame (unscaled, with targets) + carbon z-score stats.
+    Partitions get the same fault flags / masking as the live frame
+    (quality.annotate_history + clean_inputs), so the model never trains
+    on spikes or flatlines it would not see when serving.
+    """
+    annotated = quality.annotate_history(device_type, [df for _, df in days])
+    frames = []
+    for df in annotated:
+        if df is not None and not df.empty and "carbon" in df.columns:
+            frames.append(clean_inputs(df))
+        else:
+            frames.append(None)
+
+    carbon = np.concatenate([f["carbon"].to_numpy(dtype=np.float64) for f in frames if f is not None] or [np.empty(0)])
+    carbon = carbon[~np.isnan(carbon)]
+    if carbon.size < ROWS_NEEDED_FOR_FEATURES:
+        raise RuntimeError("Not enough carbon data in the selected range")
+    zscore_stats = {"mean": float(carbon.mean()), "std": float(carbon.std(ddof=1))}
+
+    tasks = []
+    prev = None
+    for (day, _), df in zip(days, frames):
+        if df is None:
+            prev = None
+            continue
+        warmup = _warmup_tail(prev, interval)
+        chunk = df if warmup is None else pd.concat([warmup, df], ignore_index=True)
+        tasks.append((day, chunk))
+        prev = df
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(
+            day_features,
+            [day for day, _ in tasks],
+            [chunk for _, chunk in tasks],
+            [interval] * len(tasks),
+            [zscore_stats] * len(tasks),
+        ))
+
+    data = pd.concat([r for r in results if not r.empty], ignore_index=True)
+    data = add_targets(data)
+    return data, zscore_stats
+
+
+def add_targets(data: pd.DataFrame) -> pd.DataFrame:
+    """Next-step carbon change (ppm) and the same change per hour."""
+    next_change = data["carbon"].shift(-1) - data["carbon"]
+    next_hours = (data["TIM"].shift(-1) - data["TIM"]).dt.total_seconds() / 3600
+    return data.assign(**{
+        TARGETS["rate_change"]: next_change,
+        TARGETS["rate_per_hour"]: next_change / next_hours.replace(0, np.nan),
+    })
+
+
+# ─────────────────────────────────────────────────────────────
+# Fit
+# ─────────────────────────────────────────────────────────────
+def train(
+    device_id: str,
+    start: datetime,
+    end: datetime,
+    out_dir: str,
+    targets: List[str] = ("rate_change", "rate_per_hour"),
+    interval: str = "1min",
+    time_limit: float = 1800,
+    presets: str = "medium_quality",
+    workers: Optional[int] = None,
+) -> Dict[str, str]:
+    """Train one predictor per target. Returns {target: model_path}."""
+    from autogluon.tabular import TabularPredictor
+    from backend.dropbox import devices, history
+
+    began = time.monotonic()
+    device = devices.get_device(device_id)
+    if device is None:
+        raise RuntimeError(f"Unknown device '{device_id}'")
+
+    days = history.load_partitions(device["root"], pd.Timestamp(start), pd.Timestamp(end))
+    print(f"📂 {len(days)} day partitions loaded in {time.monotonic() - began:.1f}s")
+
+    t = time.monotonic()
+    data, zscore_stats = build_dataset(days, interval, workers, device["type"])
+    print(f"🧮 {len(data)} feature rows in {time.monotonic() - t:.1f}s")
+
+    input_columns = sorted(set(FINAL_FEATURE_COLUMNS + AUTOGLUON_PIPELINE_REQUIREMENTS))
+    feature_cols = [c for c in input_columns if c in data.columns]
+    labels = [TARGETS[name] for name in targets]
+    data = data.dropna(subset=feature_cols + labels)
+
+    scaler = fit_scaler(data)
+    data = apply_scaler(data, scaler)
+
+    paths = {}
+    remaining = time_limit - (time.monotonic() - began)
+    for i, name in enumerate(targets):
+        label = TARGETS[name]
+        budget = max(60.0, remaining / (len(targets) - i))
+        path = os.path.join(out_dir, f"autogluon_models_{name}")
+
+        t = time.monotonic()
+        predictor = TabularPredictor(label=label, eval_metric="mean_absolute_error", path=path)
+        predictor.fit(data[feature_cols + [label]], time_limit=budget, presets=presets)
+        remaining -= time.monotonic() - t
+
+        write_schema(path, {
+            "label": label,
+            "device_id": device_id,
+            "interval": interval,
+            "input_columns": feature_cols,
+            "scaler": scaler,
+            "zscore": zscore_stats,
+            "train_range": [str(data["TIM"].iloc[0]), str(data["TIM"].iloc[-1])],
+            "rows": len(data),
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+        })
+        print(f"✅ {label}: {path} ({time.monotonic() - t:.0f}s, budget {budget:.0f}s)")
+        paths[name] = path
+
+    return paths
+
+
+def main():
+    from backend.dropbox import devices
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--device", default=devices.PRIMARY[0]["id"])
+    parser.add_argument("--start", required=True, type=pd.Timestamp)
+    parser.add_argument("--end", default=None, type=pd.Timestamp)
+    parser.add_argument("--out", default=".")
+    parser.add_argument("--target", choices=[*TARGETS, "both"], default="both")
+    parser.add_argument("--interval", choices=list(INTERVAL_DELTA), default="1min")
+    parser.add_argument("--time-limit", type=float, default=1800, help="total seconds, loading + features + fit")
+    parser.add_argument("--presets", default="medium_quality")
+    parser.add_argument("--workers", type=int, default=None, help="feature processes (default: CPU count)")
+    args = parser.parse_args()
+
+    targets = list(TARGETS) if args.target == "both" else [args.target]
+    train(
+        args.device,
+        args.start,
+        args.end or pd.Timestamp.now(),
+        args.out,
+        targets,
+        args.interval,
+        args.time_limit,
+        args.presets,
+        args.workers,
+    )
+
+
+if __name__ == "__main__":
+    main()
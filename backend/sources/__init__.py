@@ -0,0 +1,49 @@
+# backend/sources/__init__.py
+from typing import Dict, Optional
+
+from backend.sources.base import SensorSource
+from backend.sources.dropbox_source import DropboxSource
+from backend.sources.local_source import LocalDirSource
+from backend.sources.push_source import PushSource
+
+
+SOURCES = {
+    "dropbox": DropboxSource,
+    "local": LocalDirSource,
+    "push": PushSource,
+}
+
+_instances: Dict[str, SensorSource] = {}
+
+
+def get_source(kind: Optional[str] = None) -> SensorSource:
+    """Shared source instance for a kind ("dropbox" / "local" / "push")."""
+    from backend.dropbox.env import SENSOR_SOURCE
+
+    kind = kind or SENSOR_SOURCE
+    if kind not in SOURCES:
+        raise RuntimeError(f"Unknown sensor source '{kind}'")
+    if kind not in _instances:
+        _instances[kind] = SOURCES[kind]()
+    return _instances[kind]
+
+
+def register_source(kind: str, source: SensorSource) -> None:
+    """Replace the shared instance for kind (e.g. a fake in tests/benchmarks)."""
+    _instances[kind] = source
+
+
+def stop_all() -> None:
+    for source in _instances.values():
+        source.stop()
+
+
+__all__ = [
+    "SensorSource",
+    "DropboxSource",
+    "LocalDirSource",
+    "PushSource",
+    "get_source",
+    "register_source",
+    "stop_all",
+]
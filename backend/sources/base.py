@@ -0,0 +1,39 @@
+# backend/sources/base.py
+"""
+Where raw WISE CSVs come from.
+
+A source only knows how to list date partitions under a device root and
+return the raw CSV frames of one partition. Timestamp parsing, the metric
+catalog and caching stay in backend/dropbox/service.py, so every source
+produces the same frames.
+"""
+from abc import ABC, abstractmethod
+from typing import Callable, List
+
+import pandas as pd
+
+
+# (root_path, raw CSV rows) → ถูกเรียกเมื่อมีแถวใหม่เขียนลงไฟล์
+RowsCallback = Callable[[str, pd.DataFrame], None]
+
+
+class SensorSource(ABC):
+    name = "base"
+
+    @abstractmethod
+    def list_partitions(self, root_path: str) -> List[str]:
+        """Date partitions (day folders) under a device root."""
+
+    @abstractmethod
+    def read_partition(self, partition: str) -> List[pd.DataFrame]:
+        """Raw CSV frames of one partition, one frame per file."""
+
+    def watch(self, root_path: str, on_rows: RowsCallback) -> bool:
+        """
+        Push new rows for root_path to on_rows as they are written.
+        Returns False if the source cannot watch (poll-only, e.g. Dropbox).
+        """
+        return False
+
+    def stop(self) -> None:
+        pass
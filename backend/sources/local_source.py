@@ -0,0 +1,242 @@
+# backend/sources/local_source.py
+"""
+WISE modules logging to a local / NFS directory:
+
+    <root>/<YYYYMMDD>/*.csv      (same layout as the Dropbox folders)
+
+Full reads work like Dropbox. watch() tails the CSVs by byte offset and
+pushes only the newly appended, complete lines. File change notification
+uses watchdog (inotify / FSEvents / ReadDirectoryChangesW) when it is
+installed and falls back to stat polling otherwise.
+"""
+import io
+import os
+import threading
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from backend.core import metrics
+from backend.sources.base import RowsCallback, SensorSource
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # optional
+    FileSystemEventHandler = object
+    Observer = None
+
+
+POLL_INTERVAL = 0.5   # วินาที (เฉพาะตอนไม่มี watchdog)
+
+
+def _is_csv(path: str) -> bool:
+    return path.lower().endswith(".csv")
+
+
+# ─────────────────────────────────────────────────────────────
+# Tailing by byte offset
+# ─────────────────────────────────────────────────────────────
+class CsvTail:
+    """
+    Remembers how far each CSV has been consumed. read_new() returns the
+    rows appended since the last call; a partially written last line is
+    left for the next call. A file that shrinks or is replaced (new inode)
+    is read again from its header.
+    """
+
+    def __init__(self):
+        self._offsets: Dict[str, int] = {}
+        self._headers: Dict[str, bytes] = {}
+        self._inodes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def skip_existing(self, path: str) -> None:
+        """Mark the current content of path as already ingested."""
+        with self._lock:
+            self._offsets[path] = self._complete_size(path)
+            self._inodes[path] = os.stat(path).st_ino
+
+    @staticmethod
+    def _complete_size(path: str) -> int:
+        # ตำแหน่งหลัง '\n' ตัวสุดท้าย (บรรทัดที่ยังเขียนไม่จบไม่นับ)
+        with open(path, "rb") as f:
+            data = f.read()
+        return data.rfind(b"\n") + 1
+
+    def read_new(self, path: str) -> Optional[pd.DataFrame]:
+        with self._lock:
+            offset = self._offsets.get(path, 0)
+            try:
+                st = os.stat(path)
+            except OSError:
+                return None
+            size = st.st_size
+            if size < offset or self._inodes.get(path, st.st_ino) != st.st_ino:
+                # ไฟล์ถูกเขียนทับ / rotate → อ่านใหม่ทั้งไฟล์ รวม header
+                offset = 0
+                self._headers.pop(path, None)
+            self._inodes[path] = st.st_ino
+            if size == offset:
+                return None
+
+            with open(path, "rb") as f:
+                header = self._headers.get(path)
+                if header is None:
+                    header = f.readline()
+                    if not header.endswith(b"\n"):
+                        return None
+                    self._headers[path] = header
+                # header ไม่ใช่ data row เสมอ (ทั้งครั้งแรกและหลัง reset)
+                offset = max(offset, len(header))
+                f.seek(offset)
+                chunk = f.read(max(size - offset, 0))
+
+            end = chunk.rfind(b"\n") + 1
+            self._offsets[path] = offset + end
+            if end == 0:
+                return None
+
+        return pd.read_csv(io.BytesIO(header + chunk[:end]))
+
+    def forget(self, path: str) -> None:
+        with self._lock:
+            self._offsets.pop(path, None)
+            self._headers.pop(path, None)
+            self._inodes.pop(path, None)
+
+
+# ─────────────────────────────────────────────────────────────
+# Watchers
+# ─────────────────────────────────────────────────────────────
+class _Handler(FileSystemEventHandler):
+    def __init__(self, on_path):
+        self.on_path = on_path
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.on_path(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.on_path(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.on_path(event.dest_path)
+
+
+class _Poller(threading.Thread):
+    """stat()-based fallback: checks (size, mtime) of every CSV under root."""
+
+    def __init__(self, root_path: str, on_path, interval: float = POLL_INTERVAL):
+        super().__init__(daemon=True, name=f"csv-poll:{root_path}")
+        self.root_path = root_path
+        self.on_path = on_path
+        self.interval = interval
+        self._seen: Dict[str, tuple] = {}
+        self._stop_event = threading.Event()
+
+    def scan(self) -> List[str]:
+        changed = []
+        for dirpath, _, files in os.walk(self.root_path):
+            for name in files:
+                path = os.path.join(dirpath, name)
+                if not _is_csv(path):
+                    continue
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                sig = (st.st_size, st.st_mtime_ns)
+                if self._seen.get(path) != sig:
+                    self._seen[path] = sig
+                    changed.append(path)
+        return changed
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            for path in self.scan():
+                self.on_path(path)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+# ─────────────────────────────────────────────────────────────
+# Source
+# ─────────────────────────────────────────────────────────────
+class LocalDirSource(SensorSource):
+    name = "local"
+
+    def __init__(self, poll_interval: float = POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self.tail = CsvTail()
+        self._observer = None
+        self._pollers: List[_Poller] = []
+
+    def list_partitions(self, root_path: str) -> List[str]:
+        if not os.path.isdir(root_path):
+            return []
+        partitions = [
+            entry.path for entry in os.scandir(root_path) if entry.is_dir()
+        ]
+        # CSV ที่วางไว้ตรง root (ไม่มีโฟลเดอร์รายวัน) ก็นับเป็น partition หนึ่ง
+        if any(_is_csv(name) for name in os.listdir(root_path)):
+            partitions.append(root_path)
+        return sorted(partitions)
+
+    def read_partition(self, partition: str) -> List[pd.DataFrame]:
+        frames = []
+        with metrics.timed("csv_parse"):
+            for name in sorted(os.listdir(partition)):
+                path = os.path.join(partition, name)
+                if _is_csv(name) and os.path.isfile(path):
+                    frames.append(pd.read_csv(path))
+        return frames
+
+    def watch(self, root_path: str, on_rows: RowsCallback) -> bool:
+        if not os.path.isdir(root_path):
+            return False
+
+        # ข้อมูลเดิมถูกโหลดไปแล้วด้วย read_partition → tail เฉพาะส่วนที่ต่อท้าย
+        for dirpath, _, files in os.walk(root_path):
+            for name in files:
+                if _is_csv(name):
+                    self.tail.skip_existing(os.path.join(dirpath, name))
+
+        def on_path(path: str):
+            if not _is_csv(path):
+                return
+            try:
+                rows = self.tail.read_new(path)
+            except Exception as e:
+                print(f"⚠️ Failed to tail {path}: {e}")
+                return
+            if rows is not None and not rows.empty:
+                on_rows(root_path, rows)
+
+        if Observer is not None:
+            if self._observer is None:
+                self._observer = Observer()
+                self._observer.daemon = True
+                self._observer.start()
+            self._observer.schedule(_Handler(on_path), root_path, recursive=True)
+            print(f"👀 Watching {root_path} (watchdog)")
+        else:
+            poller = _Poller(root_path, on_path, self.poll_interval)
+            poller.scan()   # baseline ของไฟล์ที่มีอยู่แล้ว
+            poller.start()
+            self._pollers.append(poller)
+            print(f"👀 Watching {root_path} (polling every {self.poll_interval}s)")
+
+        return True
+
+    def stop(self) -> None:
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=2)
+            self._observer = None
+        for poller in self._pollers:
+            poller.stop()
+        self._pollers = []
@@ -0,0 +1,21 @@
+# backend/sources/push_source.py
+from typing import List
+
+import pandas as pd
+
+from backend.sources.base import SensorSource
+
+
+class PushSource(SensorSource):
+    """
+    Devices that only push over HTTP (/ingest/{device_id}).
+    There is nothing to read back: the in-memory snapshot is the store.
+    """
+
+    name = "push"
+
+    def list_partitions(self, root_path: str) -> List[str]:
+        return []
+
+    def read_partition(self, partition: str) -> List[pd.DataFrame]:
+        return []
@@ -0,0 +1,24 @@
+# backend/tests/conftest.py
+"""
+Run from the repository root:  python -m pytest backend/tests -q
+
+No Dropbox / MongoDB access: the settings below only need to exist.
+"""
+import os
+import tempfile
+
+os.environ.setdefault("DROPBOX_TOKEN", "test")
+os.environ.setdefault("WISE4051_FOLDER", "/test/WISE4051")
+os.environ.setdefault("WISE4012_FOLDER", "/test/WISE4012")
+os.environ.setdefault("SHARED_FRAME_DIR", tempfile.mkdtemp(prefix="decarbonator-test-"))
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def clean_cache():
+    from backend.dropbox import service
+
+    service.clear_cache()
+    yield service
+    service.clear_cache()
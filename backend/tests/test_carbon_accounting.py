@@ -0,0 +1,112 @@
+# backend/tests/test_carbon_accounting.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.core import carbon_accounting
+from backend.core.config import settings
+
+PLANT = "test-plant"
+
+
+@pytest.fixture(autouse=True)
+def clean():
+    carbon_accounting.reset()
+    yield
+    carbon_accounting.reset()
+
+
+def _frame(co2, start="2025-11-01 10:00", freq="1min", temp=25.0, humid=None) -> pd.DataFrame:
+    df = pd.DataFrame({
+        "timestamp": pd.date_range(start, periods=len(co2), freq=freq),
+        "carbon": np.asarray(co2, dtype=float),
+        "Temp": temp,
+    })
+    if humid is not None:
+        df["Humidity"] = humid
+    return df
+
+
+def _total(field: str) -> float:
+    return carbon_accounting.get_totals(PLANT)[PLANT]["total"][field]
+
+
+def test_drawdown_and_emission_ppm():
+    carbon_accounting.ingest(_frame([450, 440, 445, 430]), PLANT, "carbon", "Temp")
+
+    assert _total("drawdown_ppm") == 25.0
+    assert _total("emission_ppm") == 5.0
+    assert _total("net_drawdown_ppm") == 20.0
+    assert _total("samples") == 4
+
+
+def test_changes_across_a_gap_are_not_counted():
+    before = _frame([450, 440], start="2025-11-01 10:00")
+    # เครื่องดับ 1 ชั่วโมง (> MAX_GAP) แล้วกลับมาที่ค่าต่ำกว่ามาก
+    after = _frame([300, 290], start="2025-11-01 11:01")
+    carbon_accounting.ingest(pd.concat([before, after], ignore_index=True), PLANT, "carbon", "Temp")
+
+    assert _total("drawdown_ppm") == 20.0
+
+
+def test_gap_between_batches_is_not_counted():
+    carbon_accounting.ingest(_frame([450, 440], start="2025-11-01 10:00"), PLANT, "carbon", "Temp")
+    carbon_accounting.ingest(_frame([300, 290], start="2025-11-01 11:01"), PLANT, "carbon", "Temp")
+
+    assert _total("drawdown_ppm") == 20.0
+
+
+def test_humidity_correction():
+    dry = carbon_accounting.mg_per_ppm(np.array([25.0]))[0]
+    humid = carbon_accounting.mg_per_ppm(np.array([25.0]), np.array([50.0]))[0]
+
+    # ideal gas ที่ 25 °C, 1 atm
+    assert dry == pytest.approx(101325 / (8.314462618 * 298.15) * 44.01e-3, rel=1e-9)
+    # 50 % RH ที่ 25 °C: vapour pressure ≈ 1584 Pa → อากาศแห้งน้อยลง ~1.6 %
+    assert humid / dry == pytest.approx(1 / (1 - 1583.7 / 101325), rel=1e-4)
+
+    carbon_accounting.ingest(_frame([450, 440], humid=50.0), PLANT, "carbon", "Temp", "Humidity")
+    assert _total("drawdown_mg") == pytest.approx(10 * humid * settings.CHAMBER_VOLUME_M3)
+
+
+def test_incremental_ingest_matches_full_recompute():
+    rng = np.random.default_rng(0)
+    df = _frame(450 + rng.normal(0, 5, 500).cumsum(), freq="30s", temp=24.0, humid=55.0)
+    df = pd.concat([df.iloc[:200], df.iloc[200:].assign(timestamp=df["timestamp"].iloc[200:] + pd.Timedelta("1h"))])
+
+    for start in range(0, len(df), 37):
+        # แต่ละ batch ส่งทั้ง frame ถึงตอนนั้น เหมือน sync (แถวเก่าต้องถูกข้าม)
+        carbon_accounting.ingest(df.iloc[:start + 37], PLANT, "carbon", "Temp", "Humidity")
+    incremental = carbon_accounting.get_totals(PLANT)[PLANT]["total"]
+    series = carbon_accounting.get_series(PLANT, "hour", 100)
+
+    carbon_accounting.reset()
+    carbon_accounting.ingest(df, PLANT, "carbon", "Temp", "Humidity")
+    full = carbon_accounting.get_totals(PLANT)[PLANT]["total"]
+
+    for field in ("drawdown_ppm", "emission_ppm", "drawdown_mg", "emission_mg", "samples"):
+        assert incremental[field] == pytest.approx(full[field])
+    assert [s["period_start"] for s in series] == [s["period_start"] for s in carbon_accounting.get_series(PLANT, "hour", 100)]
+
+
+def test_current_period_is_not_the_last_one_with_data():
+    carbon_accounting.ingest(_frame([450, 440], start="2025-11-01 10:00"), PLANT, "carbon", "Temp")
+
+    same_hour = carbon_accounting.get_totals(PLANT, now=pd.Timestamp("2025-11-01 10:30"))[PLANT]
+    assert same_hour["current_hour"]["drawdown_ppm"] == 10.0
+    assert same_hour["today"]["drawdown_ppm"] == 10.0
+
+    # device หยุดส่ง: วันถัดไปต้องเป็น 0 ไม่ใช่ค่าของเมื่อวาน
+    next_day = carbon_accounting.get_totals(PLANT, now=pd.Timestamp("2025-11-02 09:00"))[PLANT]
+    assert next_day["current_hour"]["drawdown_ppm"] == 0.0
+    assert next_day["today"]["drawdown_ppm"] == 0.0
+    assert next_day["today"]["period_start"] == pd.Timestamp("2025-11-02")
+    assert next_day["total"]["drawdown_ppm"] == 10.0
+
+
+def test_daily_series_is_bounded(monkeypatch):
+    monkeypatch.setattr(carbon_accounting, "DAILY_RETENTION", 3)
+    carbon_accounting.ingest(_frame([450 - i for i in range(6)], freq="1D"), PLANT, "carbon", "Temp")
+
+    days = carbon_accounting.get_series(PLANT, "day", 10)
+    assert [d["period_start"] for d in days] == list(pd.date_range("2025-11-04", periods=3, freq="D"))
@@ -0,0 +1,51 @@
+# backend/tests/test_catalog.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.dropbox.catalog import apply_catalog
+
+
+def test_wise4051_scale_and_names():
+    raw = pd.DataFrame({
+        "timestamp": pd.date_range("2025-11-01", periods=2, freq="10s"),
+        "COM_1 Wd_0": [452, 460],
+        "COM_1 Wd_1": [2850, 2911],     # °C × 100
+        "COM_1 Wd_2": [6012, 5999],     # % × 100
+        "Extra": ["a", "b"],
+    })
+
+    df = apply_catalog(raw, "wise4051")
+
+    assert list(df.columns) == ["timestamp", "Extra", "carbon", "Temp", "Humidity"]
+    assert df["Temp"].dtype == np.float32
+    np.testing.assert_allclose(df["Temp"], [28.50, 29.11], rtol=1e-6)
+    np.testing.assert_allclose(df["Humidity"], [60.12, 59.99], rtol=1e-6)
+    assert df["carbon"].tolist() == [452.0, 460.0]
+    # คอลัมน์ที่ไม่อยู่ใน catalog ผ่านไปเหมือนเดิม
+    assert df["Extra"].tolist() == ["a", "b"]
+
+
+def test_wise4012_adc_offset_and_int8():
+    raw = pd.DataFrame({
+        "AI_0 Val": [0, 32768, 65535],
+        "AI_1 Val": ["32768", "bad", None],
+        "DI_0": [1, 0, None],
+    })
+
+    df = apply_catalog(raw, "wise4012")
+
+    np.testing.assert_allclose(df["Leaf_Voltage"], [-10.0, 0.0, 10.0], atol=1e-3)
+    assert df["Leaf_Voltage"].dtype == np.float32
+    # ค่าที่ parse ไม่ได้ → NaN (ไม่ใช่ error)
+    assert df["Ground_Voltage"].iloc[0] == 0.0
+    assert df["Ground_Voltage"].iloc[1:].isna().all()
+    # int8 ไม่มี NaN → 0
+    assert df["DI_0"].dtype == np.int8
+    assert df["DI_0"].tolist() == [1, 0, 0]
+
+
+@pytest.mark.parametrize("device", ["unknown", "wise4051"])
+def test_frames_without_registers_pass_through(device):
+    df = pd.DataFrame({"timestamp": [pd.Timestamp("2025-11-01")], "carbon": [450.0]})
+    assert apply_catalog(df, device) is df
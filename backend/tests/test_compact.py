@@ -0,0 +1,57 @@
+# backend/tests/test_compact.py
+import numpy as np
+import pandas as pd
+
+from backend.dropbox import service
+
+
+def _frame() -> pd.DataFrame:
+    return pd.DataFrame({
+        "timestamp": pd.date_range("2025-11-01", periods=4, freq="10s"),
+        "counter": np.array([0, 1, 2, 100], dtype=np.int64),
+        "wide": np.array([0, 1, 2, 70000], dtype=np.int64),
+        "negative": np.array([-1, 0, 1, 2], dtype=np.int64),
+        "reading": np.array([28.03, 450.5, np.nan, 1e-3]),
+        "precise": np.array([0.1, 0.2, 123456.789, 1.0]),
+        "DI_0 Evt": np.array([0, 1, 0, 1], dtype=np.int64),
+    })
+
+
+def test_int64_downcasts_to_smallest_int():
+    df = service.compact_frame(_frame())
+
+    assert df["counter"].dtype == np.int8
+    assert df["wide"].dtype == np.int32
+    assert df["negative"].dtype == np.int8
+    assert df["wide"].tolist() == [0, 1, 2, 70000]
+
+
+def test_float64_to_float32_only_when_json_is_identical():
+    before = _frame()
+    df = service.compact_frame(before)
+
+    assert df["reading"].dtype == np.float32
+    # 123456.789 มี 9 หลัก → float32 ส่งออกไม่ตรง → คง float64
+    assert df["precise"].dtype == np.float64
+
+    cols = ["reading", "precise"]
+    assert service.df_to_records(df[cols]) == service.df_to_records(before[cols])
+
+
+def test_drops_timestamp_sources_and_event_registers():
+    raw = pd.DataFrame({
+        "Year": [2025, 2025], "Month": [11, 11], "Day": [1, 1],
+        "Hour": [0, 0], "Minute": [0, 0], "Second": [0, 10],
+        "COM_1 Wd_0": [450, 451],
+        "DI_0 Evt": [0, 1],
+    })
+    df = service.prepare_frames([raw], "wise4051")
+
+    assert "timestamp" in df.columns and "carbon" in df.columns
+    assert not {"Year", "Month", "Day", "Hour", "Minute", "Second", "DI_0 Evt"} & set(df.columns)
+    assert df["timestamp"].tolist() == [pd.Timestamp("2025-11-01 00:00:00"), pd.Timestamp("2025-11-01 00:00:10")]
+
+
+def test_empty_frame_passes_through():
+    empty = pd.DataFrame(columns=["timestamp", "TIM"])
+    assert service.compact_frame(empty) is empty
@@ -0,0 +1,25 @@
+# backend/tests/test_devices.py
+import pytest
+
+from backend.dropbox import devices
+
+REGISTRY = devices.load_devices(
+    '[{"id": "a4051", "type": "wise4051", "root": "/a/4051"},'
+    ' {"id": "a4012", "type": "wise4012", "root": "/a/4012"}]'
+)
+
+
+def test_primary_pair():
+    co2, elec = devices.primary_devices([" a4051", "a4012 "], REGISTRY)
+    assert (co2["root"], elec["root"]) == ("/a/4051", "/a/4012")
+
+
+@pytest.mark.parametrize("ids, message", [
+    (["a4051"], "exactly two"),
+    (["a4051", "a4012", "a4051"], "exactly two"),
+    (["a4051", "missing"], "'missing' is not in SENSOR_DEVICES"),
+    (["a4012", "a4051"], "expected a wise4051"),
+])
+def test_bad_primary_devices_fail_clearly(ids, message):
+    with pytest.raises(RuntimeError, match=message):
+        devices.primary_devices(ids, REGISTRY)
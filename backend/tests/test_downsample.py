@@ -0,0 +1,80 @@
+# backend/tests/test_downsample.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.dropbox.downsample import downsample, lttb_indices, minmax_indices
+
+
+def _frame(n: int = 5000) -> pd.DataFrame:
+    rng = np.random.default_rng(1)
+    t = np.arange(n)
+    df = pd.DataFrame({
+        "timestamp": pd.date_range("2025-11-01", periods=n, freq="10s"),
+        "carbon": 450 + 30 * np.sin(t / 300) + rng.normal(0, 1, n),
+        "Leaf_Voltage": 0.5 + 0.1 * np.cos(t / 200) + rng.normal(0, 0.01, n),
+        "Ground_Voltage": 0.2 + rng.normal(0, 0.01, n),
+    })
+    # peak เดี่ยวสั้น ๆ ที่ต้องไม่หาย
+    df.loc[1234, "carbon"] = 900.0
+    df.loc[4321, "Leaf_Voltage"] = -2.0
+    return df
+
+
+COLS = ["carbon", "Leaf_Voltage", "Ground_Voltage"]
+
+
+@pytest.mark.parametrize("method", ["lttb", "minmax"])
+@pytest.mark.parametrize("max_points", [3, 4, 5, 7, 10, 99, 1000])
+@pytest.mark.parametrize("ncols", [1, 2, 3])
+def test_never_exceeds_max_points(method, max_points, ncols):
+    out = downsample(_frame(), max_points, method, COLS[:ncols])
+    assert 0 < len(out) <= max_points
+    assert out["timestamp"].is_monotonic_increasing
+
+
+@pytest.mark.parametrize("n_out", [1, 2, 3, 4, 5, 9, 50])
+def test_index_selectors_respect_n_out(n_out):
+    y = _frame()["carbon"].to_numpy()
+    x = np.arange(len(y), dtype=float)
+    assert len(minmax_indices(y, n_out)) <= n_out
+    assert len(lttb_indices(x, y, n_out)) == n_out
+
+
+@pytest.mark.parametrize("max_points", [6, 7, 20, 500])
+def test_minmax_keeps_global_extremes(max_points):
+    df = _frame()
+    out = downsample(df, max_points, "minmax", COLS)
+    for col in COLS:
+        assert out[col].max() == df[col].max()
+        assert out[col].min() == df[col].min()
+
+
+def test_lttb_keeps_endpoints_and_isolated_peak():
+    df = _frame()
+    out = downsample(df, 200, "lttb", ["carbon"])
+    assert out.index[0] == 0 and out.index[-1] == len(df) - 1
+    assert out["carbon"].max() == 900.0
+
+
+@pytest.mark.parametrize("method", ["lttb", "minmax"])
+def test_nan_gaps(method):
+    df = _frame()
+    df.loc[1000:2999, "carbon"] = np.nan   # bucket ว่าง / เครื่องดับ
+    df.loc[0:99, "Leaf_Voltage"] = np.nan
+
+    out = downsample(df, 100, method, ["carbon", "Leaf_Voltage"])
+
+    assert len(out) <= 100
+    # ไม่มีแถวที่เลือกเพราะ carbon แต่ carbon เป็น NaN ในช่วง gap
+    picked_in_gap = out.loc[1000:2999]
+    assert picked_in_gap["Leaf_Voltage"].notna().all()
+    if method == "minmax":
+        assert out["carbon"].max() == df["carbon"].max()
+        assert out["Leaf_Voltage"].min() == df["Leaf_Voltage"].min()
+
+
+def test_all_nan_column_is_ignored():
+    df = _frame().assign(Ground_Voltage=np.nan)
+    out = downsample(df, 50, "minmax", COLS)
+    assert 0 < len(out) <= 50
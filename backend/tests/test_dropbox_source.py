@@ -0,0 +1,65 @@
+# backend/tests/test_dropbox_source.py
+import os
+import tempfile
+
+import pytest
+import requests
+
+from backend.core.config import settings
+from backend.dropbox import client as dropbox_client
+from backend.sources.dropbox_source import DropboxSource
+
+
+class _Response:
+    def __init__(self, chunks, fail: bool):
+        self.chunks, self.fail = chunks, fail
+
+    def iter_content(self, chunk_size):
+        yield from self.chunks
+        if self.fail:
+            raise requests.exceptions.ChunkedEncodingError("connection reset mid-stream")
+
+    def close(self):
+        pass
+
+
+class _FlakyDropbox:
+    """files_download_zip ที่ขาดกลาง stream `failures` ครั้งแรก"""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.calls = 0
+
+    def files_download_zip(self, path):
+        self.calls += 1
+        return None, _Response([b"PK", b"zip"], fail=self.calls <= self.failures)
+
+
+@pytest.fixture
+def tmpdir_only(tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    monkeypatch.setattr(dropbox_client, "_backoff", lambda attempt: 0)
+    monkeypatch.setattr(settings, "DROPBOX_MAX_RETRIES", 2)
+    return tmp_path
+
+
+def test_mid_stream_failure_is_retried(tmpdir_only):
+    dbx = _FlakyDropbox(failures=2)
+
+    path = DropboxSource(client_factory=lambda: dbx).download_zip("/WISE4051/2025-11-01")
+
+    assert dbx.calls == 3
+    with open(path, "rb") as f:
+        assert f.read() == b"PKzip"
+    # ไฟล์ของรอบที่ขาดถูกลบ เหลือแค่ ZIP ที่ครบ
+    assert os.listdir(tmpdir_only) == [os.path.basename(path)]
+
+
+def test_failed_download_leaves_no_temp_file(tmpdir_only):
+    dbx = _FlakyDropbox(failures=10)
+
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        DropboxSource(client_factory=lambda: dbx).download_zip("/WISE4051/2025-11-01")
+
+    assert dbx.calls == 3
+    assert os.listdir(tmpdir_only) == []
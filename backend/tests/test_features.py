@@ -0,0 +1,57 @@
+# backend/tests/test_features.py
+import numpy as np
+import pandas as pd
+
+from backend.api.routes import predict
+from backend.dropbox import quality
+from backend.ml import train
+from backend.ml.features import FINAL_FEATURE_COLUMNS, clean_inputs
+
+DEVICE = {"id": "test-parity", "type": "wise4051"}
+
+
+def _day(start: str, spike_at=None) -> pd.DataFrame:
+    ts = pd.date_range(start, periods=8640, freq="10s")
+    t = np.arange(len(ts))
+    rng = np.random.default_rng(len(start))
+    carbon = 450 + 20 * np.sin(t / 500) + rng.normal(0, 1, len(ts))
+    if spike_at is not None:
+        carbon[spike_at] += 2000.0
+    return pd.DataFrame({
+        "timestamp": ts,
+        "carbon": carbon,
+        "Temp": 28 + 3 * np.sin(t / 900) + rng.normal(0, 0.01, len(ts)),
+        "Humidity": 60 + 10 * np.sin(t / 700) + rng.normal(0, 0.1, len(ts)),
+        "light_intensity": 300 + 200 * np.sin(t / 400),
+        "lux": 1000 + 500 * np.sin(t / 400),
+    })
+
+
+def test_training_and_serving_features_match():
+    # spike 2 นาทีก่อนแถวสุดท้าย → อยู่ใน lag / rolling ของแถวที่ predict
+    days = [
+        (pd.Timestamp("2025-11-01"), _day("2025-11-01")),
+        (pd.Timestamp("2025-11-02"), _day("2025-11-02", spike_at=8640 - 12)),
+    ]
+    data, zscore = train.build_dataset(days, "1min", workers=1, device_type=DEVICE["type"])
+
+    # serving: frame ทั้งก้อนผ่าน annotate ตอน ingest → clean_inputs → _model_input
+    quality.reset()
+    live = quality.annotate(DEVICE, pd.concat([df for _, df in days], ignore_index=True))
+    assert live[quality.QUALITY_COL].any()
+
+    columns = [c for c in FINAL_FEATURE_COLUMNS if c not in ("time_of_day", "light_category")]
+    schema = {"interval": "1min", "zscore": zscore, "scaler": {"mean": {}, "scale": {}}, "input_columns": ["TIM"] + columns}
+    predict._schemas["test-parity"] = schema
+    try:
+        served = predict._model_input(clean_inputs(live), "test-parity")
+    finally:
+        predict._schemas.pop("test-parity")
+
+    trained = data[data["TIM"] == served["TIM"].iloc[0]]
+    assert len(trained) == 1
+    np.testing.assert_allclose(
+        trained[columns].to_numpy(dtype=float), served[columns].to_numpy(dtype=float), rtol=1e-9,
+    )
+    # spike ถูก mask ทั้งสองทาง
+    assert served["carbon_rolling_max_10"].iloc[0] < 1000
@@ -0,0 +1,80 @@
+# backend/tests/test_history.py
+import pandas as pd
+import pytest
+
+from backend.core.config import settings
+from backend.dropbox import history, service
+
+ROOT = "/test/history"
+DAYS = pd.date_range("2025-11-01", periods=10, freq="D")
+
+
+class _DaySource:
+    """หนึ่ง partition ต่อวัน, ตัวอย่างทุก 1 ชั่วโมง; นับว่าอ่าน partition ไหนบ้าง"""
+
+    def __init__(self):
+        self.reads = []
+
+    def list_partitions(self, root_path):
+        # ผสมรูปแบบชื่อโฟลเดอร์ + โฟลเดอร์ที่ไม่ใช่วันที่
+        names = [f"{root_path}/{d:%Y-%m-%d}" if i % 2 else f"{root_path}/{d:%Y%m%d}" for i, d in enumerate(DAYS)]
+        return names + [f"{root_path}/archive"]
+
+    def read_partition(self, partition):
+        self.reads.append(partition.rsplit("/", 1)[-1])
+        day = history.partition_day(partition)
+        ts = pd.date_range(day, periods=24, freq="h")
+        return [pd.DataFrame({"TIM": ts.strftime("%Y-%m-%d %H:%M:%S"), "COM_1 Wd_0": range(24)})]
+
+
+@pytest.fixture
+def source(monkeypatch):
+    src = _DaySource()
+    monkeypatch.setattr(service, "_source_for", lambda root: (src, "wise4051"))
+    history.clear()
+    yield src
+    history.clear()
+
+
+def test_read_range_prunes_partitions(source):
+    start, end = pd.Timestamp("2025-11-03 12:00"), pd.Timestamp("2025-11-05 06:00")
+
+    df = history.read_range(ROOT, start, end)
+
+    # วันแรกเริ่มกลางวัน แต่ partition ของวันนั้นยังต้องถูกอ่าน
+    # (โหลดหลาย partition พร้อมกัน → ลำดับไม่แน่นอน)
+    assert sorted(source.reads) == ["2025-11-04", "20251103", "20251105"]
+    assert df["timestamp"].iloc[0] == start
+    assert df["timestamp"].iloc[-1] == end
+    assert len(df) == 12 + 24 + 7
+    assert df["carbon"].dtype == "float32"
+
+
+def test_partition_lru_evicts_least_recently_used(source, monkeypatch):
+    monkeypatch.setattr(settings, "HISTORY_PARTITION_CACHE", 2)
+
+    def read(day):
+        history.read_range(ROOT, pd.Timestamp(day), pd.Timestamp(day) + pd.Timedelta("23h"))
+
+    read("2025-11-01")
+    read("2025-11-02")
+    read("2025-11-01")          # hit → 11-01 ใหม่กว่า 11-02
+    read("2025-11-03")          # เกิน 2 → ทิ้ง 11-02
+    read("2025-11-01")          # ยังอยู่
+    read("2025-11-02")          # ต้องโหลดใหม่
+
+    assert source.reads == ["20251101", "2025-11-02", "20251103", "2025-11-02"]
+    stats = history.get_stats()
+    assert stats["cached_partitions"] == 2
+    assert stats["partition_hits"] == 2
+
+
+def test_latest_partition_is_reread_after_ttl(source, monkeypatch):
+    monkeypatch.setattr(history, "INDEX_TTL", 0.0)
+    span = (pd.Timestamp("2025-11-09"), pd.Timestamp("2025-11-10 23:00"))
+
+    history.read_range(ROOT, *span)
+    history.read_range(ROOT, *span)
+
+    # วันล่าสุดอาจยังโตอยู่ → อ่านใหม่, วันก่อนหน้าใช้ cache
+    assert sorted(source.reads) == ["2025-11-10", "2025-11-10", "20251109"]
@@ -0,0 +1,94 @@
+# backend/tests/test_http_cache.py
+import asyncio
+
+import pandas as pd
+
+from backend.api import http_cache
+from backend.core import execution, metrics
+from backend.core.config import settings
+from backend.dropbox import shared_frames
+
+
+def _ref(version: int) -> dict:
+    df = pd.DataFrame({
+        "timestamp": pd.date_range("2025-11-01", periods=600, freq="10s"),
+        "carbon": pd.Series(range(600), dtype="float32"),
+    })
+    return shared_frames.export("test_http_cache", version, df)
+
+
+def test_worker_timings_reach_api_metrics(monkeypatch):
+    monkeypatch.setattr(settings, "CPU_WORKERS", 1)
+    metrics.reset()
+    query = {"limit": None, "interval": "5min", "max_points": None, "method": "lttb", "since": None}
+
+    async def run():
+        try:
+            body, events = await execution.run_cpu(http_cache.frame_body, _ref(1), ["carbon"], query, None)
+            metrics.record(events)
+        finally:
+            execution.shutdown()
+        return body
+
+    assert asyncio.run(run()).startswith(b"[")
+
+    # คำนวณใน worker (spawn) แต่ต้องเห็นใน /metrics ของ API process
+    stages = metrics.stage_totals()
+    assert stages["aggregate"]["count"] == 1
+    assert stages["json_encode"]["count"] == 1
+
+
+def test_pruned_ref_is_retried(monkeypatch):
+    monkeypatch.setattr(settings, "CPU_WORKERS", 0)
+    live = _ref(2)
+    # ref แรกชี้ไป version ที่ถูก prune ไปแล้ว
+    refs = iter([{**live, "version": 1, "path": live["path"] + "-pruned"}, live])
+    monkeypatch.setattr(http_cache.dropbox_service, "shared_frame", lambda root: next(refs))
+
+    def compute():
+        raise AssertionError("shared frame should have been used")
+
+    async def run():
+        return await http_cache.conditional_frame_json(
+            None, "/test/unknown", {}, ["carbon"], {"interval": "raw", "limit": 5}, compute,
+        )
+
+    response = asyncio.run(run())
+    assert response.status_code == 200
+    assert response.body.count(b'"carbon"') == 5
+
+
+def test_pruned_ref_falls_back_to_compute(monkeypatch):
+    monkeypatch.setattr(settings, "CPU_WORKERS", 0)
+    gone = {**_ref(3), "path": "/nonexistent/v3"}
+    monkeypatch.setattr(http_cache.dropbox_service, "shared_frame", lambda root: gone)
+
+    async def run():
+        return await http_cache.conditional_frame_json(
+            None, "/test/unknown", {}, ["carbon"], {"interval": "raw"}, lambda: [{"carbon": 1.0}],
+        )
+
+    assert asyncio.run(run()).body == b'[{"carbon":1.0}]'
+
+
+class _Request:
+    def __init__(self, **headers):
+        self.headers = headers
+
+
+def test_if_modified_since_sees_bumps_within_one_second(clean_cache):
+    service = clean_cache
+    root = service.WISE4051_ROOT
+    df = pd.DataFrame({"timestamp": pd.date_range("2025-11-01", periods=3, freq="10s"), "carbon": [450.0, 451.0, 452.0]})
+
+    async def get(request):
+        return await http_cache.conditional_json(request, root, {"path": "test"}, lambda: [])
+
+    service.publish_snapshot(root, df)
+    first = asyncio.run(get(_Request()))
+    # bump ครั้งที่สองในวินาทีเดียวกัน
+    service.publish_snapshot(root, df.assign(carbon=[450.0, 451.0, 460.0]))
+
+    response = asyncio.run(get(_Request(**{"if-modified-since": first.headers["Last-Modified"]})))
+    assert response.status_code == 200
+    assert response.headers["Last-Modified"] != first.headers["Last-Modified"]
@@ -0,0 +1,101 @@
+# backend/tests/test_ingest.py
+import json
+import threading
+
+import pandas as pd
+import pytest
+
+from backend.dropbox import ingest, service
+
+
+def _push(body, content_type: str, device_id: str = "wise4051") -> pd.DataFrame:
+    device = service.devices.get_device(device_id)
+    if not isinstance(body, bytes):
+        body = json.dumps(body).encode("utf-8")
+    return ingest.validate_rows(ingest.parse_payload(body, content_type), device["type"])
+
+
+def _csv(start: str, rows: int = 6) -> bytes:
+    ts = pd.date_range(start, periods=rows, freq="10s")
+    lines = ["TIM,COM_1 Wd_0,COM_1 Wd_1,COM_1 Wd_2"]
+    lines += [f"{t:%Y-%m-%d %H:%M:%S},{450 + i},2500,6000" for i, t in enumerate(ts)]
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _json_rows(start: str, ts_key: str, rows: int = 6):
+    ts = pd.date_range(start, periods=rows, freq="10s")
+    return {"rows": [{ts_key: t.isoformat(), "carbon": 450.0 + i, "Temp": 25.0} for i, t in enumerate(ts)]}
+
+
+@pytest.mark.parametrize("body, content_type", [
+    (_csv("2025-11-01 00:00:00"), "text/csv"),
+    (_json_rows("2025-11-01 00:00:00", "TIM"), "application/json"),
+    (_json_rows("2025-11-01 00:00:00", "timestamp"), "application/json"),
+    (_json_rows("2025-11-01T00:00:00+07:00", "timestamp"), "application/json"),
+])
+def test_validate_rows_parses_timestamp(body, content_type):
+    df = _push(body, content_type)
+
+    assert pd.api.types.is_datetime64_dtype(df["timestamp"])
+    assert df["timestamp"].dt.tz is None
+    assert df["timestamp"].iloc[0] == pd.Timestamp("2025-11-01 00:00:00")
+
+
+@pytest.mark.parametrize("ts_key", ["TIM", "timestamp"])
+def test_json_pushes_append_and_aggregate(clean_cache, ts_key):
+    root = service.devices.get_device("wise4051")["root"]
+
+    first = _push(_json_rows("2025-11-01 00:00:00", ts_key), "application/json")
+    assert service.append_rows(root, first, initialize=True) == 6
+    second = _push(_json_rows("2025-11-01 00:01:00", ts_key), "application/json")
+    assert service.append_rows(root, second, initialize=True) == 6
+
+    df = service._cache[root]
+    assert pd.api.types.is_datetime64_dtype(df["timestamp"])
+    assert df["timestamp"].is_monotonic_increasing and len(df) == 12
+
+    records = service.get_co2_all_raw(interval="5min")
+    assert len(records) == 1 and records[0]["carbon"] == pytest.approx(df["carbon"].mean())
+
+
+def test_csv_push_appends(clean_cache):
+    root = service.devices.get_device("wise4051")["root"]
+
+    assert service.append_rows(root, _push(_csv("2025-11-01 00:00:00"), "text/csv"), initialize=True) == 6
+    # ซ้ำ = ไม่เพิ่ม, ใหม่กว่า = เพิ่ม
+    assert service.append_rows(root, _push(_csv("2025-11-01 00:00:00"), "text/csv"), initialize=True) == 0
+    assert service.append_rows(root, _push(_csv("2025-11-01 00:01:00"), "text/csv"), initialize=True) == 6
+    assert len(service._cache[root]) == 12
+
+
+def test_unparseable_timestamp_rejected():
+    body = {"rows": [{"timestamp": "not a time", "carbon": 1.0}]}
+    with pytest.raises(ingest.IngestError):
+        _push(body, "application/json")
+
+
+def test_push_during_sync_is_kept(clean_cache, monkeypatch):
+    device = service.devices.get_device("wise4051")
+    root = device["root"]
+    synced = _push(_csv("2025-11-01 00:00:00"), "text/csv")
+    pushed = _push(_csv("2025-11-01 00:01:00"), "text/csv")
+    check_quality = service._check_quality
+    pushers = []
+
+    def push_while_checking(root_path, df):
+        # push มาถึงระหว่างที่ sync กำลัง merge / ตรวจ quality
+        pusher = threading.Thread(target=service.append_rows, args=(root_path, pushed, True))
+        pusher.start()
+        pusher.join(0.2)
+        pushers.append(pusher)
+        return check_quality(root_path, df)
+
+    monkeypatch.setattr(service, "read_all_csv_under", lambda *a, **k: service.prepare_frames([synced], "wise4051"))
+    monkeypatch.setattr(service, "_check_quality", push_while_checking)
+
+    service.refresh_device(device)
+    pushers[0].join()
+
+    df = service._cache[root]
+    assert len(df) == 12
+    assert df["timestamp"].iloc[-1] == pd.Timestamp("2025-11-01 00:01:50")
@@ -0,0 +1,100 @@
+# backend/tests/test_local_source.py
+import os
+
+from backend.sources.local_source import CsvTail, _Poller
+
+
+def test_poller_stops_and_joins(tmp_path):
+    poller = _Poller(str(tmp_path), lambda path: None, interval=0.01)
+    poller.start()
+    poller.stop()
+    poller.join(2)
+
+    assert not poller.is_alive()
+
+
+# ─────────────────────────────────────────────────────────────
+# CsvTail
+# ─────────────────────────────────────────────────────────────
+def _tail_with(path, text: str) -> CsvTail:
+    path.write_text(text)
+    tail = CsvTail()
+    tail.skip_existing(str(path))
+    return tail
+
+
+def test_tail_returns_appended_rows(tmp_path):
+    path = tmp_path / "log.csv"
+    tail = _tail_with(path, "TIM,CO2\n2025-11-01 00:00:00,450\n")
+    assert tail.read_new(str(path)) is None
+
+    with open(path, "a") as f:
+        f.write("2025-11-01 00:00:10,451\n2025-11-01 00:00:20,452\n")
+    df = tail.read_new(str(path))
+
+    assert list(df.columns) == ["TIM", "CO2"]
+    assert df["CO2"].tolist() == [451, 452]
+    assert tail.read_new(str(path)) is None
+
+
+def test_tail_waits_for_partial_line(tmp_path):
+    path = tmp_path / "log.csv"
+    tail = _tail_with(path, "TIM,CO2\n")
+
+    with open(path, "a") as f:
+        f.write("2025-11-01 00:00:10,45")
+    assert tail.read_new(str(path)) is None
+
+    with open(path, "a") as f:
+        f.write("1\n")
+    assert tail.read_new(str(path))["CO2"].tolist() == [451]
+
+
+def test_tail_first_read_skips_header(tmp_path):
+    path = tmp_path / "log.csv"
+    path.write_text("TIM,CO2\n2025-11-01 00:00:00,450\n")
+
+    df = CsvTail().read_new(str(path))
+    assert df["CO2"].tolist() == [450]
+
+
+def test_tail_truncated_file_skips_header(tmp_path):
+    path = tmp_path / "log.csv"
+    tail = _tail_with(path, "TIM,CO2\n" + "".join(f"2025-11-01 00:00:{s:02d},450\n" for s in range(10)))
+    with open(path, "a") as f:
+        f.write("2025-11-01 00:00:10,451\n")
+    assert tail.read_new(str(path))["CO2"].tolist() == [451]   # header อยู่ใน cache แล้ว
+
+    # logger เริ่มไฟล์ใหม่ (สั้นกว่า offset เดิม)
+    path.write_text("TIM,CO2\n2025-11-02 00:00:00,460\n")
+    df = tail.read_new(str(path))
+
+    assert df["TIM"].tolist() == ["2025-11-02 00:00:00"]
+    assert df["CO2"].tolist() == [460]
+
+
+def test_tail_truncated_file_rereads_header(tmp_path):
+    path = tmp_path / "log.csv"
+    tail = _tail_with(path, "TIM,CO2\n" + "".join(f"2025-11-01 00:00:{s:02d},450\n" for s in range(10)))
+    with open(path, "a") as f:
+        f.write("2025-11-01 00:00:10,451\n")
+    assert tail.read_new(str(path))["CO2"].tolist() == [451]   # header อยู่ใน cache แล้ว
+
+    path.write_text("TIM,CO2,Temp\n2025-11-02 00:00:00,460,25\n")
+    df = tail.read_new(str(path))
+
+    assert list(df.columns) == ["TIM", "CO2", "Temp"]
+    assert df["CO2"].tolist() == [460]
+
+
+def test_tail_rotated_file_rereads_from_start(tmp_path):
+    path = tmp_path / "log.csv"
+    tail = _tail_with(path, "TIM,CO2\n2025-11-01 00:00:00,450\n")
+
+    # rotate: ไฟล์ใหม่ (inode ใหม่) ยาวกว่าไฟล์เดิม
+    rotated = tmp_path / "log.csv.new"
+    rotated.write_text("TIM,CO2\n" + "".join(f"2025-11-02 00:00:{s:02d},{460 + s}\n" for s in range(3)))
+    os.replace(rotated, path)
+    df = tail.read_new(str(path))
+
+    assert df["CO2"].tolist() == [460, 461, 462]
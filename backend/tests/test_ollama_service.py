@@ -0,0 +1,56 @@
+# backend/tests/test_ollama_service.py
+import asyncio
+
+from backend.core import ollama_service
+
+
+def _fake_ollama(monkeypatch, calls):
+    async def stream(message):
+        calls.append(message)
+        for token in ("CO2 ", "is ", "fine"):
+            await asyncio.sleep(0.01)
+            yield token
+
+    async def ask(message):
+        calls.append(message)
+        await asyncio.sleep(0.03)
+        return "CO2 is fine"
+
+    monkeypatch.setattr(ollama_service, "stream_carbon_status_ollama", stream)
+    monkeypatch.setattr(ollama_service, "ask_carbon_status_ollama_async", ask)
+    ollama_service.clear_reply_cache()
+
+
+async def _collect(message):
+    return "".join([t async for t in ollama_service.stream_carbon_status_cached(message)])
+
+
+def test_streamed_miss_is_shared(monkeypatch):
+    calls = []
+    _fake_ollama(monkeypatch, calls)
+
+    async def run():
+        return await asyncio.gather(
+            _collect("Is CO2 ok?"),
+            _collect("is co2 ok"),
+            ollama_service.ask_carbon_status_cached("Is CO2 ok?"),
+        )
+
+    assert asyncio.run(run()) == ["CO2 is fine"] * 3
+    assert len(calls) == 1
+
+
+def test_stream_disconnect_keeps_generating(monkeypatch):
+    calls = []
+    _fake_ollama(monkeypatch, calls)
+
+    async def run():
+        stream = ollama_service.stream_carbon_status_cached("Is CO2 ok?")
+        assert await stream.__anext__() == "CO2 "
+        joined = asyncio.ensure_future(ollama_service.ask_carbon_status_cached("Is CO2 ok?"))
+        await asyncio.sleep(0)
+        await stream.aclose()      # client ตัดการเชื่อมต่อ
+        return await joined
+
+    assert asyncio.run(run()) == "CO2 is fine"
+    assert len(calls) == 1
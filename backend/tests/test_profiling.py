@@ -0,0 +1,35 @@
+# backend/tests/test_profiling.py
+import threading
+import time
+
+from backend.core import profiling
+
+
+def _sleeper(stop: threading.Event) -> None:
+    while not stop.is_set():
+        time.sleep(0.05)
+
+
+def _spinner(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sleeping_threads_are_idle():
+    stop = threading.Event()
+    threads = [
+        threading.Thread(target=_sleeper, args=(stop,), name="test-sleeper", daemon=True),
+        threading.Thread(target=_spinner, args=(stop,), name="test-spinner", daemon=True),
+    ]
+    for t in threads:
+        t.start()
+
+    sampler = profiling._Sampler(0.005)
+    sampler.start()
+    time.sleep(0.2)
+    sampler.stop()
+    stop.set()
+
+    sampled = {stack.split(";", 1)[0] for stack in sampler.samples}
+    assert "test-spinner" in sampled
+    assert "test-sleeper" not in sampled
@@ -0,0 +1,99 @@
+# backend/tests/test_quality.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.dropbox import quality
+from backend.dropbox.quality import QUALITY_BITS, QUALITY_COL
+
+DEVICE = {"id": "test-quality", "type": "wise4051"}
+
+# จุดตัด batch: ก่อน / กลาง flatline, ตรง spike, หลัง spike, ตรง step, กลาง range, ตรง NaN
+CUTS = [150, 290, 400, 401, 500, 601, 650]
+
+
+def _frame() -> pd.DataFrame:
+    n = 720   # 2 ชั่วโมง ทุก 10 วินาที
+    ts = pd.date_range("2025-11-01", periods=n, freq="10s")
+    t = np.arange(n)
+    rng = np.random.default_rng(7)
+    carbon = 450 + 20 * np.sin(t / 500) + rng.normal(0, 1, n)
+    temp = 28 + 3 * np.sin(t / 900) + rng.normal(0, 0.01, n)
+
+    carbon[100:340] = 450.0        # ค้าง 40 นาที → flatline ตั้งแต่นาทีที่ 30
+    carbon[400] += 180.0           # spike (18 ppm/s ยังไม่เกิน max_rate)
+    carbon[650] = np.nan           # missing
+    temp[500:] += 3.0              # step 0.3 °C/s → rate (ไม่ใช่ spike)
+    lux = 1000 + 500 * np.sin(t / 400)
+    lux[600:603] = -5.0            # range
+    return pd.DataFrame({
+        "timestamp": ts,
+        "carbon": carbon,
+        "Temp": temp,
+        "Humidity": 60 + 10 * np.sin(t / 700) + rng.normal(0, 0.1, n),
+        "light_intensity": 300 + 200 * np.sin(t / 400),
+        "lux": lux,
+    })
+
+
+def _rows(flags: np.ndarray, metric: str) -> list:
+    return np.flatnonzero(flags & (1 << QUALITY_BITS[metric])).tolist()
+
+
+@pytest.fixture(autouse=True)
+def fresh_state():
+    quality.reset()
+    yield
+    quality.reset()
+
+
+def test_fault_kinds_set_their_metric_bit():
+    counters = quality._new_counters()
+    flags = quality._check(None, DEVICE["type"], _frame(), quality._new_state(), counters, alerts=False)
+
+    # 30 นาทีหลังเริ่มค้างที่แถว 100 = แถว 280
+    assert _rows(flags, "carbon") == list(range(280, 340)) + [400, 650]
+    assert _rows(flags, "Temp") == [500]
+    assert _rows(flags, "lux") == [600, 601, 602]
+    assert _rows(flags, "Humidity") == []
+    assert _rows(flags, "light_intensity") == []
+    assert {k: counters[k] for k in quality.KINDS} == {
+        "spike": 1, "flatline": 60, "rate": 1, "range": 3, "missing": 1,
+    }
+
+
+def test_history_flags_do_not_depend_on_batches():
+    df = _frame()
+    whole = quality.annotate_history(DEVICE["type"], [df])[0][QUALITY_COL].to_numpy()
+
+    bounds = [0] + CUTS + [len(df)]
+    parts = quality.annotate_history(DEVICE["type"], [df.iloc[a:b] for a, b in zip(bounds, bounds[1:])])
+    split = np.concatenate([p[QUALITY_COL].to_numpy() for p in parts])
+
+    np.testing.assert_array_equal(split, whole)
+
+
+def test_ingest_flags_do_not_depend_on_syncs():
+    df = _frame()
+    whole = quality.annotate(DEVICE, df)[QUALITY_COL].to_numpy()
+    quality.reset()
+
+    # sync แต่ละรอบเห็น frame ที่ยาวขึ้น; แถวเดิมคง flag จาก frame ก่อนหน้า
+    previous = None
+    for end in CUTS + [len(df)]:
+        previous = quality.annotate(DEVICE, df.iloc[:end], previous)
+
+    np.testing.assert_array_equal(previous[QUALITY_COL].to_numpy(), whole)
+
+
+def test_mask_flagged_hides_only_flagged_metrics():
+    annotated = quality.annotate_history(DEVICE["type"], [_frame()])[0]
+    masked = quality.mask_flagged(annotated)
+
+    assert masked["carbon"].iloc[[280, 339, 400]].isna().all()
+    assert masked["carbon"].iloc[[279, 340, 401]].notna().all()
+    assert np.isnan(masked["Temp"].iloc[500])
+    assert masked["lux"].iloc[600:603].isna().all()
+    # metric อื่นในแถวเดียวกันไม่ถูกแตะ
+    pd.testing.assert_series_equal(masked["Humidity"], annotated["Humidity"])
+    assert masked["carbon"].iloc[500] == annotated["carbon"].iloc[500]
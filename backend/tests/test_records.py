@@ -0,0 +1,29 @@
+# backend/tests/test_records.py
+import pandas as pd
+
+from backend.dropbox import service
+
+
+def _frame(rows: int) -> pd.DataFrame:
+    return pd.DataFrame({
+        "timestamp": pd.date_range("2025-11-01", periods=rows, freq="10s"),
+        "carbon": pd.Series(range(rows), dtype="float32"),
+    })
+
+
+def test_limit_keeps_latest_rows():
+    rows = service.frame_records(_frame(300), limit=100)
+
+    assert len(rows) == 100
+    assert rows[-1]["carbon"] == 299
+
+
+def test_delta_ignores_limit():
+    df = _frame(300)
+    since = df["timestamp"].iloc[50]
+
+    rows = service.frame_records(df, limit=100, since=since)
+
+    # ทุกแถวหลัง since (ไม่มีช่องว่างต่อจากข้อมูลที่ client มีอยู่)
+    assert len(rows) == 250
+    assert pd.Timestamp(rows[0]["timestamp"]) == since
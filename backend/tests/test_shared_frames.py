@@ -0,0 +1,56 @@
+# backend/tests/test_shared_frames.py
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.core.config import settings
+from backend.dropbox import shared_frames
+
+
+@pytest.fixture
+def frame_dir(tmp_path, monkeypatch):
+    root = tmp_path / "frames"
+    monkeypatch.setattr(settings, "SHARED_FRAME_DIR", str(root))
+    monkeypatch.setattr(shared_frames, "_checked_root", None)
+    return root
+
+
+def test_root_created_private(frame_dir):
+    shared_frames.export("k", 1, pd.DataFrame({"a": [1.0]}))
+    assert (os.stat(frame_dir).st_mode & 0o777) == 0o700
+
+
+def test_root_rejects_open_directory(frame_dir):
+    frame_dir.mkdir(mode=0o777)
+    os.chmod(frame_dir, 0o777)   # เช่นมีคนสร้างไว้ก่อนใน /dev/shm
+
+    with pytest.raises(RuntimeError, match="0700"):
+        shared_frames.export("k", 1, pd.DataFrame({"a": [1.0]}))
+
+
+def test_export_load_round_trip(frame_dir):
+    df = pd.DataFrame({
+        "timestamp": pd.date_range("2025-11-01", periods=3, freq="10s"),
+        "carbon": np.array([450.5, np.nan, 452.0], dtype=np.float32),
+        "label": ["a", None, "c"],
+    })
+    df2 = shared_frames.load(shared_frames.export("round-trip", 1, df))
+
+    pd.testing.assert_frame_equal(df2, df)
+    assert not df2["carbon"].to_numpy().flags.writeable   # mapped read-only
+
+
+def test_inbox_round_trip(frame_dir):
+    raw = pd.DataFrame({
+        "timestamp": pd.date_range("2025-11-01", periods=2, freq="10s"),
+        "carbon": [450.123456789, 451.0],
+    })
+    shared_frames.post_rows("/root/a", raw)
+    shared_frames.post_rows("/root/b", raw.tail(1))
+
+    batches = shared_frames.drain_rows()
+    assert [root for root, _ in batches] == ["/root/a", "/root/b"]
+    pd.testing.assert_frame_equal(batches[0][1], raw)
+    assert shared_frames.drain_rows() == []
@@ -0,0 +1,27 @@
+# backend/tests/test_shared_snapshot.py
+import pandas as pd
+
+from backend.dropbox import service
+
+
+def _frame(values, start="2025-11-01 00:00:00"):
+    return pd.DataFrame({
+        "timestamp": pd.date_range(start, periods=len(values), freq="10s"),
+        "carbon": pd.Series(values, dtype="float32"),
+    })
+
+
+def test_tail_version_follows_device_version(clean_cache, monkeypatch):
+    device = service.devices.get_device("wise4051")
+    tail_key = service._tail_key(device["id"])
+
+    monkeypatch.setattr(service, "read_all_csv_under", lambda *a, **k: _frame([94.5] * 6))
+    service.refresh_device(device)
+    first = service.get_snapshot_version(tail_key)[0]
+
+    # แถวใหม่ใน 5-min bucket เดิม: tail มีแถวเท่าเดิม เวลาเดิม แต่ค่าเฉลี่ยเปลี่ยน
+    monkeypatch.setattr(service, "read_all_csv_under", lambda *a, **k: _frame([94.5] * 6 + [994.9] * 6))
+    tail = service.refresh_device(device)
+
+    assert len(tail) == 1
+    assert service.get_snapshot_version(tail_key)[0] == first + 1
@@ -0,0 +1,88 @@
+# backend/tests/test_sync.py
+import pandas as pd
+import pytest
+
+from backend.dropbox import service
+
+
+def _frames():
+    ts = pd.date_range("2025-11-01", periods=60, freq="10s")
+    return {
+        service.WISE4051_ROOT: pd.DataFrame({"timestamp": ts, "carbon": pd.Series(450.0, index=range(60), dtype="float32")}),
+        service.WISE4012_ROOT: pd.DataFrame({"timestamp": ts, "Leaf_Voltage": pd.Series(0.5, index=range(60), dtype="float32")}),
+    }
+
+
+def test_failed_device_keeps_aligned_view(clean_cache, monkeypatch):
+    frames = _frames()
+    monkeypatch.setattr(service, "read_all_csv_under", lambda root, *a, **k: frames[root])
+    service.refresh_sensor_cache()
+    version = service.get_sensor_snapshot_version()
+    aligned = service.get_aligned_frame()
+    assert "Leaf_Voltage" in aligned.columns
+
+    def elec_down(root, *a, **k):
+        if root == service.WISE4012_ROOT:
+            raise ConnectionError("Dropbox unavailable")
+        return frames[root]
+
+    monkeypatch.setattr(service, "read_all_csv_under", elec_down)
+    service.refresh_sensor_cache()
+
+    # ETag (version) เดิม → body ต้องเดิมด้วย
+    assert service.get_sensor_snapshot_version() == version
+    pd.testing.assert_frame_equal(service.get_aligned_frame(), aligned)
+
+
+def test_corrected_row_bumps_version(clean_cache):
+    df = _frames()[service.WISE4051_ROOT]
+    version = service.publish_snapshot(service.WISE4051_ROOT, df)
+
+    assert service.publish_snapshot(service.WISE4051_ROOT, df.copy()) == version
+
+    # ความยาว / timestamp แรก-สุดท้ายเท่าเดิม แต่ค่าตรงกลางถูกแก้
+    corrected = df.copy()
+    corrected.loc[30, "carbon"] = 451.0
+    assert service.publish_snapshot(service.WISE4051_ROOT, corrected) == version + 1
+
+
+def test_append_masks_only_new_rows(clean_cache, monkeypatch):
+    from backend.core import carbon_accounting
+    from backend.dropbox import quality
+
+    carbon_accounting.reset()
+    ts = pd.date_range("2025-11-01", periods=2000, freq="10s")
+    df = pd.DataFrame({"timestamp": ts, "carbon": 450.0 + (pd.Series(range(2000)) % 7), "Temp": 28.0, "Humidity": 60.0})
+    assert service.append_rows(service.WISE4051_ROOT, df.iloc[:1999], initialize=True) == 1999
+
+    sizes = []
+    real = quality.mask_flagged
+    monkeypatch.setattr(quality, "mask_flagged", lambda frame: sizes.append(len(frame)) or real(frame))
+    assert service.append_rows(service.WISE4051_ROOT, df.iloc[1999:]) == 1
+
+    # batch 1 แถว → mask 1 แถว ไม่ใช่ทั้ง frame
+    assert sizes == [1]
+    plant = service.devices.device_for_root(service.WISE4051_ROOT)["plant_id"]
+    incremental = carbon_accounting.get_totals(plant)[plant]["total"]
+
+    carbon_accounting.reset()
+    # คำนวณใหม่ทั้ง frame (mask แบบเดียวกัน) ต้องได้เท่ากัน
+    carbon_accounting.ingest(real(service._cache[service.WISE4051_ROOT]), plant, "carbon", "Temp", "Humidity")
+    full = carbon_accounting.get_totals(plant)[plant]["total"]
+    assert incremental["drawdown_mg"] == pytest.approx(full["drawdown_mg"])
+    assert incremental["samples"] == full["samples"]
+    carbon_accounting.reset()
+
+
+def test_append_does_not_hash_the_frame(clean_cache, monkeypatch):
+    df = _frames()[service.WISE4051_ROOT]
+    service.append_rows(service.WISE4051_ROOT, df.iloc[:50], initialize=True)
+    version = service.get_snapshot_version(service.WISE4051_ROOT)[0]
+
+    hashed = []
+    real = service._fingerprint
+    monkeypatch.setattr(service, "_fingerprint", lambda frame: hashed.append(len(frame)) or real(frame))
+    assert service.append_rows(service.WISE4051_ROOT, df.iloc[50:51]) == 1
+
+    assert hashed == []
+    assert service.get_snapshot_version(service.WISE4051_ROOT)[0] == version + 1
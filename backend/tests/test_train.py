@@ -0,0 +1,59 @@
+# backend/tests/test_train.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.dropbox import quality
+from backend.dropbox.service import aggregate_data
+from backend.ml import train
+from backend.ml.features import FINAL_FEATURE_COLUMNS, clean_inputs, create_advanced_features
+
+DEVICE_TYPE = "wise4051"
+
+
+def _day(start: str) -> pd.DataFrame:
+    ts = pd.date_range(start, periods=1440, freq="1min")
+    t = np.arange(len(ts)) + ts[0].day * 1440
+    rng = np.random.default_rng(ts[0].day)
+    return pd.DataFrame({
+        "timestamp": ts,
+        "carbon": 450 + 20 * np.sin(t / 300) + rng.normal(0, 1, len(ts)),
+        "Temp": 28 + 3 * np.sin(t / 900) + rng.normal(0, 0.01, len(ts)),
+        "Humidity": 60 + 10 * np.sin(t / 700) + rng.normal(0, 0.1, len(ts)),
+        "light_intensity": 300 + 200 * np.sin(t / 400),
+        "lux": 1000 + 500 * np.sin(t / 400),
+    })
+
+
+@pytest.mark.parametrize("interval", ["raw", "5min"])
+def test_day_split_matches_single_pass(interval):
+    # วันที่ 3 หายไป → วันที่ 4 ได้ warm-up จากวันที่ 2 เหมือน series ต่อกัน
+    days = [(pd.Timestamp(d), _day(d)) for d in ("2025-11-01", "2025-11-02", "2025-11-04")]
+    data, zscore = train.build_dataset(days, interval, workers=1, device_type=DEVICE_TYPE)
+
+    # อ้างอิง: ทั้งช่วงเป็น frame เดียว ไม่มีการตัดวัน
+    whole = quality.annotate_history(DEVICE_TYPE, [pd.concat([df for _, df in days], ignore_index=True)])[0]
+    whole = clean_inputs(whole)
+    if interval != "raw":
+        whole = aggregate_data(whole, interval)
+    expected = create_advanced_features(whole.dropna(subset=["carbon"]), zscore)
+
+    assert data["TIM"].is_unique
+    assert len(data) == len(expected)
+    pd.testing.assert_frame_equal(
+        data[["TIM"] + FINAL_FEATURE_COLUMNS].reset_index(drop=True),
+        expected[["TIM"] + FINAL_FEATURE_COLUMNS].reset_index(drop=True),
+        check_dtype=False,
+    )
+
+
+def test_add_targets():
+    data = pd.DataFrame({
+        "TIM": pd.to_datetime(["2025-11-01 00:00", "2025-11-01 00:30", "2025-11-01 01:30"]),
+        "carbon": [400.0, 410.0, 430.0],
+    })
+    out = train.add_targets(data)
+
+    np.testing.assert_allclose(out["TARGET_RATE_CHANGE"].to_numpy()[:2], [10.0, 20.0])
+    np.testing.assert_allclose(out["TARGET_RATE_PER_HOUR"].to_numpy()[:2], [20.0, 20.0])
+    assert out[["TARGET_RATE_CHANGE", "TARGET_RATE_PER_HOUR"]].iloc[-1].isna().all()
@@ -128,12 +128,6 @@ useEffect(() => {
     { value: "1hour", label: "1 Hour", description: "Low detail" },
   ];
 
-  // Formula from image: V = (Raw - 32768) * (20 / 65535)
-  const calculateVoltage = (raw) => {
-    if (raw === undefined || raw === null) return 0;
-    return (raw - 32768) * (20 / 65535);
-  };
-
   const fetchCarbonStatusFromApi = async () => {
   try {
     setChatLoading(true);
@@ -263,19 +257,19 @@ useEffect(() => {
               day: "numeric",
             }),
 
-            // Original CO2 Data
-            carbon: item["COM_1 Wd_0"] ?? 0,
-            temperature: (item["COM_1 Wd_1"] ?? 0) / 100,
-            humidity: (item["COM_1 Wd_2"] ?? 0) / 100,
-            lightIntensity: item["COM_1 Wd_4"] ?? 0,
+            // CO2 Data (named / scaled by the backend metric catalog)
+            carbon: item.carbon ?? 0,
+            temperature: item.Temp ?? 0,
+            humidity: item.Humidity ?? 0,
+            lightIntensity: item.light_intensity ?? 0,
 
-            // Lux (adjust key to your API if needed)
-            lux: item.lux ?? item["COM_1 Wd_6"] ?? 0,
+            // Lux
+            lux: item.lux ?? 0,
 
-            // New Electrical Data (Converted) – analog inputs
-            padsElectrode: calculateVoltage(elecItem["AI_0 Val"]), // AI_0
-            glassElectrode: calculateVoltage(elecItem["AI_1 Val"]), // AI_1
-            pureElectrode: calculateVoltage(elecItem["AI_2 Val"]), // AI_2
+            // Electrical Data – analog inputs, already in volts
+            padsElectrode: elecItem.Leaf_Voltage ?? 0, // AI_0
+            glassElectrode: elecItem.Ground_Voltage ?? 0, // AI_1
+            pureElectrode: elecItem.Pure_Voltage ?? 0, // AI_2
 
             // Digital Inputs (0/1)
             DI_0: elecItem.DI_0 ?? 0,
@@ -33,26 +33,19 @@ export const getCachedCo2 = () => {
 };
 
 /**
- * Calculate total CO2 absorption from sensor data
- * Assumes CO2 column contains ppm values
- * @param {Array} sensorData - Array of sensor readings with carbon field
- * @returns {number} Total CO2 in ppm
+ * Calculate total CO2 absorption from the backend running totals
+ * (/carbon/co2/absorption integrates drawdown at ingest, per plant)
+ * @param {Object} absorption - Response of /carbon/co2/absorption
+ * @returns {number} Net CO2 drawdown in ppm
  */
-const calculateTotalCo2 = (sensorData) => {
-  if (!Array.isArray(sensorData) || sensorData.length === 0) {
-    return 0;
-  }
-
-  // Calculate average CO2 reading as a proxy for "absorption"
-  // Since we have readings over time, we can sum them or take weighted average
-  const validReadings = sensorData
-    .filter((item) => item.carbon !== undefined && item.carbon !== null)
-    .map((item) => Number(item.carbon));
-
-  if (validReadings.length === 0) return 0;
-
-  // Sum all readings as total CO2 measured
-  const total = validReadings.reduce((sum, val) => sum + val, 0);
+const calculateTotalCo2 = (absorption) => {
+  const plants = Object.values(absorption?.plants ?? {});
+  if (plants.length === 0) return 0;
+
+  const total = plants.reduce(
+    (sum, plant) => sum + (plant.total?.net_drawdown_ppm ?? 0),
+    0
+  );
   return Math.round(total);
 };
 
@@ -62,10 +55,8 @@ const calculateTotalCo2 = (sensorData) => {
  */
 export const updateCo2Cache = async () => {
   try {
-    // Fetch latest sensor data from the same endpoint PlantDetail uses
-    const response = await fetch(
-      "http://127.0.0.1:8000/carbon/co2/all?limit=500&interval=5min"
-    );
+    // Running totals are computed server-side at ingest
+    const response = await fetch("http://127.0.0.1:8000/carbon/co2/absorption");
 
     if (!response.ok) {
       console.error("Failed to fetch CO2 data:", response.status);
@@ -74,18 +65,22 @@ export const updateCo2Cache = async () => {
       return cached?.totalCo2 ?? 0;
     }
 
-    const sensorData = await response.json();
-    const totalCo2 = calculateTotalCo2(sensorData);
+    const absorption = await response.json();
+    const totalCo2 = calculateTotalCo2(absorption);
+    const dataPoints = Object.values(absorption.plants ?? {}).reduce(
+      (sum, plant) => sum + (plant.total?.samples ?? 0),
+      0
+    );
 
     // Store in cache
     const cacheData = {
       totalCo2,
       lastUpdated: new Date().toISOString(),
-      dataPoints: sensorData.length,
+      dataPoints,
     };
 
     localStorage.setItem(CACHE_KEY, JSON.stringify(cacheData));
-    console.log(`CO2 cache updated: ${totalCo2} ppm from ${sensorData.length} readings`);
+    console.log(`CO2 cache updated: ${totalCo2} ppm from ${dataPoints} readings`);
 
     return totalCo2;
   } catch (err) {